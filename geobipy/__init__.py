@@ -26,6 +26,7 @@ from .src.base.HDF import hdfWrite
 # Core
 from .src.classes.core.StatArray import StatArray
 from .src.classes.core.Stopwatch import Stopwatch
+from .src.classes.core.CholeskyFactor import CholeskyFactor
 # Data points
 from .src.classes.data.datapoint.EmDataPoint import EmDataPoint
 from .src.classes.data.datapoint.FdemDataPoint import FdemDataPoint
@@ -46,17 +47,22 @@ from .src.classes.mesh.RectilinearMesh2D import RectilinearMesh2D
 from .src.classes.model.Model1D import Model1D
 # Pointclouds
 from .src.classes.pointcloud.PointCloud3D import PointCloud3D
+from .src.classes.pointcloud.PointStore import PointStore
 # Statistics
 from .src.classes.statistics.Distribution import Distribution
 from .src.classes.statistics.Histogram1D import Histogram1D
 from .src.classes.statistics.Histogram2D import Histogram2D
 from .src.classes.statistics.Hitmap2D import Hitmap2D
+from .src.classes.statistics.DepthSummary import DepthSummary
 # McMC Inersion
 from .src.inversion.Results import Results
-from .src.inversion.LineResults import LineResults
+from .src.inversion.LineResults import LineResults, RecordedResults
+from .src.inversion.SurveyResults import SurveyResults
 from .src.inversion.DataSetResults import DataSetResults
+from .src.inversion.ResultsWriter import ResultsWriter
 
 from .src.inversion.Inv_MCMC import Initialize, Inv_MCMC
+from .src.inversion.Inv_MCMC_Batch import Inv_MCMC_Batch
 
 # Set an MPI failed tag
 dpFailed = 0
@@ -78,39 +84,96 @@ def checkCommandArguments():
     Parser.add_argument('inputFile', help='User input file')
     Parser.add_argument('outputDir', help='Output directory for results')
     Parser.add_argument('--skipHDF5', dest='skipHDF5', default=False, help='Skip the creation of the HDF5 files.  Only do this if you know they have been created.')
+    Parser.add_argument('--nChains', dest='nChains', type=int, default=1, help='Number of data points to invert in lockstep.  Only available with the serial version of GeoBIPy.')
+    Parser.add_argument('--masterWorks', dest='masterWorks', action='store_true', help='The MPI master also inverts data points between scheduling the workers.')
+    Parser.add_argument('--restart', dest='restart', action='store_true', help='Restart an interrupted run. The existing HDF5 files are reused and only the unfinished data points are inverted.')
+    Parser.add_argument('--asyncWrite', dest='asyncWrite', action='store_true', help='Write the results from a background thread that batches the writes of many data points.')
+    Parser.add_argument('--survey', dest='survey', action='store_true', help='Write the results of every line to a single survey-wide HDF5 file instead of one file per line.')
+    Parser.add_argument('--noCache', dest='cache', action='store_false', help='Always parse the data files, rather than reading the binary copy of them that is made on the first run.')
+    Parser.add_argument('--sharedData', dest='sharedData', action='store_true', help='With MPI, keep one read only copy of the data and standard deviations per node in shared memory, instead of a copy on every rank.')
+    Parser.add_argument('--lazyData', dest='lazyData', action='store_true', help='With MPI, the workers read each data point from a binary store in the output directory when they need it, instead of holding the whole data set.')
+    Parser.add_argument('--replicaRanks', dest='replicaRanks', type=int, default=1, help='With MPI, the workers are grouped into teams of this many ranks that share the replicas of each tempered chain.')
+    Parser.add_argument('--workers', dest='workers', type=int, default=1, help='Without MPI, invert this many data points at a time in a pool of processes.')
     
     args = Parser.parse_args()
 
     # Strip .py from the input file name
     inputFile = args.inputFile.replace('.py','')
 
-    return inputFile, args.outputDir, args.skipHDF5
-
-
-def masterTask(myData, world):
-  """ Define a Send Recv Send procedure on the master """
+    return inputFile, args.outputDir, args.skipHDF5, args.nChains, args.masterWorks, args.restart, args.asyncWrite, args.survey, args.cache, args.sharedData, args.lazyData, args.replicaRanks, args.workers
+
+
+def masterTask(myData, world, UP=None, prng=None, LineResults=None, masterWorks=False, chunkTime=5.0, maxChunk=64, indices=None, workers=None):
+  """ Define a dynamic scheduler on the master that hands out chunks of data point indices
+
+  Each worker is sent a chunk of indices to invert.  While inverting the last index of a chunk, the worker reports
+  the number of points it finished and the time they took, and requests its next chunk so that it is never left idle.
+  The size of each chunk adapts to the measured time per data point so that a worker messages the master roughly
+  every chunkTime seconds, but never takes more than its share of the remaining points so that the run finishes evenly.
+
+  Parameters
+  ----------
+  myData : geobipy.Data
+      The data set being inverted.
+  world : mpi4py.MPI.Comm
+      MPI parallel communicator.
+  UP : module, optional
+      The user parameter module, required if masterWorks.
+  prng : numpy.random.RandomState, optional
+      Random number generator, required if masterWorks.
+  LineResults : list of geobipy.LineResults, optional
+      The line results files, required if masterWorks.
+  masterWorks : bool, optional
+      The master also inverts one data point at a time, and answers the workers between points.
+  chunkTime : float, optional
+      Target number of seconds of work in each chunk.
+  maxChunk : int, optional
+      Maximum number of indices in a chunk.
+  indices : array_like, optional
+      Only invert these data points, e.g. those left unfinished by a previous run.  Defaults to every data point.
+  workers : array_like of ints, optional
+      Ranks that are sent chunks, e.g. the first rank of each team that shares tempered chains.  Defaults to every rank but the master.
+
+  """
   
   from mpi4py import MPI
   from geobipy.src.base import MPI as myMPI
   
   # Set the total number of data points
 
-  N = myData.N
+  randomizedPointIndices = np.arange(myData.N) if indices is None else np.asarray(indices, dtype=np.int64)
+  N = randomizedPointIndices.size
+  workers = np.arange(1, world.size) if workers is None else np.asarray(workers)
+  nWorkers = workers.size
 
-  # Create and shuffle and integer list for the number of data points
-  randomizedPointIndices = np.arange(N)
+  # Shuffle the integer list of data points
   np.random.shuffle(randomizedPointIndices)
 
   nFinished = 0
   nSent = 0
-  dataSend = np.zeros(1, dtype = np.int64)
-  rankRecv = np.zeros(3, dtype = np.float32)
+  nKilled = 0
+  totalTime = 0.0
+  rankRecv = np.zeros(3, dtype = np.float64)
+  lines = np.unique(myData.line)
+  lines.sort()
+
+  def nextChunk():
+    """ Number of indices to send in the next chunk """
+    nLeft = N - nSent
+    if (nFinished == 0):
+      return min(1, nLeft)
+    # Points that take chunkTime seconds, but no more than a share of what is left
+    n = min(np.int64(chunkTime * nFinished / totalTime) if totalTime > 0.0 else maxChunk, maxChunk, np.ceil(nLeft / (2.0 * (nWorkers + masterWorks))))
+    return np.int64(min(max(n, 1), nLeft))
 
   # Send out the first indices to the workers
-  for iWorker in range(1,world.size):
-    dataSend[:] = randomizedPointIndices[nSent]
-    world.Send(dataSend, dest = iWorker, tag = run)
-    nSent += 1
+  for iWorker in workers:
+    if (nSent < N):
+      n = nextChunk()
+      world.Send(randomizedPointIndices[nSent:nSent + n].copy(), dest = int(iWorker), tag = run)
+      nSent += n
+    else:
+      world.Send(np.full(1, -1, dtype = np.int64), dest = int(iWorker), tag = killSwitch)
 
   # Start a timer
   t0 = MPI.Wtime()
@@ -118,79 +181,140 @@ def masterTask(myData, world):
   myMPI.print("Initial data points sent. Master is now waiting for requests")
 
   # Now wait to send indices out to the workers as they finish until the entire data set is finished
-  while nFinished < N:
+  while (nFinished < N) or (nKilled < nWorkers):
+
+    status = MPI.Status()
+    if (masterWorks and nSent < N):
+      # Invert a point only when no worker is waiting for the master
+      if (not world.Iprobe(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG, status = status)):
+        t1 = MPI.Wtime()
+        iDataPoint = randomizedPointIndices[nSent]
+        nSent += 1
+        _invertDataPoint(myData, UP, prng, world, LineResults, lines, iDataPoint)
+        nFinished += 1
+        totalTime += MPI.Wtime() - t1
+        continue
+
     # Wait for a worker to ping you
-    
-    world.Recv(rankRecv, source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG, status = MPI.Status())
-    workerRank = np.int(rankRecv[0])
-    dataPointProcessed = np.int(rankRecv[1])
+    world.Recv(rankRecv, source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG, status = status)
+    workerRank = np.int64(rankRecv[0])
+    nProcessed = np.int64(rankRecv[1])
 
-    nFinished += 1
+    nFinished += nProcessed
+    totalTime += rankRecv[2]
 
-    # Send out the next point if the list is not empty
-    if (nSent < N):
-      dataSend[:] = randomizedPointIndices[nSent]
-      world.Send(dataSend, dest = workerRank, tag = run)
-      nSent += 1
+    # A worker that was told to stop reports its last points and exits
+    if (status.Get_tag() == killSwitch):
+      nKilled += 1
     else:
-      dataSend[0] = -1
-      world.Send(dataSend, dest = workerRank, tag = killSwitch)
-     
-    elapsed = MPI.Wtime() - t0
-    eta = (N/nFinished-1) * elapsed
-    myMPI.print('Inverted data point {} in {:.3f}s  ||  Time: {:.3f}s  ||  QueueLength: {}/{}  ||  ETA: {:.3f}s'.format(dataPointProcessed, rankRecv[2], elapsed, N-nFinished, N, eta))
+      # Send out the next chunk if the list is not empty
+      if (nSent < N):
+        n = nextChunk()
+        world.Send(randomizedPointIndices[nSent:nSent + n].copy(), dest = workerRank, tag = run)
+        nSent += n
+      else:
+        world.Send(np.full(1, -1, dtype = np.int64), dest = workerRank, tag = killSwitch)
+
+    if (nProcessed > 0):
+      elapsed = MPI.Wtime() - t0
+      eta = (N/nFinished-1) * elapsed
+      myMPI.print('Rank {} inverted {} data points in {:.3f}s  ||  Time: {:.3f}s  ||  QueueLength: {}/{}  ||  ETA: {:.3f}s'.format(workerRank, nProcessed, rankRecv[2], elapsed, N-nFinished, N, eta))
+
 
+def workerTask(myData, UP, prng, world, LineResults, maxChunk=64, team=None):
+  """ Define a wait run ping procedure for each worker
 
-def workerTask(myData, UP, prng, world, LineResults):
-  """ Define a wait run ping procedure for each worker """
+  The next chunk of indices is requested from the master, and received in the background,
+  while the last data point of the current chunk is inverted.
+
+  If team is a communicator of several ranks, only its first rank is sent chunks by the master.  It passes each chunk
+  on to the other ranks of the team, which invert the same data points with it by sharing the replicas of each
+  tempered chain, see Inv_MCMC_Tempered.
+
+  """
   
   from mpi4py import MPI
   from geobipy.src.base import MPI as myMPI
-  
-  # Initialize the worker process to go
-  Go = True
 
-  # Wait until the master sends you an index to process
-  i = np.empty(1, dtype=np.int64)
-  myRank = np.empty(3, dtype=np.float32)
+  if (not team is None and team.rank > 0):
+    _teamTask(myData, UP, prng, world, LineResults, team)
+    return
+  
+  # Wait until the master sends you a chunk of indices to process
+  i = np.empty(maxChunk, dtype=np.int64)
+  myRank = np.empty(3, dtype=np.float64)
   mpi_status = MPI.Status()
   world.Recv(i, source = 0, tag = MPI.ANY_TAG, status = mpi_status)
-  iDataPoint = i[0]
+  chunk = i[:mpi_status.Get_count(MPI.INT64_T)].copy()
+  # Read the chunk's data points in a single pass if they are read from a store
+  myData.prefetch(chunk)
 
   # Check if a killSwitch for this worker was thrown
-  if mpi_status.Get_tag() == killSwitch:
-      Go = False
+  Go = mpi_status.Get_tag() != killSwitch
+  if (not team is None):
+    team.bcast(chunk if Go else None, root=0)
 
   lines = np.unique(myData.line)
   lines.sort()
 
+  nProcessed = 0
+  tProcessed = 0.0
   while Go:
-    t0 = MPI.Wtime()
-    # Get the data point for the given index
-    DataPoint = myData.getDataPoint(iDataPoint)
-    paras = UP.userParameters(DataPoint)
-
-    # Pass through the line results file object if a parallel file system is in use.
-    iLine = lines.searchsorted(myData.line[iDataPoint])
-    Inv_MCMC(paras, DataPoint, myData.id[iDataPoint], prng=prng, rank=world.rank, LineResults=LineResults[iLine])
-    
-    # Send the current rank number to the master
-    myRank[:] = (world.rank, iDataPoint, MPI.Wtime() - t0)
-
-    # With the Data Point inverted, Ping the Master to request a new index
-    world.Send(myRank, dest = 0)
+    for k, iDataPoint in enumerate(chunk):
+      if (k == chunk.size - 1):
+        # Report the finished points and prefetch the next chunk before inverting the last point
+        myRank[:] = (world.rank, nProcessed, tProcessed)
+        world.Send(myRank, dest = 0, tag = run)
+        request = world.Irecv(i, source = 0, tag = MPI.ANY_TAG)
+        nProcessed = 0
+        tProcessed = 0.0
+
+      t0 = MPI.Wtime()
+      _invertDataPoint(myData, UP, prng, world, LineResults, lines, iDataPoint, team)
+      nProcessed += 1
+      tProcessed += MPI.Wtime() - t0
 
     # Wait till you are told what to process next
     mpi_status = MPI.Status()
-    world.Recv(i, source = 0, tag = MPI.ANY_TAG, status = mpi_status)
-    iDataPoint = i[0]
+    request.Wait(status = mpi_status)
+    chunk = i[:mpi_status.Get_count(MPI.INT64_T)].copy()
+    myData.prefetch(chunk)
 
     # Check if a killSwitch for this worker was thrown
-    if mpi_status.Get_tag() == killSwitch:
-      Go = False
+    Go = mpi_status.Get_tag() != killSwitch
+    if (not team is None):
+      team.bcast(chunk if Go else None, root=0)
+
+  # Report the last points to the master
+  myRank[:] = (world.rank, nProcessed, tProcessed)
+  world.Send(myRank, dest = 0, tag = killSwitch)
+
+
+def _teamTask(myData, UP, prng, world, LineResults, team):
+  """ Invert the data points of each chunk passed on by the first rank of a team, until it passes on None """
+  lines = np.unique(myData.line)
+  lines.sort()
+
+  chunk = team.bcast(None, root=0)
+  while (not chunk is None):
+    myData.prefetch(chunk)
+    for iDataPoint in chunk:
+      _invertDataPoint(myData, UP, prng, world, LineResults, lines, iDataPoint, team)
+    chunk = team.bcast(None, root=0)
+
+
+def _invertDataPoint(myData, UP, prng, world, LineResults, lines, iDataPoint, team=None):
+  """ Invert a single data point and write its results to its line results file """
+  # Get the data point for the given index
+  DataPoint = myData.getDataPoint(iDataPoint)
+  paras = UP.userParameters(DataPoint)
+
+  # Pass through the line results file object if a parallel file system is in use.
+  iLine = lines.searchsorted(myData.line[iDataPoint])
+  Inv_MCMC(paras, DataPoint, myData.id[iDataPoint], prng=prng, rank=world.rank, LineResults=LineResults[iLine], comm=team)
 
 
-def multipleCore(inputFile, outputDir, skipHDF5):
+def multipleCore(inputFile, outputDir, skipHDF5, masterWorks=False, restart=False, asyncWrite=False, survey=False, cache=True, sharedData=False, lazyData=False, replicaRanks=1):
     
     from mpi4py import MPI
     from geobipy.src.base import MPI as myMPI
@@ -203,24 +327,45 @@ def multipleCore(inputFile, outputDir, skipHDF5):
     AllData = eval(UP.dataInit)
     # Initialize the data object on master
     if (world.rank == 0):
-        AllData.read(UP.dataFname, UP.sysFname)
-
-    myData = AllData.Bcast(world)
-    if (world.rank == 0): myData = AllData
+        AllData.read(UP.dataFname, UP.sysFname, cache=cache)
+
+    assert not (lazyData and sharedData), 'Use either lazyData or sharedData'
+    if (lazyData):
+        # The master writes the values of each data point to a store that the workers read from as they need them,
+        # so only the systems, line numbers and id numbers are sent to the workers
+        storeName = PointStore.inDirectory(outputDir)
+        if (world.rank == 0):
+            try:
+                makedirs(outputDir)
+            except:
+                pass
+            AllData.toStore(storeName)
+        world.barrier()
+        myData = AllData.Bcast(world, store=storeName)
+        if (world.rank == 0): myData = AllData
+    elif (sharedData):
+        # Every rank, including the master, uses its node's copy so that the master's original can be released
+        myData = AllData.Bcast(world, shared=True)
+        del AllData
+    else:
+        myData = AllData.Bcast(world)
+        if (world.rank == 0): myData = AllData
 
     myMPI.rankPrint(world,'Data Broadcast')
 
-    assert (world.size <= myData.N+1), 'Do not ask for more cores than you have data points! Cores:nData '+str([world.size,myData.N])
-
-    allGroup = world.Get_group()
-    masterGroup = allGroup.Incl([0])
-    masterComm = world.Create(masterGroup)
+    assert restart or (world.size <= myData.N+1), 'Do not ask for more cores than you have data points! Cores:nData '+str([world.size,myData.N])
 
     t0 = MPI.Wtime()
     t1 = t0
 
     prng = myMPI.getParallelPrng(world, MPI.Wtime)
 
+    # Group the workers into teams that share the replicas of each tempered chain
+    assert replicaRanks > 0 and np.mod(world.size - 1, replicaRanks) == 0, 'The number of workers must be a multiple of replicaRanks'
+    team = None
+    if (replicaRanks > 1):
+        team = world.Split(MPI.UNDEFINED if world.rank == 0 else (world.rank - 1) // replicaRanks, world.rank)
+
     # Make sure the line results folders exist
     try:
         makedirs(outputDir)
@@ -233,6 +378,13 @@ def multipleCore(inputFile, outputDir, skipHDF5):
     paras=UP.userParameters(DataPoint)
     # Check the parameters
     paras.check(DataPoint)
+    # A team of ranks can only share a tempered chain, and each rank of a team needs at least one replica
+    assert replicaRanks == 1 or not paras.temperatures is None, 'replicaRanks > 1 needs temperatures in the user parameters'
+    assert replicaRanks == 1 or paras.temperatures.size >= replicaRanks, 'There must be at least replicaRanks temperatures'
+    # Set how the results are chunked and compressed in the HDF5 files
+    hdfWrite.setRepeatedStorage(paras.chunkRepeats, paras.compression, paras.compressionLevel, paras.shuffle)
+    # Parallel HDF5 can only compress datasets that are written collectively, but each rank writes its own data points
+    assert paras.compression is None, 'compression can only be used with the serial version of GeoBIPy'
     # Initialize the inversion to obtain the sizes of everything
     [paras, Mod, D, prior, posterior, PhiD] = Initialize(paras, DataPoint, prng=prng)
     # Create the results template
@@ -248,26 +400,40 @@ def multipleCore(inputFile, outputDir, skipHDF5):
 
     world.barrier()
     
-    myMPI.rankPrint(world,'Creating HDF5 files, this may take a few minutes...')
-    ### Only do this using the subcommunicator!
-    if (masterComm != MPI.COMM_NULL):
-        for i in range(nLines):
+    myMPI.rankPrint(world,'Creating HDF5 files...')
+    t0 = MPI.Wtime()
+    # Each rank creates its share of the line files with the serial driver, so that the files are created concurrently
+    # A restart reuses the files, and their completion ledgers, from the interrupted run
+    if (survey):
+        # A single file for the survey, indexed by global data point
+        if (world.rank == 0 and not restart):
+            with h5py.File(SurveyResults.inDirectory(outputDir), 'w') as f:
+                SurveyResults().createHdf(f, myData.line, myData.id, Res)
+    elif (not restart):
+        for i in range(world.rank, nLines, world.size):
             j = np.where(myData.line == lines[i])[0]
             fName = join(outputDir, str(lines[i])+'.h5')
-            with h5py.File(fName, 'w', driver='mpio', comm=masterComm) as f:
+            with h5py.File(fName, 'w') as f:
                 LR = LineResults()
                 LR.createHdf(f, myData.id[j], Res)
-            myMPI.rankPrint(world,'Time to create the line with {} data points: {:.3f} s'.format(j.size, MPI.Wtime()-t0))
-            t0 = MPI.Wtime()
 
     world.barrier()
+    myMPI.rankPrint(world,'Time to create {} line files: {:.3f} s'.format(nLines, MPI.Wtime()-t0))
     
     # Open the files collectively
+    writer = ResultsWriter() if asyncWrite else None
     LR = [None]*nLines
-    for i in range(nLines):
-        fName = join(outputDir,str(lines[i])+'.h5')
-        LR[i] = LineResults(fName, hdfFile = h5py.File(fName,'a', driver='mpio',comm=world))
-        # myMPI.print("rank {} line {} iDs {}".format(world.rank, i, LR[i].iDs))
+    if (survey):
+        fName = SurveyResults.inDirectory(outputDir)
+        SR = SurveyResults(fName, hdfFile = h5py.File(fName,'a', driver='mpio',comm=world))
+        SR.writer = writer
+        LR = [SR.getLine(line) for line in lines]
+    else:
+        for i in range(nLines):
+            fName = join(outputDir,str(lines[i])+'.h5')
+            LR[i] = LineResults(fName, hdfFile = h5py.File(fName,'a', driver='mpio',comm=world))
+            LR[i].writer = writer
+            # myMPI.print("rank {} line {} iDs {}".format(world.rank, i, LR[i].iDs))
 
 
     world.barrier()
@@ -276,23 +442,43 @@ def multipleCore(inputFile, outputDir, skipHDF5):
 
     # Carryout the master-worker tasks
     if (world.rank == 0):
-        masterTask(myData, world)
+        indices = _unfinishedIndices(myData, lines, LR) if restart else None
+        if restart:
+            myMPI.rankPrint(world,'Restarting with {} of {} data points unfinished'.format(indices.size, myData.N))
+        masterTask(myData, world, UP, prng, LR, masterWorks=masterWorks, indices=indices, workers=np.arange(1, world.size, replicaRanks))
     else:
-        workerTask(myData, UP, prng, world, LR)
+        workerTask(myData, UP, prng, world, LR, team=team)
+
+    # Write any results still held by the writer before the files are closed
+    if (not writer is None):
+        writer.close()
 
     world.barrier()
     # Close all the files
-    for i in range(nLines):
-        LR[i].close()
+    if (survey):
+        SR.close()
+    else:
+        for i in range(nLines):
+            LR[i].close()
+
 
+def _unfinishedIndices(myData, lines, LineResults):
+    """ Get the indices of the data points whose results have not been written to their line results files """
+    finished = np.zeros(myData.N, dtype=np.bool_)
+    for i in range(lines.size):
+        j = np.where(myData.line == lines[i])[0]
+        completed = LineResults[i].getCompleted()
+        finished[j] = completed[LineResults[i].iDs.searchsorted(myData.id[j])]
+    return np.where(~finished)[0]
 
-def singleCore(inputFile, outputDir):
+
+def singleCore(inputFile, outputDir, nChains=1, restart=False, asyncWrite=False, survey=False, cache=True, workers=1):
     # Import the script from the input file
     UP = import_module(inputFile, package=None)
 
     
     AllData = eval(UP.dataInit)
-    AllData.read(UP.dataFname, UP.sysFname)
+    AllData.read(UP.dataFname, UP.sysFname, cache=cache)
 
     # Make sure both dataPoint and line results folders exist
     try:
@@ -309,6 +495,8 @@ def singleCore(inputFile, outputDir):
     paras = UP.userParameters(DataPoint)
     # Check the parameters
     paras.check(DataPoint)
+    # Set how the results are chunked and compressed in the HDF5 files
+    hdfWrite.setRepeatedStorage(paras.chunkRepeats, paras.compression, paras.compressionLevel, paras.shuffle)
     # Initialize the inversion to obtain the sizes of everything
     [paras, Mod, D, prior, posterior, PhiD] = Initialize(paras, DataPoint, prng=prng)
     # Create the results template
@@ -321,37 +509,131 @@ def singleCore(inputFile, outputDir):
     nLines = lines.size
     LR = [None]*nLines
     H5Files = [None]*nLines
-    for i in range(nLines):
-        H5Files[i] = h5py.File(join(outputDir, str(lines[i])+'.h5'), 'w')
-        j = np.where(AllData.line == lines[i])[0]
-        LR[i] = LineResults()
-        LR[i].createHdf(H5Files[i], AllData.id[j], Res)
+    if (survey):
+        fName = SurveyResults.inDirectory(outputDir)
+        if restart:
+            H5Files = [h5py.File(fName, 'a')]
+            SR = SurveyResults(fName, hdfFile=H5Files[0])
+        else:
+            H5Files = [h5py.File(fName, 'w')]
+            SR = SurveyResults()
+            SR.createHdf(H5Files[0], AllData.line, AllData.id, Res)
+        LR = [SR.getLine(line) for line in lines]
+    else:
+        for i in range(nLines):
+            fName = join(outputDir, str(lines[i])+'.h5')
+            if restart:
+                # Reuse the file, and its completion ledger, from the interrupted run
+                H5Files[i] = h5py.File(fName, 'a')
+                LR[i] = LineResults(fName, hdfFile=H5Files[i])
+            else:
+                H5Files[i] = h5py.File(fName, 'w')
+                j = np.where(AllData.line == lines[i])[0]
+                LR[i] = LineResults()
+                LR[i].createHdf(H5Files[i], AllData.id[j], Res)
+
+    indices = _unfinishedIndices(AllData, lines, LR) if restart else np.arange(AllData.N)
+
+    writer = ResultsWriter() if asyncWrite else None
+    for R in ([SR] if survey else LR):
+        R.writer = writer
+
+
+    assert workers > 0, 'workers must be positive'
+    assert workers == 1 or nChains == 1, 'Use either workers or nChains'
+
+    if (workers > 1):
+        _invertPool(inputFile, AllData, lines, LR, indices, prng, workers)
+    elif (nChains > 1):
+        # Invert batches of data points in lockstep
+        for i in range(0, indices.size, nChains):
+            j = indices[i:i + nChains]
+            DataPoints = [AllData.getDataPoint(k) for k in j]
+            paras = [UP.userParameters(DataPoint) for DataPoint in DataPoints]
+            iLine = lines.searchsorted(AllData.line[j])
+            Inv_MCMC_Batch(paras, DataPoints, AllData.id[j], prng=prng, LineResults=[LR[k] for k in iLine])
+    else:
+        for i in indices:
+            DataPoint = AllData.getDataPoint(i)
+            paras = UP.userParameters(DataPoint)
+
+            iLine = lines.searchsorted(AllData.line[i])
+            Inv_MCMC(paras, DataPoint, AllData.id[i], prng=prng, LineResults=LR[iLine])
+
+    # Write any results still held by the writer before the files are closed
+    if (not writer is None):
+        writer.close()
+
+    for f in H5Files:
+        f.close()
+
+
+# The user parameters and data set of a process in the pool of _invertPool
+_pool = {}
+
+
+def _invertPool(inputFile, myData, lines, LineResults, indices, prng, workers):
+    """ Invert data points in a pool of processes, while this process writes their results
 
+    Each data point is inverted with its own random number generator, seeded from prng, so that the processes draw
+    independent streams and a point's results do not depend on which process inverts it.  The processes record the
+    writes of their results, see RecordedResults, and send them back so that only this process writes to the files.
 
-    for i in range(AllData.N):
-        DataPoint = AllData.getDataPoint(i)
-        paras = UP.userParameters(DataPoint)
+    """
+    from multiprocessing import Pool
 
-        iLine = lines.searchsorted(AllData.line[i])
-        Inv_MCMC(paras, DataPoint, AllData.id[i], prng=prng, LineResults=LR[iLine])
+    N = indices.size
+    iLine = lines.searchsorted(myData.line[indices])
+    points = [LineResults[j].pointIndex(myData.id[i]) for i, j in zip(indices, iLine)]
+    seeds = prng.randint(np.iinfo(np.int32).max, size=N)
 
-    for i in range(nLines):
-        H5Files[i].close()
+    clk = Stopwatch()
+    clk.start()
+    with Pool(workers, initializer=_poolInitialize, initargs=(inputFile, myData)) as pool:
+        tasks = zip(range(N), indices, points, seeds)
+        for nFinished, (k, records, t) in enumerate(pool.imap_unordered(_poolInvert, tasks), 1):
+            LineResults[iLine[k]].putRecords(records)
+            elapsed = clk.timeinSeconds()
+            eta = (N/nFinished-1) * elapsed
+            print('Inverted data point {} in {:.3f}s  ||  Time: {:.3f}s  ||  QueueLength: {}/{}  ||  ETA: {:.3f}s'.format(myData.id[indices[k]], t, elapsed, N-nFinished, N, eta))
+
+
+def _poolInitialize(inputFile, myData):
+    """ Give a process of the pool the user parameters and the data set """
+    _pool['UP'] = import_module(inputFile, package=None)
+    _pool['data'] = myData
+
+
+def _poolInvert(task):
+    """ Invert a data point in a process of the pool, and return the recorded writes of its results """
+    k, iDataPoint, i, seed = task
+    myData = _pool['data']
+    DataPoint = myData.getDataPoint(iDataPoint)
+    paras = _pool['UP'].userParameters(DataPoint)
+
+    clk = Stopwatch()
+    clk.start()
+    R = RecordedResults(i)
+    Inv_MCMC(paras, DataPoint, myData.id[iDataPoint], prng=np.random.RandomState(seed), rank=0, LineResults=R)
+    return k, R.records, clk.timeinSeconds()
 
 
 def runSerial():
     """Run the serial implementation of GeoBIPy. """
         
-    inputFile, outputDir, skipHDF5 = checkCommandArguments()    
+    inputFile, outputDir, skipHDF5, nChains, masterWorks, restart, asyncWrite, survey, cache, sharedData, lazyData, replicaRanks, workers = checkCommandArguments()    
     sys.path.append(getcwd())
 
-    R = singleCore(inputFile, outputDir)
+    R = singleCore(inputFile, outputDir, nChains, restart, asyncWrite, survey, cache, workers)
 
 
 def runParallel():
     """Run the parallel implementation of GeoBIPy. """
 
-    inputFile, outputDir, skipHDF5 = checkCommandArguments()    
+    inputFile, outputDir, skipHDF5, nChains, masterWorks, restart, asyncWrite, survey, cache, sharedData, lazyData, replicaRanks, workers = checkCommandArguments()    
     sys.path.append(getcwd())
 
-    R = multipleCore(inputFile, outputDir, skipHDF5)
+    assert nChains == 1, 'nChains can only be used with the serial version of GeoBIPy'
+    assert workers == 1, 'workers can only be used with the serial version of GeoBIPy, use more MPI ranks instead'
+
+    R = multipleCore(inputFile, outputDir, skipHDF5, masterWorks, restart, asyncWrite, survey, cache, sharedData, lazyData, replicaRanks)
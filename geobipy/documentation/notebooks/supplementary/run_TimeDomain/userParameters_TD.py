@@ -176,6 +176,8 @@ class userParameters(_userParameters):
     self.invertPar=True
     # Clipping Ratio for interface contrasts
     self.clipRatio = 0.5
+    # Perturb the model and data point in place, undoing rejected proposals, rather than copying them every iteration
+    self.inPlace = False
 
 
     # Specify the folder to the data
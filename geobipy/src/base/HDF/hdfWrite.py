@@ -1,4 +1,109 @@
 import numpy as np
+import h5py
+
+# How the datasets created by createRepeated are laid out and compressed, see setRepeatedStorage
+repeatedStorage = {'chunkRepeats' : None, 'compression' : None, 'compressionLevel' : None, 'shuffle' : False}
+
+
+def setRepeatedStorage(chunkRepeats=None, compression=None, compressionLevel=None, shuffle=False):
+    """Sets how the datasets created by createRepeated are stored
+
+    Results are written one data point, i.e. one repeat, at a time, so chunks that hold a whole number of repeats align
+    with the writes and a repeat is compressed and decompressed as a unit.  Most of the volume of the results is in the
+    hitmaps and histograms, whose counts are mostly zeros and compress well.
+
+    Parameters
+    ----------
+    chunkRepeats : int, optional
+        Number of repeats in each chunk of a dataset.  If None, datasets are contiguous, unless they are compressed,
+        in which case each chunk holds one repeat.
+    compression : str, optional
+        Lossless compression filter, 'gzip' or 'lzf'.
+    compressionLevel : int, optional
+        Level of the gzip compression between 0 and 9, defaults to 4.
+    shuffle : bool, optional
+        Apply the byte shuffle filter before compressing, which usually improves the compression of numbers.
+
+    Notes
+    -----
+    Parallel HDF5 can only write to compressed datasets with collective writes, so compression cannot be used with
+    files that are written independently by many MPI ranks.
+
+    """
+    assert chunkRepeats is None or chunkRepeats > 0, ValueError('chunkRepeats must be positive')
+    assert compression in [None, 'gzip', 'lzf'], ValueError("compression must be None, 'gzip' or 'lzf'")
+    assert compressionLevel is None or 0 <= compressionLevel <= 9, ValueError('compressionLevel must be between 0 and 9')
+
+    repeatedStorage['chunkRepeats'] = chunkRepeats
+    repeatedStorage['compression'] = compression
+    repeatedStorage['compressionLevel'] = compressionLevel
+    repeatedStorage['shuffle'] = shuffle
+
+
+def createRepeated(h5obj, myName, shape, dtype, fillvalue=None):
+    """Creates a dataset that holds many repeats of an array, without writing a fill value of zero to the file
+
+    If the fill value is zero, e.g. for the counts of the hitmaps and histograms, storage for the dataset is not
+    initialized when it is allocated, so creating the dataset for many data points only costs the metadata rather than a
+    write of the entire dataset.  The entries that are never written read as zero in a new file.  Any other fill value,
+    e.g. the NaN that pads a model beyond its number of layers, is written when the storage is allocated, so that
+    readers can rely on it.
+
+    Storage is allocated when the dataset is created.  A file created with the serial driver can then be opened with the
+    mpio driver and written to independently by each rank, since opening a dataset whose storage is not yet allocated
+    allocates it, which would be a metadata change made by a single rank.
+    The first dimension indexes the repeats, and the dataset is chunked and compressed according to setRepeatedStorage.
+
+    Parameters
+    ----------
+    h5obj : h5py._hl.files.File or h5py._hl.group.Group
+        A HDF file or group object to create the dataset in.
+    myName : str
+        The name of the dataset.
+    shape : list of ints
+        Shape of the dataset.
+    dtype : numpy dtype
+        Type of the dataset.
+    fillvalue : number, optional
+        Fill value stored with the dataset.
+
+    Returns
+    -------
+    out : h5py._hl.dataset.Dataset
+        The new dataset.
+
+    """
+    dtype = np.dtype(dtype)
+    shape = tuple(shape)
+    dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+    # A NaN fill value has no integer equivalent, so integer datasets keep the default fill value of zero
+    if (not fillvalue is None and (dtype.kind in 'fc' or np.isfinite(fillvalue))):
+        fillvalue = np.array(fillvalue, dtype=dtype)
+        dcpl.set_fill_value(fillvalue)
+    else:
+        fillvalue = np.zeros(1, dtype=dtype)
+    if (np.all(fillvalue == 0)):
+        dcpl.set_fill_time(h5py.h5d.FILL_TIME_NEVER)
+    dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
+
+    compression = repeatedStorage['compression']
+    chunkRepeats = repeatedStorage['chunkRepeats']
+    if (chunkRepeats is None and not compression is None):
+        chunkRepeats = 1
+    # Chunks cannot have a zero length dimension
+    if (not chunkRepeats is None and np.prod(shape) > 0):
+        dcpl.set_chunk((min(chunkRepeats, shape[0]),) + shape[1:])
+        if (repeatedStorage['shuffle']):
+            dcpl.set_shuffle()
+        if (compression == 'gzip'):
+            dcpl.set_deflate(4 if repeatedStorage['compressionLevel'] is None else repeatedStorage['compressionLevel'])
+        elif (compression == 'lzf'):
+            dcpl.set_filter(h5py.h5z.FILTER_LZF, h5py.h5z.FLAG_OPTIONAL)
+
+    space = h5py.h5s.create_simple(shape)
+    dsid = h5py.h5d.create(h5obj.id, myName.encode(), h5py.h5t.py_create(dtype), space, dcpl=dcpl)
+    return h5py.Dataset(dsid)
+
 
 def writeNumpy(arr, h5obj, myName, index=None):
     """Writes a numpy array to a preallocated dataset in a h5py group object
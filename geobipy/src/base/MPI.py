@@ -373,6 +373,95 @@ def Bcast_list(self, world, root=0):
     return this
 
 
+# Communicators used by Bcast_shared, and the shared memory windows that back its arrays, which must outlive them
+_nodeComms = {}
+_sharedWindows = []
+
+
+def nodeComms(world, root=0):
+    """Split a communicator into the ranks on each node, and one leader rank per node
+
+    The root is rank 0 of its node, and of the leaders.  The communicators are created once and reused.  Must be called
+    collectively.
+
+    Parameters
+    ----------
+    world : mpi4py.MPI.Comm
+        MPI parallel communicator.
+    root : int, optional
+        The MPI rank that leads its node. Default is 0.
+
+    Returns
+    -------
+    node : mpi4py.MPI.Comm
+        The ranks that share memory with this rank.
+    leaders : mpi4py.MPI.Comm
+        Rank 0 of every node.  This is MPI.COMM_NULL on the other ranks.
+
+    """
+    from mpi4py import MPI
+
+    key = (world.py2f(), root)
+    if (not key in _nodeComms):
+        order = 0 if world.rank == root else world.rank + 1
+        node = world.Split_type(MPI.COMM_TYPE_SHARED, key=order)
+        leaders = world.Split(0 if node.rank == 0 else MPI.UNDEFINED, key=order)
+        _nodeComms[key] = (node, leaders)
+    return _nodeComms[key]
+
+
+def Bcast_shared(self, world, root=0):
+    """Broadcast a numpy array into memory that is shared by the ranks on each node
+
+    Rather than every rank receiving its own copy of the array, one copy per node is allocated in an MPI-3 shared memory
+    window.  The root broadcasts the array to one rank on each node, and every rank gets a numpy view of its node's copy.
+    The view is read only, since writing to it would change the array on every rank of the node.  Must be called
+    collectively.
+
+    Parameters
+    ----------
+    self : numpy.ndarray
+        A numpy array to broadcast from root.
+    world : mpi4py.MPI.Comm
+        MPI parallel communicator.
+    root : int, optional
+        The MPI rank to broadcast from. Default is 0.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        A read only view of the node's copy of the array on every rank.
+
+    """
+    from mpi4py import MPI
+
+    myType = bcastType(self, world, root=root)
+    assert myType != 'list', TypeError("Use MPI.Bcast_list for lists")
+    nDim = Bcast_1int(np.ndim(self), world, root=root)
+    if (nDim == 0):
+        return Bcast(self, world, root=root)
+    shape = Bcast(np.asarray(np.shape(self)), world, root=root)
+
+    node, leaders = nodeComms(world, root)
+
+    # Only the first rank on each node allocates the memory
+    itemSize = np.dtype(myType).itemsize
+    nBytes = int(np.prod(shape)) * itemSize if node.rank == 0 else 0
+    window = MPI.Win.Allocate_shared(nBytes, itemSize, comm=node)
+    _sharedWindows.append(window)
+    buf, itemSize = window.Shared_query(0)
+    this = np.ndarray(buffer=buf, dtype=myType, shape=shape)
+
+    if (node.rank == 0):
+        if (world.rank == root):
+            this[...] = self
+        leaders.Bcast(this, root=0)
+    node.Barrier()
+
+    this.flags.writeable = False
+    return this
+
+
 def Scatterv(self, starts, chunks, world, axis=0, root=0):
     """ScatterV an array to all ranks in an MPI communicator.
 
@@ -4,6 +4,8 @@ Module with custom file handling operations
 import re
 import numpy as np
 import os
+import hashlib
+from glob import glob, escape
 from subprocess import Popen, PIPE, STDOUT
 
 def filesExist(fNames):
@@ -231,20 +233,29 @@ def skipLines(f, N):
         next(f)  # Read but do not do anything
 
 
-def read_columns(fName, i=[-1], nHeaders=0, nLines=0):
+def read_columns(fName, i=[-1], nHeaders=0, nLines=0, chunkSize=16777216, cache=False):
     """Reads specified columns from a file
 
+    The file is read in chunks of whole lines.  Each chunk is split into its entries and only the requested columns are
+    converted to numbers, using numpy rather than a loop over the lines, so the memory used is bounded by the chunk size
+    and the size of the output.  Entries are separated by white space and/or commas.  Entries that are missing from a
+    line, or that are not numbers, are nan.
+
     Parameters
     ----------
     fName : str
         A path and/or file name.
     i : in or list of ints, optional
         The indices of the columns to read in from the file.  By default, all columns are read in.
-
+        If None, every column that has an entry on any line is read in.
     nHeaders : int, optional
         The number of header lines to skip in the file.
     nLines : int, optional
         The number of lines to read in.  By default, all lines are read in after the header lines.
+    chunkSize : int, optional
+        The number of bytes to read from the file at a time.
+    cache : bool, optional
+        Read the columns from a binary copy of the file, see cachedColumns.
 
     Returns
     -------
@@ -257,21 +268,219 @@ def read_columns(fName, i=[-1], nHeaders=0, nLines=0):
 
     if (isinstance(i, int)):
         i = [i]
-    if (nLines == 0):
-        # Get the number of lines in the file
-        nLines = getNlines(fName, nHeaders)
-    if (i[0] <= -1):
-        i = np.arange(getNcolumns(fName, nHeaders))
-    nCols = len(i)
-    values = np.zeros([nLines, nCols], dtype='float64',order='F')  # Initialize output
-    with open(fName) as f:  # Open the file
+
+    if (cache):
+        allValues = cachedColumns(fName, nHeaders, chunkSize)
+        if (i is None):
+            i = np.arange(allValues.shape[1])
+        elif (i[0] <= -1):
+            i = np.arange(getNcolumns(fName, nHeaders))
+        i = np.asarray(i, dtype=np.int64)
+        if (nLines == 0):
+            nLines = allValues.shape[0]
+        n = np.minimum(nLines, allValues.shape[0])
+        values = np.full([nLines, i.size], np.nan, order='F')
+        values[n:, :] = 0.0
+        # Columns that are not in the file are missing from every line
+        has = np.flatnonzero(i < allValues.shape[1])
+        for k in has:
+            values[:n, k] = allValues[:n, i[k]]
+        return values
+
+    if (not i is None):
+        if (i[0] <= -1):
+            i = np.arange(getNcolumns(fName, nHeaders))
+        i = np.asarray(i, dtype=np.int64)
+
+    chunks = []
+    nRead = 0
+    remainder = b''
+    with open(fName, 'rb') as f:  # Open the file
         skipLines(f, nHeaders)  # Skip header lines
-        for j, line in enumerate(f):  # For each line in the file
+        while (nLines == 0 or nRead < nLines):
+            block = f.read(chunkSize)
+            text = remainder + block
+            if (len(block) > 0):
+                # Only parse whole lines, and carry the partial last line over to the next chunk
+                cut = text.rfind(b'\n') + 1
+                text, remainder = text[:cut], text[cut:]
+            if (len(text) > 0):
+                try:
+                    chunks.append(parseColumns(text, i))
+                except:
+                    assert False, ValueError("Could not read numbers from line "+str(nRead)+" onwards in file "+fName)
+                nRead += chunks[-1].shape[0]
+            if (len(block) == 0):
+                break
+
+    nColumns = np.max([x.shape[1] for x in chunks]) if (i is None and len(chunks) > 0) else np.size(i)
+    if (i is None):
+        # Chunks without entries in the last columns are missing them
+        chunks = [np.pad(x, ((0, 0), (0, nColumns - x.shape[1])), 'constant', constant_values=np.nan) for x in chunks]
+    values = np.vstack(chunks) if len(chunks) > 0 else np.zeros([0, nColumns])
+    if (nLines == 0):
+        return np.asfortranarray(values)
+
+    out = np.zeros([nLines, nColumns], dtype='float64', order='F')  # Initialize output
+    n = np.minimum(nLines, values.shape[0])
+    out[:n, :] = values[:n, :]
+    return out
+
+
+def cacheName(fName, nHeaders=0):
+    """Gets the name of the binary cache of a text file
+
+    The name is keyed by a hash of the path, size and modification time of the file, the number of header lines, and
+    the first MB of its contents, so that a file that has been edited or replaced gets a new cache.
+
+    Parameters
+    ----------
+    fName : str
+        A path and/or file name.
+    nHeaders : int, optional
+        The number of header lines in the file.
+
+    Returns
+    -------
+    out : str
+        The name of the cache, a hidden .npy file next to the file.
+
+    """
+    fName = os.path.abspath(fName)
+    stat = os.stat(fName)
+    key = hashlib.md5(repr((fName, stat.st_size, stat.st_mtime_ns, nHeaders)).encode())
+    with open(fName, 'rb') as f:
+        key.update(f.read(1048576))
+    directory, name = os.path.split(fName)
+    return os.path.join(directory, '.{}.{}.npy'.format(name, key.hexdigest()))
+
+
+def cachedColumns(fName, nHeaders=0, chunkSize=16777216):
+    """Gets every column of a text file from its binary cache
+
+    If the cache does not exist, every column of the file is read with read_columns and written to the cache, replacing
+    any cache of an older version of the file.  The cache is a Fortran ordered .npy file that is memory mapped, so each
+    column is read from disk only when it is used.  If the cache cannot be written, e.g. the directory is read only, the
+    columns are still returned.
+
+    Parameters
+    ----------
+    fName : str
+        A path and/or file name.
+    nHeaders : int, optional
+        The number of header lines to skip in the file.
+    chunkSize : int, optional
+        The number of bytes to read from the file at a time when creating the cache.
+
+    Returns
+    -------
+    out : numpy.ndarray or numpy.memmap
+        2D array with every column of the file.
+
+    """
+    name = cacheName(fName, nHeaders)
+    if (fileExists(name)):
+        try:
+            return np.load(name, mmap_mode='r')
+        except:
+            pass
+
+    values = read_columns(fName, None, nHeaders, chunkSize=chunkSize)
+
+    directory = os.path.dirname(name)
+    tmp = '{}.{}.tmp'.format(name, os.getpid())
+    try:
+        for old in glob(os.path.join(escape(directory), '.{}.*.npy'.format(escape(os.path.basename(fName))))):
+            deleteFile(old)
+        # Write to a temporary file first so that a partially written cache is never read
+        with open(tmp, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp, name)
+    except:
+        deleteFile(tmp)
+    return values
+
+
+# Bytes that separate the entries on a line, white space and commas
+_separators = np.zeros(256, dtype=np.bool_)
+_separators[list(b' \t\n\r\x0b\x0c,')] = True
+
+
+def parseColumns(text, i):
+    """Reads the specified columns from a block of lines
+
+    Parameters
+    ----------
+    text : bytes
+        Whole lines from a file.
+    i : array of ints or None
+        The indices of the columns to read.  If None, every column that has an entry on any line is read.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        2D array of the requested columns with a row for each line.  Entries that are missing or are not numbers are nan.
+
+    """
+    buf = np.frombuffer(text, dtype=np.uint8)
+    # Entries start where a separator is followed by anything else
+    sep = _separators[buf]
+    start = ~sep
+    start[1:] &= sep[:-1]
+    starts = np.flatnonzero(start)
+    # Ends of the lines, the last line may not have a new line character
+    ends = np.flatnonzero(buf == 10)
+    if (text[-1:] != b'\n'):
+        ends = np.append(ends, buf.size)
+
+    # Number of entries on each line, and the index of the first entry of each line
+    last = starts.searchsorted(ends)
+    count = np.diff(np.hstack([0, last]))
+    first = last - count
+
+    entries = text.replace(b',', b' ').split()
+    if (i is None):
+        i = np.arange(np.max(count))
+
+    values = np.full([ends.size, i.size], np.nan)
+    n = count[0]
+    if (n > 0 and np.all(count == n)):
+        # Every line has the same number of entries, so each column is a strided slice of the entries
+        for k, j in enumerate(i):
+            if (j < n):
+                values[:, k] = str2float(entries[j::n])
+    else:
+        for k, j in enumerate(i):
+            has = np.flatnonzero(count > j)
+            if (has.size > 0):
+                values[has, k] = str2float([entries[x] for x in first[has] + j])
+    return values
+
+
+def str2float(entries):
+    """Converts strings to numbers, any that are not numbers are nan
+
+    Parameters
+    ----------
+    entries : list of str or bytes
+        The strings to convert.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        The numbers.
+
+    """
+    try:
+        return np.asarray(entries, dtype=np.float64)
+    except ValueError:
+        out = np.full(len(entries), np.nan)
+        for k, x in enumerate(entries):
             try:
-                values[j, ] = getRealNumbersfromLine(line, i)  # grab the requested entries
+                out[k] = float(x)
             except:
-                assert False, ValueError("Could not read numbers from line "+str(j)+ "in file "+fName)
-    return values
+                pass
+        return out
 
 
 def getRealNumbersfromLine(line, i=[-1], delimiters=','):
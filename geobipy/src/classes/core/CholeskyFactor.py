@@ -0,0 +1,328 @@
+""" @CholeskyFactor_Class
+Module describing the Cholesky factor of a symmetric positive definite matrix that can be updated in place
+"""
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+from .myObject import myObject
+
+
+class CholeskyFactor(myObject):
+    """Lower triangular Cholesky factor of a symmetric positive definite matrix
+
+    CholeskyFactor(A)
+
+    Represents :math:`A = LL^{T}` by its lower triangular factor :math:`L`.  Rows and columns of :math:`A` can be
+    inserted, deleted, or replaced in :math:`O(n^{2})` operations using rank one updates and downdates of the factor,
+    and linear systems are solved by back substitution so that the inverse of :math:`A` is never formed.
+
+    The factor can also represent a damped Gram matrix :math:`A = J^{T}J + \\lambda I`, see CholeskyFactor.gram.
+    In that case the columns of :math:`J` are stored and CholeskyFactor.updateGram updates the factor for only those
+    columns of a new :math:`J` that have changed.
+
+    Parameters
+    ----------
+    A : array_like, optional
+        Symmetric positive definite matrix to factor.
+
+    Returns
+    -------
+    out : CholeskyFactor
+        The factored matrix.
+
+    """
+
+    def __init__(self, A=None):
+        """ Initialize the Cholesky factor """
+        self.L = None
+        self.J = None
+        self.damping = None
+
+        if (A is None):
+            return
+
+        A = np.asarray(A, dtype=np.float64)
+        assert A.ndim == 2 and A.shape[0] == A.shape[1], ValueError('A must be a square matrix')
+        self.L = np.linalg.cholesky(A)
+
+
+    @classmethod
+    def gram(cls, J, damping):
+        """Factor the damped Gram matrix :math:`J^{T}J + \\lambda I`
+
+        Parameters
+        ----------
+        J : array_like
+            2D matrix whose columns define the Gram matrix.
+        damping : float
+            Value :math:`\\lambda` added to the diagonal.
+
+        Returns
+        -------
+        out : CholeskyFactor
+            Factor of the damped Gram matrix that keeps a copy of J for future updates.
+
+        """
+        J = np.asarray(J, dtype=np.float64)
+        out = cls(np.dot(J.T, J) + np.eye(J.shape[1]) * damping)
+        out.J = J.copy()
+        out.damping = np.float64(damping)
+        return out
+
+
+    @property
+    def size(self):
+        """Number of rows of the factored matrix"""
+        return 0 if self.L is None else self.L.shape[0]
+
+
+    def deepcopy(self):
+        """ Define a deepcopy routine """
+        return self.__deepcopy__()
+
+
+    def __deepcopy__(self, memo=None):
+        """ Define a deepcopy routine """
+        other = CholeskyFactor()
+        other.L = None if self.L is None else self.L.copy()
+        other.J = None if self.J is None else self.J.copy()
+        other.damping = self.damping
+        return other
+
+
+    def scale(self, value):
+        """Get the factor of the matrix multiplied by a scalar
+
+        Parameters
+        ----------
+        value : float
+            Positive scalar multiplying the matrix.
+
+        Returns
+        -------
+        out : CholeskyFactor
+            Factor of value * A.  The Gram columns are not carried over.
+
+        """
+        assert value > 0.0, ValueError('value must be positive')
+        other = CholeskyFactor()
+        other.L = self.L * np.sqrt(value)
+        return other
+
+
+    def solve(self, b):
+        """Solve :math:`Ax = b` using the factor
+
+        Parameters
+        ----------
+        b : array_like
+            Right hand side.
+
+        Returns
+        -------
+        out : array_like
+            Solution x.
+
+        """
+        return cho_solve((self.L, True), b)
+
+
+    def solveLT(self, b):
+        """Solve :math:`L^{T}x = b`
+
+        If b is a vector of independent standard normal samples, x is a sample with covariance :math:`A^{-1}`.
+
+        Parameters
+        ----------
+        b : array_like
+            Right hand side.
+
+        Returns
+        -------
+        out : array_like
+            Solution x.
+
+        """
+        return solve_triangular(self.L, b, lower=True, trans='T')
+
+
+    def dot(self, x):
+        """Compute :math:`Ax` using the factor """
+        return np.dot(self.L, np.dot(self.L.T, x))
+
+
+    def quadratic(self, x):
+        """Compute the quadratic form :math:`x^{T}Ax` """
+        tmp = np.dot(self.L.T, x)
+        return np.dot(tmp, tmp)
+
+
+    def logDet(self):
+        """Compute the log determinant of the factored matrix """
+        return 2.0 * np.sum(np.log(np.diag(self.L)))
+
+
+    def toarray(self):
+        """Form the factored matrix A explicitly """
+        return np.dot(self.L, self.L.T)
+
+
+    def update(self, x):
+        """Rank one update, the factor of :math:`A + xx^{T}` """
+        self._rankOne(self.L, x, 1.0)
+
+
+    def downdate(self, x):
+        """Rank one downdate, the factor of :math:`A - xx^{T}`
+
+        Raises
+        ------
+        ValueError
+            If the downdated matrix is not positive definite.
+
+        """
+        self._rankOne(self.L, x, -1.0)
+
+
+    @staticmethod
+    def _rankOne(L, x, sign):
+        """ Apply a rank one update (sign=1) or downdate (sign=-1) to the lower triangular factor L in place """
+        x = np.array(x, dtype=np.float64)
+        n = x.size
+        for k in range(n):
+            Lkk = L[k, k]
+            r2 = Lkk**2.0 + sign * x[k]**2.0
+            assert r2 > 0.0, ValueError('Rank one downdate results in a matrix that is not positive definite')
+            r = np.sqrt(r2)
+            c = r / Lkk
+            s = x[k] / Lkk
+            L[k, k] = r
+            if (k < n - 1):
+                L[k+1:, k] = (L[k+1:, k] + sign * s * x[k+1:]) / c
+                x[k+1:] = c * x[k+1:] - s * L[k+1:, k]
+
+
+    def insert(self, i, a):
+        """Insert a row and column into the factored matrix
+
+        Parameters
+        ----------
+        i : int
+            Index of the new row and column in the enlarged matrix.
+        a : array_like
+            The new column of the enlarged matrix, of length size + 1, with the diagonal entry at a[i].
+
+        Raises
+        ------
+        ValueError
+            If the enlarged matrix is not positive definite.
+
+        """
+        n = self.size
+        assert 0 <= i <= n, ValueError('i must be in [0, {}]'.format(n))
+        a = np.asarray(a, dtype=np.float64)
+        assert a.size == n + 1, ValueError('a must have size {}'.format(n + 1))
+
+        L = np.zeros([n + 1, n + 1])
+        L[:i, :i] = self.L[:i, :i]
+        L[i+1:, :i] = self.L[i:, :i]
+        L[i+1:, i+1:] = self.L[i:, i:]
+
+        # Row i of the new factor
+        l21 = solve_triangular(self.L[:i, :i], a[:i], lower=True) if i > 0 else np.zeros(0)
+        l22 = a[i] - np.dot(l21, l21)
+        assert l22 > 0.0, ValueError('Inserting a results in a matrix that is not positive definite')
+        l22 = np.sqrt(l22)
+        L[i, :i] = l21
+        L[i, i] = l22
+
+        if (i < n):
+            # Column i below the diagonal, and a downdate of the trailing block
+            l32 = (a[i+1:] - np.dot(L[i+1:, :i], l21)) / l22
+            L[i+1:, i] = l32
+            self._rankOne(L[i+1:, i+1:], l32, -1.0)
+
+        self.L = L
+
+
+    def delete(self, i):
+        """Delete a row and column from the factored matrix
+
+        Parameters
+        ----------
+        i : int
+            Index of the row and column to remove.
+
+        """
+        n = self.size
+        assert 0 <= i < n, ValueError('i must be in [0, {})'.format(n))
+
+        l32 = self.L[i+1:, i].copy()
+        L = np.delete(np.delete(self.L, i, axis=0), i, axis=1)
+        if (i < n - 1):
+            # The trailing block absorbs the deleted column
+            self._rankOne(L[i:, i:], l32, 1.0)
+        self.L = L
+
+
+    def replace(self, i, a):
+        """Replace a row and column of the factored matrix
+
+        Parameters
+        ----------
+        i : int
+            Index of the row and column to replace.
+        a : array_like
+            The new column of the matrix, of length size, with the diagonal entry at a[i].
+
+        """
+        self.delete(i)
+        self.insert(i, a)
+
+
+    def updateGram(self, J, option=None, i=None):
+        """Update the factor of a damped Gram matrix to a new matrix J
+
+        Structural changes follow the conventions of EmDataPoint.updateSensitivity.  If a layer was created,
+        J has an additional column at i + 1, and if a layer was deleted, the column at i + 1 of the previous matrix
+        is removed.  Every column of J that differs from the stored matrix is then replaced in the factor.
+        If too many columns changed, the matrix is factored from scratch instead.
+
+        Parameters
+        ----------
+        J : array_like
+            2D matrix whose columns define the Gram matrix.
+        option : int, optional
+            0 if a column was created, 1 if a column was deleted, otherwise the number of columns is unchanged.
+        i : int, optional
+            Index of the layer that was created or deleted.
+
+        """
+        assert not self.J is None, ValueError('The factor must have been created with CholeskyFactor.gram')
+        J = np.asarray(J, dtype=np.float64)
+
+        Jold = self.J
+        if (option == 0):
+            self.insert(i + 1, np.hstack([np.dot(Jold[:, :i+1].T, J[:, i+1]), np.dot(J[:, i+1], J[:, i+1]) + self.damping, np.dot(Jold[:, i+1:].T, J[:, i+1])]))
+            Jold = np.insert(Jold, i + 1, J[:, i+1], axis=1)
+        elif (option == 1):
+            self.delete(i + 1)
+            Jold = np.delete(Jold, i + 1, axis=1)
+
+        assert Jold.shape == J.shape, ValueError('J must have shape {}'.format(Jold.shape))
+
+        changed = np.where(np.any(Jold != J, axis=0))[0]
+
+        # Replacing a column costs roughly as much as a sixth of a full factorization
+        if (6 * changed.size > J.shape[1]):
+            other = CholeskyFactor.gram(J, self.damping)
+            self.L = other.L
+            self.J = other.J
+            return
+
+        Jold = Jold.copy()
+        for j in changed:
+            Jold[:, j] = J[:, j]
+            a = np.dot(Jold.T, J[:, j])
+            a[j] += self.damping
+            self.replace(j, a)
+        self.J = Jold
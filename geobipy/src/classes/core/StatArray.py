@@ -8,7 +8,7 @@ from ..statistics.Distribution import Distribution
 from ..statistics.baseDistribution import baseDistribution
 from ...base.customFunctions import str_to_raw, isIntorSlice
 from .myObject import myObject
-from ...base.HDF.hdfWrite import writeNumpy
+from ...base.HDF.hdfWrite import writeNumpy, createRepeated
 from ...base import MPI as myMPI
 
 from sklearn.mixture import GaussianMixture
@@ -217,6 +217,18 @@ class StatArray(np.ndarray, myObject):
         return other
 
 
+    def __reduce__(self):
+        """ Pickle the name, units, prior and proposal along with the values """
+        pickled = np.ndarray.__reduce__(self)
+        return (pickled[0], pickled[1], (pickled[2], self.__dict__))
+
+
+    def __setstate__(self, state):
+        """ Unpickle the name, units, prior and proposal along with the values """
+        np.ndarray.__setstate__(self, state[0])
+        self.__dict__.update(state[1])
+
+
     def delete(self, i, axis=None):
         """Delete elements
 
@@ -987,7 +999,8 @@ class StatArray(np.ndarray, myObject):
             Inserts a first dimension into the shape of the StatArray of length nRepeats. This can be used to extend the available memory of 
             the StatArray so that multiple MPI ranks can write to their respective parts in the extended memory.
         fillvalue : number, optional
-            Initializes the memory in file with the fill value
+            Initializes the memory in file with the fill value. If nRepeats is given, the fill value is stored with the dataset
+            but is not written to the file, so repeats that have not been written are undefined.
 
         Notes
         -----
@@ -1029,10 +1042,11 @@ class StatArray(np.ndarray, myObject):
         grp = h5obj.create_group(myName)
         grp.attrs["repr"] = self.hdfName()
         if (not nRepeats is None):
+            # A fill value of zero is not written to the file, see createRepeated
             if (self.size == 1):
-                grp.create_dataset('data', [nRepeats], dtype=self.dtype, fillvalue=fillvalue)
+                createRepeated(grp, 'data', [nRepeats], dtype=self.dtype, fillvalue=fillvalue)
             else:
-                grp.create_dataset('data', [nRepeats,*self.shape], dtype=self.dtype, fillvalue=fillvalue)
+                createRepeated(grp, 'data', [nRepeats,*self.shape], dtype=self.dtype, fillvalue=fillvalue)
         else:
             grp.create_dataset('data', self.shape, dtype=self.dtype, fillvalue=fillvalue)
 
@@ -1235,7 +1249,7 @@ class StatArray(np.ndarray, myObject):
 
     ### MPI Routines
 
-    def Bcast(self, world, root=0):
+    def Bcast(self, world, root=0, shared=False):
         """Broadcast the StatArray to every rank in the MPI communicator.
 
         Parameters
@@ -1244,6 +1258,8 @@ class StatArray(np.ndarray, myObject):
             The MPI communicator over which to broadcast.
         root : int, optional
             The rank from which to broadcast.  Default is 0 for the master rank.
+        shared : bool, optional
+            Every rank on a node gets a read only view of a single copy in shared memory, see MPI.Bcast_shared.
 
         Returns
         -------
@@ -1253,7 +1269,10 @@ class StatArray(np.ndarray, myObject):
         """
         name = world.bcast(self.name, root=root)
         units = world.bcast(self.units, root=root)
-        tmp = myMPI.Bcast(self, world, root=root)
+        if (shared):
+            tmp = myMPI.Bcast_shared(self, world, root=root)
+        else:
+            tmp = myMPI.Bcast(self, world, root=root)
         this = StatArray(tmp, name, units, dtype=tmp.dtype)
         return this
 
@@ -4,6 +4,7 @@ from ....classes.core.StatArray import StatArray
 from ....base import customFunctions as cf
 from ....base import customPlots as cP
 import numpy as np
+from scipy.optimize import minimize_scalar
 from ....base.logging import myLogger
 import matplotlib.pyplot as plt
 
@@ -25,11 +26,12 @@ class EmDataPoint(myObject):
         raise NotImplementedError("Cannot instantiate this class, use a subclass")
 
 
-    def FindBestHalfSpace(self, minConductivity=-4.0, maxConductivity=2.0, nSamples=100):
+    def FindBestHalfSpace(self, minConductivity=-4.0, maxConductivity=2.0, nSamples=25, returnMisfit=False):
         """Computes the best value of a half space that fits the data.
 
-        Carries out a brute force search of the halfspace conductivity that best fits the data.
         The profile of data misfit vs halfspace conductivity is not quadratic, so a bisection will not work.
+        Instead the misfit is evaluated for a log spaced sweep of conductivities with EmDataPoint.halfSpaceMisfits,
+        and the best conductivity of the sweep is polished with a bounded Brent search between its neighbours.
 
         Parameters
         ----------
@@ -37,27 +39,86 @@ class EmDataPoint(myObject):
             The minimum log10 conductivity to search over
         maxConductivity : float, optional
             The maximum log10 conductivity to search over
-        nInc : int, optional
-            The number of increments between the min and max
+        nSamples : int, optional
+            The number of conductivities in the sweep between the min and max
+        returnMisfit : bool, optional
+            Also return the conductivities of the sweep and their data misfits
 
         Returns
         -------
         out : np.float64
-            The best fitting log10 conductivity for the half space
+            The best fitting conductivity for the half space
+        c : geobipy.StatArray, optional
+            The conductivities of the sweep, if returnMisfit is True
+        PhiD : geobipy.StatArray, optional
+            The squared data misfit of each conductivity in the sweep, if returnMisfit is True
 
         """
         assert maxConductivity > minConductivity, ValueError("Maximum conductivity must be greater than the minimum")
-        # ####lg.myLogger("Global"); ####lg.indent()
-        c = np.logspace(minConductivity, maxConductivity, nSamples)
-        PhiD = np.zeros(nSamples)
-        Mod = Model1D(1)
-        for i in range(nSamples):
-            Mod.par[0] = c[i]
-            self.forward(Mod)
-            PhiD[i] = self.dataMisfit(squared=True)
+        assert nSamples > 1, ValueError("nSamples must be greater than 1")
+
+        c = StatArray(np.logspace(minConductivity, maxConductivity, nSamples), 'Conductivity', '$S/m$')
+        PhiD = self.halfSpaceMisfits(c)
         i = np.argmin(PhiD)
-        # ####lg.dedent()
-        return c[i]
+
+        # Polish the best sample of the sweep in log10 space between its neighbours
+        logC = np.log10(c)
+        bounds = (logC[max(i - 1, 0)], logC[min(i + 1, nSamples - 1)])
+        res = minimize_scalar(lambda x: self.halfSpaceMisfits(10.0**x)[0], bounds=bounds, method='bounded', options={'xatol': 1e-3})
+
+        out = np.float64(10.0**res.x) if res.fun < PhiD[i] else np.float64(c[i])
+
+        if returnMisfit:
+            return out, c, PhiD
+        return out
+
+
+    def halfSpaceMisfits(self, conductivity):
+        """Computes the data misfit of half space models.
+
+        Subclasses can override this method to forward model many half spaces at once.
+
+        Parameters
+        ----------
+        conductivity : array_like
+            The conductivities of the half spaces.
+
+        Returns
+        -------
+        out : geobipy.StatArray
+            The squared data misfit of each half space.
+
+        """
+        conductivity = np.atleast_1d(conductivity)
+        PhiD = StatArray(conductivity.size, 'Data Misfit', '')
+        mod = Model1D(1)
+        for i in range(conductivity.size):
+            mod.par[0] = conductivity[i]
+            self.forward(mod)
+            PhiD[i] = self.dataMisfit(squared=True)
+        return PhiD
+
+
+    def forwardSensitivity(self, mod, scale=False):
+        """Forward model the data and compute the sensitivity matrix for the given model
+
+        Subclasses can override this method to share work between the forward model and the sensitivity.
+
+        Parameters
+        ----------
+        mod : geobipy.Model
+            The model to forward model.
+        scale : bool, optional
+            Scale the rows of the sensitivity matrix by the data errors.
+
+        Returns
+        -------
+        out : geobipy.StatArray
+            The sensitivity matrix.
+
+        """
+        self.forward(mod)
+        return self.sensitivity(mod, scale=scale)
 
 
     def getActiveData(self):
@@ -145,7 +206,7 @@ class EmDataPoint(myObject):
         return probability
 
 
-    def propose(self, height, rErr, aErr, calibration):
+    def propose(self, height, rErr, aErr, calibration, inPlace=False):
         """Propose a new EM data point given the specified attached propsal distributions
 
         Parameters
@@ -158,6 +219,8 @@ class EmDataPoint(myObject):
             Propose a new observation height.
         calibration : bool
             Propose new calibration parameters.
+        inPlace : bool, optional
+            Modify this data point rather than a copy of it.  Use self.saveState beforehand so that the proposal can be undone with self.restoreState.
 
         Returns
         -------
@@ -174,7 +237,7 @@ class EmDataPoint(myObject):
             If a proposal has not been set on a requested parameter
 
         """
-        other = self.deepcopy()
+        other = self if inPlace else self.deepcopy()
         if (height):  # Update the candidate data elevation (if required)
             # Generate a new elevation
             other.z[:] = self.z.proposal.rng(1)
@@ -216,6 +279,115 @@ class EmDataPoint(myObject):
         return other
 
 
+    def saveState(self):
+        """Record the current state of the data point so that an in-place proposal can be undone.
+
+        The height, errors, calibration, predicted data, and the means of their proposals are copied into buffers that are allocated on the first call.
+        The sensitivity matrix is kept by reference since it is replaced, rather than modified, during a proposal.
+
+        See Also
+        --------
+        geobipy.EmDataPoint.restoreState : Undo any changes made since the last call to saveState
+
+        """
+        undo = getattr(self, '_undo', None)
+        if (undo is None):
+            undo = {}
+            for key in ['z', 'relErr', 'addErr', 'calibration', 's', 'p']:
+                this = getattr(self, key, None)
+                if (this is None):
+                    continue
+                undo[key] = np.zeros(this.shape)
+                if (this.hasProposal()):
+                    if (np.ndim(this.proposal.mean) > 0):
+                        undo[key + 'Mean'] = np.zeros(np.shape(this.proposal.mean))
+            if (self.p.hasPrior()):
+                undo['pVariance'] = np.zeros(np.shape(self.p.prior.variance))
+            self._undo = undo
+
+        for key in ['z', 'relErr', 'addErr', 'calibration', 's', 'p']:
+            if (key in undo):
+                this = getattr(self, key)
+                undo[key][:] = this
+                if (key + 'Mean' in undo):
+                    undo[key + 'Mean'][:] = this.proposal.mean
+        if ('pVariance' in undo):
+            undo['pVariance'][:] = self.p.prior.variance
+        undo['J'] = self.J
+
+
+    def restoreState(self):
+        """Undo any changes made to the data point since the last call to self.saveState
+
+        See Also
+        --------
+        geobipy.EmDataPoint.saveState : Record the data point before an in-place proposal
+
+        """
+        undo = getattr(self, '_undo', None)
+        assert (not undo is None), TypeError('No state has been saved. Use EmDataPoint.saveState() first.')
+        for key in ['z', 'relErr', 'addErr', 'calibration', 's', 'p']:
+            if (key in undo):
+                this = getattr(self, key)
+                this[:] = undo[key]
+                if (key + 'Mean' in undo):
+                    this.proposal.mean[:] = undo[key + 'Mean']
+        if ('pVariance' in undo):
+            self.p.prior.variance = undo['pVariance'].copy()
+        self.J = undo['J']
+
+
+    def getSampledState(self):
+        """Get a copy of the parts of the data point that change while a Markov chain samples it
+
+        These are the same parts that saveState records.  The observed data, the systems and the priors are left out,
+        so the state can be sent to another process that holds its own copy of the data point.
+
+        Returns
+        -------
+        out : dict
+            The state, which can be given to setSampledState.
+
+        See Also
+        --------
+        geobipy.EmDataPoint.setSampledState : Set the state of a copy of this data point
+
+        """
+        state = {}
+        for key in ['z', 'relErr', 'addErr', 'calibration', 's', 'p']:
+            this = getattr(self, key, None)
+            if (this is None):
+                continue
+            state[key] = np.array(this)
+            if (this.hasProposal()):
+                if (np.ndim(this.proposal.mean) > 0):
+                    state[key + 'Mean'] = np.array(this.proposal.mean)
+        if (self.p.hasPrior()):
+            state['pVariance'] = np.array(self.p.prior.variance)
+        state['J'] = self.J
+        return state
+
+
+    def setSampledState(self, state):
+        """Set the parts of the data point that change while a Markov chain samples it
+
+        Parameters
+        ----------
+        state : dict
+            A state from getSampledState, of this data point or of a copy of it.
+
+        """
+        for key in ['z', 'relErr', 'addErr', 'calibration', 's', 'p']:
+            if (key in state):
+                this = getattr(self, key)
+                this[:] = state[key]
+                if (key + 'Mean' in state):
+                    this.proposal.mean[:] = state[key + 'Mean']
+        if ('pVariance' in state):
+            self.p.prior.variance = state['pVariance'].copy()
+        self.J = state['J']
+
+
     def plotHalfSpaceResponses(self, minConductivity=-4.0, maxConductivity=2.0, nSamples=100, **kwargs):
         """Plots the reponses of different half space models.
 
@@ -231,12 +403,7 @@ class EmDataPoint(myObject):
         """
 
         c = StatArray(np.logspace(minConductivity, maxConductivity, nSamples), 'Conductivity', '$S/m$')
-        PhiD = StatArray(c.size, 'Data Misfit', '')
-        mod = Model1D(1)
-        for i in range(c.size):
-            mod.par[0] = c[i]
-            self.forward(mod)
-            PhiD[i] = self.dataMisfit(squared=True)
+        PhiD = self.halfSpaceMisfits(c)
         plt.loglog(c, PhiD, **kwargs)
         cP.xlabel(c.getNameUnits())
         cP.ylabel('Data misfit')
@@ -359,6 +526,6 @@ class EmDataPoint(myObject):
         tmp = (relativeErr * self.d)**2.0 + additiveErr**2.0
 
         if self.p.hasPrior():
-            self.p.prior.variance[:] = tmp[self.iActive]
+            self.p.prior.variance = tmp[self.iActive]
 
         self.s[:] = np.sqrt(tmp)
\ No newline at end of file
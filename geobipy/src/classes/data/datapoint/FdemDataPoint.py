@@ -4,7 +4,7 @@ Module describing a frequency domain EMData Point that contains a single measure
 from copy import copy, deepcopy
 from ....classes.core.StatArray import StatArray
 #from ...forwardmodelling.EMfor1D_F import fdem1dfwd
-from ...forwardmodelling.EMfor1D_F import fdem1dfwd, fdem1dsen
+from ...forwardmodelling.EMfor1D_F import fdem1dfwd, fdem1dfwdBatch, fdem1dsen, fdem1dfwdsen
 from .EmDataPoint import EmDataPoint
 from ...model.Model import Model
 from ...model.Model1D import Model1D
@@ -396,44 +396,37 @@ class FdemDataPoint(EmDataPoint):
         return self.sensitivity(mod, scale=scale)
 
 
-    def FindBestHalfSpace(self):
-        """ Uses the bisection approach to find a half space conductivity that best matches the EM data by minimizing the data misfit """
-        # ####lg.myLogger('Global');####lg.indent()
-        ####lg.info('Finding Best Half Space Model')
-        c1 = 2.0
-        c2 = -6.0
-        cnew = 0.5 * (c1 + c2)
-        # Initialize a single layer model
-        mod = Model1D(1)
-        # Initialize the first conductivity
-        mod.par[0] = 10.0**c1
-        self.forward(mod)  # Forward model the EM data
-        PhiD1 = self.dataMisfit(squared=True)  # Compute the measure between observed and predicted data
-        # Initialize the second conductivity
-        mod.par[0] = 10.0**c2
-        self.forward(mod)  # Forward model the EM data
-        PhiD2 = self.dataMisfit(squared=True)  # Compute the measure between observed and predicted data
-        # Compute a relative change in the data misfit
-        dPhiD = abs(PhiD2 - PhiD1) / PhiD2
-        i = 1
-        ####lg.debug('Entering Bisection')
-        # Continue until there is less than 1% change
-        while (dPhiD > 0.01 and i < 100):
-            ####lg.debug('c1,c2,cnew: '+str([c1,c2,cnew]))
-            cnew = 0.5 * (c1 + c2)  # Bisect the conductivities
-            mod.par[0] = 10.0**cnew
-            self.forward(mod)  # Forward model the EM data
-            PhiDnew = self.dataMisfit(squared=True)
-            if (PhiD2 > PhiDnew):
-                c2 = cnew
-                PhiD2 = PhiDnew
-            elif (PhiD1 > PhiDnew):
-                c1 = cnew
-                PhiD1 = PhiDnew
-            dPhiD = abs(PhiD2 - PhiD1) / PhiD2
-            i += 1
-        # ####lg.dedent()
-        return np.float64(10.0**cnew)
+    def FindBestHalfSpace(self, minConductivity=-6.0, maxConductivity=2.0, nSamples=33, returnMisfit=False):
+        """Computes the best value of a half space that fits the data, see EmDataPoint.FindBestHalfSpace
+
+        Frequency domain data are searched down to 1e-6 S/m, with the same number of samples per decade as the default
+        sweep, so that resistive ground is not clamped to the edge of the sweep.
+
+        """
+        return EmDataPoint.FindBestHalfSpace(self, minConductivity, maxConductivity, nSamples, returnMisfit)
+
+
+    def halfSpaceMisfits(self, conductivity):
+        """Computes the data misfit of half space models with a single batched forward model
+
+        Parameters
+        ----------
+        conductivity : array_like
+            The conductivities of the half spaces.
+
+        Returns
+        -------
+        out : geobipy.StatArray
+            The squared data misfit of each half space.
+
+        """
+        assert not any(self.s[self.iActive] == 0.0), ValueError('Cannot compute the misfit when the data standard deviations are zero.')
+        conductivity = np.atleast_1d(np.asarray(conductivity, dtype=np.float64))
+        n = conductivity.size
+        tmp = fdem1dfwdBatch(self.sys, conductivity[:, np.newaxis], np.zeros([n, 1]), np.ones(n), -self.z[0])
+        p = np.hstack([tmp.real, tmp.imag])[:, self.iActive]
+        PhiD = np.sum(((p - self.d[self.iActive]) / self.s[self.iActive])**2.0, axis=1, dtype=np.float64)
+        return StatArray(PhiD, 'Data Misfit', '')
 
 
     def forward(self, mod):
@@ -444,6 +437,37 @@ class FdemDataPoint(EmDataPoint):
         self._forward1D(mod)
 
 
+    @staticmethod
+    def forwardBatch(dataPoints, models):
+        """Forward model many data points that share a system, each from its own model, with a single call
+
+        Parameters
+        ----------
+        dataPoints : list of FdemDataPoint
+            The data points, whose predicted data are set.  They must all have the same FdemSystem.
+        models : list of Model1D
+            The model of each data point.
+
+        """
+        S = dataPoints[0].sys
+        assert all(D.sys is S for D in dataPoints), ValueError('The data points must share a system')
+        assert len(models) == len(dataPoints), ValueError('models must have length {}'.format(len(dataPoints)))
+
+        # Pad the models to the same number of layers
+        nCells = np.asarray([mod.nCells[0] for mod in models], dtype=np.int32)
+        par = np.ones([nCells.size, np.max(nCells)])
+        thk = np.zeros([nCells.size, np.max(nCells)])
+        for i, mod in enumerate(models):
+            assert isinstance(mod, Model1D), TypeError("Invalid model class for forward modeling [1D]")
+            par[i, :nCells[i]] = mod.par[:nCells[i]]
+            thk[i, :nCells[i]] = mod.thk[:nCells[i]]
+
+        tmp = fdem1dfwdBatch(S, par, thk, nCells, np.asarray([-D.z[0] for D in dataPoints]))
+        for D, t in zip(dataPoints, tmp):
+            D.p[:S.nFreq] = t.real
+            D.p[S.nFreq:] = t.imag
+
+
     def sensitivity(self, mod, scale=False):
         """ Compute the sensitivty matrix for the given model """
 
@@ -452,6 +476,18 @@ class FdemDataPoint(EmDataPoint):
         return StatArray(self._sensitivity1D(mod, scale), 'Sensitivity', '$\\frac{ppm.m}{S}$')
 
 
+    def forwardSensitivity(self, mod, scale=False):
+        """ Forward model the data and compute the sensitivity matrix for the given model with a single recursion over the layers """
+
+        assert isinstance(mod, Model), TypeError("Invalid model class for sensitivity matrix [1D]")
+
+        tmp, Jtmp = fdem1dfwdsen(self.sys, mod, -self.z[0])
+        self.p[:self.sys.nFreq] = tmp.real
+        self.p[self.sys.nFreq:] = tmp.imag
+
+        return StatArray(self._arrangeSensitivity(Jtmp, scale), 'Sensitivity', '$\\frac{ppm.m}{S}$')
+
+
     def _forward1D(self, mod):
         """ Forward model the data from a 1D layered earth model """
         tmp = fdem1dfwd(self.sys, mod, -self.z[0])
@@ -462,10 +498,14 @@ class FdemDataPoint(EmDataPoint):
     def _sensitivity1D(self, mod, scale=False):
         """ Compute the sensitivty matrix for a 1D layered earth model """
         Jtmp = fdem1dsen(self.sys, mod, -self.z[0])
+        return self._arrangeSensitivity(Jtmp, scale)
+
 
+    def _arrangeSensitivity(self, Jtmp, scale=False):
+        """ Split the complex sensitivity matrix into real and imaginary rows for the active data """
         # Re-arrange the sensitivity matrix to Real:Imaginary vertical
         # concatenation
-        J = np.zeros([2 * self.sys.nFreq, mod.nCells[0]])
+        J = np.zeros([2 * self.sys.nFreq, Jtmp.shape[1]])
         J[:self.sys.nFreq, :] = Jtmp.real
         J[self.sys.nFreq:, :] = Jtmp.imag
 
@@ -146,7 +146,7 @@ class TdemDataPoint(EmDataPoint):
         memo[id(self)] = result
         items = self.__dict__.items()
         for k, v in items:
-            if (k != 'sys'):
+            if (not k in ['sys', '_undo']):
                 setattr(result, k, deepcopy(v, memo))
         result.sys = self.sys
         return result
@@ -505,7 +505,7 @@ class TdemDataPoint(EmDataPoint):
 
         # Update the variance of the predicted data prior
         if self.p.hasPrior():
-            self.p.prior.variance[:] = self.s[self.iActive]**2.0
+            self.p.prior.variance = self.s[self.iActive]**2.0
 
 
     def updateSensitivity(self, J, mod, option, scale=False):
@@ -80,8 +80,9 @@ class Data(PointCloud3D):
         cols[0,1,2,...] should be the indices of the x,y,z co-ordinates """
         nCols = len(cols)
         #if any([cols < 0]): err.Emsg("Please specify the columns to read the first three indices should be xyz")
-        # Get the number of points
-        nLines = fIO.getNlines(fname, nHeaders)
+        # Read the requested columns
+        values = fIO.read_columns(fname, cols, nHeaders)
+        nLines = values.shape[0]
         # Get the number of Data if none was specified
         if (nChannels == 0):
             nChannels = nCols - 3
@@ -93,16 +94,11 @@ class Data(PointCloud3D):
         self.y.name=names[1]
         self.z.name=names[2]
         self.names=names[3:]
-        # Read each line assign the values to the class
-        with open(fname) as f:
-            fIO.skipLines(f, nHeaders)  # Skip header lines
-            for j, line in enumerate(f):  # For each line in the file
-                values = fIO.getRealNumbersfromLine(line, cols)  # grab the requested entries
-                # Assign values into object
-                self.x[j] = values[0]
-                self.y[j] = values[1]
-                self.z[j] = values[2]
-                self.D[j, ] = values[3:]
+        # Assign values into object
+        self.x[:] = values[:, 0]
+        self.y[:] = values[:, 1]
+        self.z[:] = values[:, 2]
+        self.D[:, :] = values[:, 3:]
 
 
     def getChannel(self, channel):
@@ -211,7 +207,19 @@ class Data(PointCloud3D):
         self.s[:] = np.sqrt((relativeErr * self.d)**2.0 + additiveErr**2.0)
 
 
-    def Bcast(self, world, root=0):
+    def pointRows(self):
+        """Get the values of each point as the rows of a 2D array, see PointCloud3D.pointRows
+
+        Returns
+        -------
+        out : numpy.ndarray
+            The x, y, z co-ordinates, data, and standard deviations of each point.
+
+        """
+        return np.hstack([PointCloud3D.pointRows(self), self.D, self.Std])
+
+
+    def Bcast(self, world, root=0, shared=False):
         """Broadcast a Data object using MPI
 
         Parameters
@@ -220,6 +228,8 @@ class Data(PointCloud3D):
             MPI communicator
         root : int, optional
             The MPI rank to broadcast from. Default is 0.
+        shared : bool, optional
+            The data and standard deviations are read only views of a single copy per node in shared memory.
 
         Returns
         -------
@@ -235,7 +245,7 @@ class Data(PointCloud3D):
         this.x = pc3d.x
         this.y = pc3d.y
         this.z = pc3d.z
-        this.set = self.set.Bcast(world, root=root)
+        this.set = self.set.Bcast(world, root=root, shared=shared)
         # this.D = self.D.Bcast(world, root=root)
         # this.Std = self.Std.Bcast(world, root=root)
         return this
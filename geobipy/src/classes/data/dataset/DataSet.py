@@ -33,7 +33,7 @@ class DataSet(myObject):
         self.nPoints = nPoints
         self.nChannels = nChannels
 
-    def Bcast(self, world, root=0):
+    def Bcast(self, world, root=0, shared=False):
         """Broadcast the DataSet using MPI 
         
         Parameters
@@ -42,6 +42,8 @@ class DataSet(myObject):
             MPI communicator
         root : int, optional
             The MPI rank to broadcast from. Default is 0.
+        shared : bool, optional
+            The data and standard deviations are read only views of a single copy per node in shared memory.
 
         Returns
         -------
@@ -52,8 +54,8 @@ class DataSet(myObject):
         nPoints = MPI.Bcast(self.nPoints, world, root=root)
         nChannels = MPI.Bcast(self.nChannels, world, root=root)
         this = DataSet(nPoints, nChannels)
-        this.D = self.D.Bcast(world, root=root)
-        this.Std = self.Std.Bcast(world, root=root)
+        this.D = self.D.Bcast(world, root=root, shared=shared)
+        this.Std = self.Std.Bcast(world, root=root, shared=shared)
         return this
 
 
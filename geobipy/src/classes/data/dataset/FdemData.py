@@ -9,6 +9,7 @@ from ....classes.core.StatArray import StatArray
 from ...system.FdemSystem import FdemSystem
 import numpy as np
 from ....base import fileIO as fIO
+from ....base import MPI as myMPI
 #from ....base import Error as Err
 import matplotlib.pyplot as plt
 
@@ -86,7 +87,7 @@ class FdemData(Data):
                 self.names[i] = self.getMeasurementType(i) + str(self.getFrequency(i))+' (Hz)'
 
 
-    def read(self, dataFname, systemFname):
+    def read(self, dataFname, systemFname, cache=False):
         """Read in both the Fdem data and FDEM system files
         
         The data file is structured using columns with the first line containing header information.
@@ -107,6 +108,9 @@ class FdemData(Data):
         tmom and rmom are the moments of the loops.
         t/rx,y,z are the loop offsets from the observation locations in the data file.
 
+        If cache is True, the columns are read from a binary copy of the data file that is created on the first read,
+        see fileIO.cachedColumns.
+
         """
         # Read in the EM System file
         sys = FdemSystem()
@@ -115,8 +119,6 @@ class FdemData(Data):
         # Get the column headers of the data file
         channels = fIO.getHeaderNames(dataFname)
         nChannels = len(channels)
-        # Get the number of points
-        nPoints = fIO.getNlines(dataFname, 1)
         # To grab the EM data, skip the following header names. (More can be added to this)
         # Initialize a column identifier for x y z
         tmp = [0, 0, 0]
@@ -162,11 +164,13 @@ class FdemData(Data):
             # match the data
             assert (nData == 4 * sys.nFreq), "Number of error columns must 2 times # of Frequencies"
 
+        # Read in the data, extract the appropriate columns, and the line numbers, ids and elevations in the same pass
+        tmp = fIO.read_columns(dataFname, np.hstack([cols, iLine, iID, iElev]), 1, cache=cache)
+        nPoints = tmp.shape[0]
+
         # Initialize the EMData Class
         self.__init__(nPoints, sys.nFreq)
         self.sys = sys
-        # Read in the data, extract the appropriate columns
-        tmp = fIO.read_columns(dataFname, cols, 1, nPoints)
         # Assign the co-ordinates
         self.x[:] = tmp[:, 0]
         self.y[:] = tmp[:, 1]
@@ -187,13 +191,10 @@ class FdemData(Data):
                 self.Std[:, i] = tmp[:, ei]
                 self.Std[:, i + self.sys.nFreq] = tmp[:, eq]
 
-        # Read the line numbers from the file
-        tmp = fIO.read_columns(dataFname, [iLine], 1, nPoints)
-        self.line[:] = tmp[:, 0]
-        tmp = fIO.read_columns(dataFname, [iID], 1, nPoints)
-        self.id[:] = tmp[:, 0]
-        tmp = fIO.read_columns(dataFname, [iElev], 1, nPoints)
-        self.e[:] = tmp[:, 0]
+        # Assign the line numbers, ids and elevations
+        self.line[:] = tmp[:, -3]
+        self.id[:] = tmp[:, -2]
+        self.e[:] = tmp[:, -1]
 
         # Set the channel names
         for i in range(2 * self.sys.nFreq):
@@ -353,9 +354,28 @@ class FdemData(Data):
             The data point
             
         """
+        if (not self.store is None):
+            # The row is the x, y, z co-ordinates, data, standard deviations, and elevation, see FdemData.pointRows
+            row = self.store.getRow(i)
+            nC = self.nChannels
+            D = StatArray(row[3:3+nC], self.D.name, self.D.units)
+            S = StatArray(row[3+nC:3+2*nC], self.Std.name, self.Std.units)
+            return FdemDataPoint(row[0], row[1], row[2], row[-1], D, S, self.sys)
         return FdemDataPoint(self.x[i], self.y[i], self.z[i], self.e[i], self.D[i, :], self.Std[i, :], self.sys)
 
 
+    def pointRows(self):
+        """Get the values of each data point as the rows of a 2D array, see PointCloud3D.pointRows
+
+        Returns
+        -------
+        out : numpy.ndarray
+            The x, y, z co-ordinates, data, standard deviations, and elevation of each data point.
+
+        """
+        return np.hstack([Data.pointRows(self), np.asarray(self.e)[:, np.newaxis]])
+
+
     def mapChannel(self, channel, *args, **kwargs):
         """ Create a map of the specified data channel """
 
@@ -442,13 +462,21 @@ class FdemData(Data):
         plt.yscale(yscale)
         return ax
 
-    def Bcast(self, world, root=0):
+    def Bcast(self, world, root=0, shared=False, store=None):
         """Broadcast the FdemData using MPI 
         
         Parameters
         ----------
         world : mpi4py.MPI.COMM_WORLD
             MPI communicator
+        root : int, optional
+            The MPI rank to broadcast from. Default is 0.
+        shared : bool, optional
+            The data and standard deviations are read only views of a single copy per node in shared memory,
+            rather than a copy on every rank.
+        store : str, optional
+            Name of a store written by the root with FdemData.toStore.  Only the system, line numbers and id numbers
+            are broadcast, and each rank reads the values of a data point from the store when it is needed.
 
         Returns
         -------
@@ -474,8 +502,19 @@ class FdemData(Data):
         
         """
 
+        if (not store is None):
+            N = myMPI.Bcast(self.N, world, root=root)
+            nChannels = myMPI.Bcast(self.nChannels, world, root=root)
+            this = FdemData(0, int(nChannels/2))
+            this.N = N
+            this.id = self.id.Bcast(world, root=root)
+            this.line = self.line.Bcast(world, root=root)
+            this.sys = self.sys.Bcast(world, root=root)
+            this.openStore(store)
+            return this
+
         dat = None
-        dat = Data.Bcast(self, world, root=root)
+        dat = Data.Bcast(self, world, root=root, shared=shared)
         this = FdemData(dat.N, int(dat.nChannels/2))
         this.x = dat.x
         this.y = dat.y
@@ -80,13 +80,39 @@ class TdemData(PointCloud3D):
         self.id = np.zeros(self.N, dtype=np.int32)
         # StatArray of the elevation
         self.elevation = StatArray(self.N, 'Elevation', 'm')
-        # StatArray of Transmitter loops
-        self.T = StatArray(self.N, 'Transmitter Loops', dtype=CircularLoop)
-        # StatArray of Receiever loops
-        self.R = StatArray(self.N, 'Receiver Loops', dtype=CircularLoop)
+        # Geometry of the transmitter and receiver loops, the columns are the z, pitch, roll, yaw, and radius of each loop
+        self.tLoop = StatArray(np.zeros([self.N, 5]) + [0.0, 0.0, 0.0, 0.0, 1.0], 'Transmitter Loops')
+        self.rLoop = StatArray(np.zeros([self.N, 5]) + [0.0, 0.0, 0.0, 0.0, 1.0], 'Receiver Loops')
 
 
-    def read(self, dataFname, systemFname):
+    @property
+    def T(self):
+        """Transmitter loops of every data point, created from TdemData.tLoop """
+        return self._circularLoops(self.tLoop, 'Transmitter Loops')
+
+
+    @property
+    def R(self):
+        """Receiver loops of every data point, created from TdemData.rLoop """
+        return self._circularLoops(self.rLoop, 'Receiver Loops')
+
+
+    @staticmethod
+    def _circularLoop(loops, i):
+        """ Create the CircularLoop of the ith data point from a table of loop geometry """
+        z, pitch, roll, yaw, radius = loops[i, :]
+        return CircularLoop(z=z, pitch=pitch, roll=roll, yaw=yaw, radius=radius)
+
+
+    def _circularLoops(self, loops, name):
+        """ Create the CircularLoops of every data point from a table of loop geometry """
+        out = StatArray(self.N, name, dtype=CircularLoop)
+        for i in range(self.N):
+            out[i] = self._circularLoop(loops, i)
+        return out
+
+
+    def read(self, dataFname, systemFname, cache=False):
         """Reads the data and system parameters from file
 
         Parameters
@@ -95,6 +121,8 @@ class TdemData(PointCloud3D):
             Time domain data file names
         systemFname : str or list of str
             Time domain system file names
+        cache : bool, optional
+            Read the columns from a binary copy of each data file that is created on the first read, see fileIO.cachedColumns.
 
         Notes
         -----
@@ -169,7 +197,6 @@ class TdemData(PointCloud3D):
         # Check the data files against the system files, make sure they have
         # the correct number of columns
         nTimes = np.zeros(nSys, dtype=int)
-        nPoints = np.zeros(nSys, dtype=int)
         offData = [None]*nSys
         offErr = [None]*nSys
         allReadin = [None]*nSys
@@ -193,17 +220,9 @@ class TdemData(PointCloud3D):
             # Check that the number of data columns matches the times given in the system file
             assert offData[i].size == nTimes[i], 'The number of off time data columns in '+dataFname[i]+' does not match the number of windows '+str(nTimes[i])+' given in the system file '+systemFname[i]
 
-            # Get the number of points
-            nPoints[i] = fIO.getNlines(dataFname[i], 1)
-
-        # Check that all the data files have the same number of points
-        if (nSys > 1):
-            for i in range(1,nSys):
-                assert nPoints[i] == nPoints[0], 'Number of data points '+str(nPoints[i])+' in file '+dataFname[i]+' does not match '+dataFname[0]+' '+str(nPoints[0])
-        nPoints = nPoints[0]
-
         # Read in the columns from the first data file
-        tmp = fIO.read_columns(dataFname[0], allReadin[0], 1, nPoints)
+        tmp = fIO.read_columns(dataFname[0], allReadin[0], 1, cache=cache)
+        nPoints = tmp.shape[0]
 
         # Initialize the EMData Class
         self.__init__(nPoints, nTimes, nSys)
@@ -216,22 +235,18 @@ class TdemData(PointCloud3D):
         self.z[:] = tmp[:,4]
 
         i0 = 6
-        # Assign the orientations of the acquisistion loops
+        # Assign the heights and radii of the acquisition loops
+        for loops in [self.rLoop, self.tLoop]:
+            loops[:, 0] = self.z
+            loops[:, 4] = self.sys[0].loopRadius()
+        # Assign the orientations of the acquisistion loops, they are horizontal if not given
         if (not rLoop is None):
-            for i in range(nPoints):
-                self.R[i] = CircularLoop(z=self.z[i], pitch=tmp[i, i0], roll=tmp[i, i0+1], yaw=tmp[i, i0+2], radius=self.sys[0].loopRadius())
+            self.rLoop[:, 1:4] = tmp[:, i0:i0+3]
             i0 += 3
-        else:
-            for i in range(nPoints):
-                self.R[i] = CircularLoop(z=self.z[i], radius=self.sys[0].loopRadius())
 
         if (not tLoop is None):
-            for i in range(nPoints):
-                self.T[i] = CircularLoop(z=self.z[i], pitch=tmp[i, i0], roll=tmp[i, i0+1], yaw=tmp[i, i0+2], radius=self.sys[0].loopRadius())
+            self.tLoop[:, 1:4] = tmp[:, i0:i0+3]
             i0 += 3
-        else:
-            for i in range(nPoints):
-                self.T[i] = CircularLoop(z=self.z[i], radius=self.sys[0].loopRadius())
 
         # Create column indexers for the data and errors
         i1 = i0 + nTimes[0]
@@ -252,7 +267,9 @@ class TdemData(PointCloud3D):
             if (not offErr[i] is None): # Append the error columns if they are available
                 readColumns = np.append(readColumns,offErr[i])
             # Read the columns
-            tmp = fIO.read_columns(dataFname[i], readColumns, 1, nPoints)
+            tmp = fIO.read_columns(dataFname[i], readColumns, 1, cache=cache)
+            # Check that all the data files have the same number of points
+            assert tmp.shape[0] == nPoints, 'Number of data points '+str(tmp.shape[0])+' in file '+dataFname[i]+' does not match '+dataFname[0]+' '+str(nPoints)
             # Assign the data
             self.set[i].D[:, :] = tmp[:, :nTimes[i]]
             if (not offErr[i] is None):
@@ -407,11 +424,44 @@ class TdemData(PointCloud3D):
     def getDataPoint(self, i):
         """ Get the ith data point from the data set """
         assert 0 <= i < self.N, ValueError("Requested data point must have index (0, "+str(self.N) + ']')
+        if (not self.store is None):
+            return self._pointFromRow(self.store.getRow(i))
         D = [self.set[j].D[i, :] for j in range(self.nSystems)]
         S = [self.set[j].Std[i, :] for j in range(self.nSystems)]
-        this = TdemDataPoint(self.x[i], self.y[i], self.z[i], self.elevation[i], D, S, self.sys, self.T[i],self.R[i])
+        T = self._circularLoop(self.tLoop, i)
+        R = self._circularLoop(self.rLoop, i)
+        this = TdemDataPoint(self.x[i], self.y[i], self.z[i], self.elevation[i], D, S, self.sys, T, R)
         return this
 
+    def pointRows(self):
+        """Get the values of each data point as the rows of a 2D array, see PointCloud3D.pointRows
+
+        Returns
+        -------
+        out : numpy.ndarray
+            The x, y, z co-ordinates, the data and standard deviations of each system, the elevation, and the geometry
+            of the transmitter and receiver loops of each data point.
+
+        """
+        sets = [np.hstack([self.set[j].D, self.set[j].Std]) for j in range(self.nSystems)]
+        return np.hstack([PointCloud3D.pointRows(self)] + sets + [np.asarray(self.elevation)[:, np.newaxis], self.tLoop, self.rLoop])
+
+
+    def _pointFromRow(self, row):
+        """ Create a data point from its row in a store, see TdemData.pointRows """
+        D = []
+        S = []
+        k = 3
+        for j in range(self.nSystems):
+            n = self.nTimes[j]
+            D.append(row[k:k+n])
+            S.append(row[k+n:k+2*n])
+            k += 2*n
+        T = self._circularLoop(row[np.newaxis, k+1:k+6], 0)
+        R = self._circularLoop(row[np.newaxis, k+6:k+11], 0)
+        return TdemDataPoint(row[0], row[1], row[2], row[k], D, S, self.sys, T, R)
+
+
     def getLine(self, line):
         """ Gets the data in the given line number """
         i = np.where(self.line == line)[0]
@@ -432,12 +482,12 @@ class TdemData(PointCloud3D):
         tmp.line[:] = self.line[i]
         tmp.id[:] = self.id[i]
         tmp.elevation[:] = self.elevation[i]
-        tmp.T[:] = self.T[i]
-        tmp.R[:] = self.R[i]
+        tmp.tLoop[:, :] = self.tLoop[i, :]
+        tmp.rLoop[:, :] = self.rLoop[i, :]
         tmp.sys = np.ndarray(self.nSystems, dtype=TDAEMSystem)
         for j in range(self.nSystems):
             tmp.set[j].D[:, :] = self.set[j].D[i, :]
-            tmp.set[j].D[:, :] = self.set[j].Std[i, :]
+            tmp.set[j].Std[:, :] = self.set[j].Std[i, :]
             tmp.sys[j] = self.sys[j]
         return tmp
 
@@ -545,8 +595,19 @@ class TdemData(PointCloud3D):
             kwargs["log"] = 10.0
         return Data.scatter2D(self, **kwargs)
 
-    def Bcast(self, world):
-        """ Broadcast the TdemData using MPI """
+    def Bcast(self, world, shared=False, store=None):
+        """Broadcast the TdemData using MPI
+
+        If shared is True, the data and standard deviations of each system are read only views of a single copy per node
+        in shared memory, rather than a copy on every rank.
+
+        If store is the name of a store written by the master with TdemData.toStore, only the systems, line numbers and
+        id numbers are broadcast, and each rank reads the values of a data point from the store when it is needed.
+
+        """
+        if (not store is None):
+            return self._BcastStore(world, store)
+
         pc3d = None
         pc3d = PointCloud3D.Bcast(self, world)
         nTimes = myMPI.Bcast(self.nTimes, world)
@@ -573,59 +634,55 @@ class TdemData(PointCloud3D):
         # Each DataSet has been instantiated within this. Broadcast the
         # contents of the Masters self.set[0:nSystems]
         for i in range(this.nSystems):
-            this.set[i] = tmp[i].Bcast(world)
+            this.set[i] = tmp[i].Bcast(world, shared=shared)
 
         # Broadcast the Data point id, line numbers and elevations
         this.id = myMPI.Bcast(self.id, world)
         this.line = self.line.Bcast(world)
         this.elevation = self.elevation.Bcast(world)
 
+        # Read the same system files on each worker
+        this.readSystemFile(self._BcastSystemFnames(world, this.nSystems))
+
+        # Broadcast the geometry of the loops
+        this.tLoop = self.tLoop.Bcast(world)
+        this.rLoop = self.rLoop.Bcast(world)
+
+        return this
+
+
+    def _BcastStore(self, world, store):
+        """ Broadcast the system, line numbers and id numbers, and read the values of each data point from a store """
+        N = myMPI.Bcast(self.N, world)
+        nTimes = myMPI.Bcast(self.nTimes, world)
+        nSystems = myMPI.Bcast(self.nSystems, world)
+
+        this = TdemData(0, nTimes, nSystems)
+        this.N = N
+        this.id = myMPI.Bcast(self.id, world)
+        this.line = self.line.Bcast(world)
+        this.readSystemFile(self._BcastSystemFnames(world, this.nSystems))
+        this.openStore(store)
+        return this
+
+
+    def _BcastSystemFnames(self, world, nSystems):
+        """ Broadcast the names of the system files """
         # Since the Time Domain EM Systems are C++ objects on the back end, I can't Broadcast them through C++ (Currently a C++ Noob)
         # So instead, Broadcast the list of system file names saved in the TdemData Class and read the system files in on each worker.
         # This is cumbersome, but only done once at the beginning of the MPI
         # code.
         strTmp = []
-        for i in range(this.nSystems):
+        for i in range(nSystems):
             if (world.rank == 0):
                 strTmp.append(self.sysFname[i])
             else:
                 strTmp.append('')
 
         systemFname = []
-        for i in range(this.nSystems):
+        for i in range(nSystems):
             systemFname.append(myMPI.Bcast(strTmp[i], world))
-        # Read the same system files on each worker
-        this.readSystemFile(systemFname)
-
-        # Broadcast the Transmitter Loops.
-        if (world.rank == 0):
-            lTmp = [None] * self.N
-            for i in range(self.N):
-                lTmp[i] = str(self.T[i])
-        else:
-            lTmp = []
-        lTmp = myMPI.Bcast_list(lTmp, world)
-        if (world.rank == 0):
-            this.T = self.T
-        else:
-            for i in range(this.N):
-                this.T[i] = eval(safeEval(lTmp[i]))
-
-        # Broadcast the Reciever Loops.
-        if (world.rank == 0):
-            lTmp = [None] * self.N
-            for i in range(self.N):
-                lTmp[i] = str(self.R[i])
-        else:
-            lTmp = []
-        lTmp = myMPI.Bcast_list(lTmp, world)
-        if (world.rank == 0):
-            this.R = self.R
-        else:
-            for i in range(this.N):
-                this.R[i] = eval(safeEval(lTmp[i]))
-
-        return this
+        return systemFname
 
     def Scatterv(self, myStart, myChunk, world):
         """ Scatterv the TdemData using MPI """
@@ -678,32 +735,8 @@ class TdemData(PointCloud3D):
         # Read the same system files on each worker
         this.readSystemFile(systemFname)
 
-        # Scatterv the Transmitter Loops.
-        if (world.rank == 0):
-            lTmp = [None] * self.N
-            for i in range(self.N):
-                lTmp[i] = str(self.T[i])
-        else:
-            lTmp = []
-        lTmp = myMPI.Scatterv_list(lTmp, myStart, myChunk, world)
-        if (world.rank == 0):
-            this.T[:] = self.T[:myChunk[0]]
-        else:
-            for i in range(this.N):
-                this.T[i] = eval(lTmp[i])
-
-        # Scatterv the Reciever Loops.
-        if (world.rank == 0):
-            lTmp = [None] * self.N
-            for i in range(self.N):
-                lTmp[i] = str(self.R[i])
-        else:
-            lTmp = []
-        lTmp = myMPI.Scatterv_list(lTmp, myStart, myChunk, world)
-        if (world.rank == 0):
-            this.R[:] = self.R[:myChunk[0]]
-        else:
-            for i in range(this.N):
-                this.R[i] = eval(lTmp[i])
+        # Scatterv the geometry of the loops
+        this.tLoop = self.tLoop.Scatterv(myStart, myChunk, world)
+        this.rLoop = self.rLoop.Scatterv(myStart, myChunk, world)
 
         return this
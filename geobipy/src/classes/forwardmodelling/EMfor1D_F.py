@@ -6,66 +6,186 @@ June 2015
 import numpy as np
 from .fdemforward1d_fortran import fdemforward1d
 
-def fdem1dfwd(S, mod, z0):
+class FdemPropagators(object):
+    """Propagators of the layer recursion for the last model forward modelled with fdem1dfwd
+
+    The recursion for the reflection coefficient starts in the bottom half space and moves upwards, so the
+    propagators un and Y of a layer only depend on that layer and the layers below it.  If the bottom layers of the
+    next model are unchanged, their propagators are reused and the recursion starts from the deepest changed layer.
+
+    The propagators do not depend on the sensor altitude, so a single instance can be shared by copies of a data point.
+
+    """
+
+    # Number of Hankel filter coefficients for the J0 and J1 Bessel functions
+    nC0 = 120
+    nC1 = 140
+
+    def __init__(self):
+        """ Initialize an empty set of propagators """
+        self.system = None
+        self.par = None
+        self.thk = None
+        self.un0 = None
+        self.Y0 = None
+        self.un1 = None
+        self.Y1 = None
+
+
+    def update(self, S, mod):
+        """Record the model that is about to be forward modelled
+
+        Parameters
+        ----------
+        S : FdemSystem
+            The system the propagators are computed for.
+        mod : Model1D
+            The model about to be forward modelled.
+
+        Returns
+        -------
+        nKeep : int
+            The number of bottom layers whose propagators are unchanged since the last model.
+
+        """
+        n = mod.nCells[0]
+        par = np.asarray(mod.par[:n], dtype=np.float64)
+        thk = np.asarray(mod.thk[:n], dtype=np.float64)
+
+        nKeep = 0
+        if ((S is self.system) and (not self.par is None)):
+            # Align the models at the bottom half space, whose thickness is not used
+            m = np.minimum(n, self.par.size)
+            same = self.par[-m:] == par[-m:]
+            same[:-1] &= self.thk[-m:-1] == thk[-m:-1]
+            iChanged = np.where(~same)[0]
+            nKeep = m if iChanged.size == 0 else m - 1 - iChanged[-1]
+
+        if ((not S is self.system) or (self.un0 is None) or (self.un0.shape[2] != n + 1)):
+            self._allocate(S.nFreq, n, nKeep)
+
+        self.system = S
+        self.par = par.copy()
+        self.thk = thk.copy()
+        return nKeep
+
+
+    def _allocate(self, nFreq, nLayers, nKeep):
+        """ Allocate propagators for a model with nLayers, keeping those of the bottom nKeep layers """
+        for key, nC in zip(['un0', 'Y0', 'un1', 'Y1'], [self.nC0, self.nC0, self.nC1, self.nC1]):
+            tmp = np.zeros([nC, nFreq, nLayers + 1], dtype=np.complex128, order='F')
+            old = getattr(self, key)
+            if (nKeep > 0):
+                tmp[:, :, -nKeep:] = old[:, :, -nKeep:]
+            setattr(self, key, tmp)
+
+
+def fdem1dfwd(S, mod, z0, propagators=None):
     """ Forward Model a single EM data point from a 1D layered earth conductivity model
     S:    :EmSystem Class describing the aquisition system
     mod: : Model1D Class describing the 1D layered earth model
-    z0:  : Altitude of the sensor above the top of the 1D model
-    TODO: SPEED UP THIS CODE
+    z0:  : Altitude of the sensor above the top of the 1D model, or an array of altitudes
+    propagators: : Optional FdemPropagators, reused for the bottom layers that are unchanged since the last call
+    Returns the predicted data with shape [nFreq], or [nHeights, nFreq] if z0 is an array.
+    """
+    heights = np.atleast_1d(np.asarray(z0, dtype=np.float64))
+    assert np.all(heights <= mod.top), "Sensor altitude must be above the top of the model"
+
+    # The layer propagators do not depend on the altitude, so compute them once for many altitudes
+    if (propagators is None and heights.size > 1):
+        propagators = FdemPropagators()
+
+    prd = np.zeros([heights.size, S.nFreq], dtype=np.complex128)
+    for i, z in enumerate(heights):
+        tHeight, rHeight = _heights(S, z)
+        if (propagators is None):
+            fdemforward1d.forward1d(S.tensorID, S.freq, tHeight, rHeight, S.tMoment, S.rx, S.dist, S.scale, mod.par, mod.thk, prd[i, :], S.nFreq,  mod.nCells[0])
+        else:
+            nKeep = propagators.update(S, mod)
+            p = propagators
+            prd[i, :] = fdemforward1d.forward1dcached(S.tensorID, S.freq, tHeight, rHeight, S.tMoment, S.rx, S.dist, S.scale, mod.par, mod.thk, nKeep, p.un0, p.Y0, p.un1, p.Y1, prd[i, :])
+
+    return prd[0, :] if np.ndim(z0) == 0 else prd
+
+
+def fdem1dfwdBatch(S, par, thk, nCells, z0):
+    """ Forward Model a single EM data point from many 1D layered earth conductivity models in one call
+    The models are threaded over with OpenMP, the number of threads is set with OMP_NUM_THREADS.
+    S:      :EmSystem Class describing the aquisition system
+    par:    : Conductivities of the models with shape [nModels, maxLayers], padded beyond nCells
+    thk:    : Thicknesses of the models with shape [nModels, maxLayers], padded beyond nCells
+    nCells: : Number of layers in each model
+    z0:     : Altitude of the sensor above the top of the models, a scalar or one per model
+    Returns the predicted data with shape [nModels, nFreq].
     """
-    assert z0 <= mod.top, "Sensor altitude must be above the top of the model"
-
-    # Create the indices of the coil orientations for the frequencies.
-    tid = S.getTensorID()
-    
-    tHeight = np.zeros(S.nFreq)
-    rHeight = np.zeros(S.nFreq)
-    tMom = np.zeros(S.nFreq)
-    rMom = np.zeros(S.nFreq)
-    rx = np.zeros(S.nFreq)
-    for i in range(S.nFreq):
-        tHeight[i] = -z0 + S.T[i].z
-        rHeight[i] = z0 + S.R[i].z
-        tMom[i] = S.T[i].moment
-        rMom[i] = S.R[i].moment
-        rx[i] = S.R[i].x
-    scl = tMom * rMom
-       
-    prd = np.zeros(S.nFreq, dtype=np.complex128)
-
-    fdemforward1d.forward1d(tid, S.freq, tHeight, rHeight, tMom, rx, S.dist, scl, mod.par, mod.thk, prd, S.nFreq,  mod.nCells[0])
-
-    return prd
+    par = np.atleast_2d(np.asarray(par, dtype=np.float64))
+    thk = np.atleast_2d(np.asarray(thk, dtype=np.float64))
+    nModels, maxLayers = par.shape
+    assert thk.shape == par.shape, ValueError("thk must have shape {}".format(par.shape))
+    nCells = np.asarray(nCells, dtype=np.int32).reshape(nModels)
+    assert np.all((nCells > 0) & (nCells <= maxLayers)), ValueError("nCells must be in [1, {}]".format(maxLayers))
+
+    heights = np.broadcast_to(np.asarray(z0, dtype=np.float64), nModels)
+    assert np.all(heights <= 0.0), "Sensor altitude must be above the top of the model"
+
+    # Fortran ordered [nFreq, nModels] arrays are the transposes of C ordered [nModels, nFreq] arrays
+    tHeight = np.asfortranarray(S.tz[:, None] - heights[None, :])
+    rHeight = np.asfortranarray(S.rz[:, None] + heights[None, :])
+
+    prd = np.zeros([S.nFreq, nModels], dtype=np.complex128, order='F')
+    prd = fdemforward1d.forward1dbatch(S.tensorID, S.freq, tHeight, rHeight, S.tMoment, S.rx, S.dist, S.scale, par.T, thk.T, nCells, prd)
+
+    return prd.T
 
 
 def fdem1dsen(S, mod, z0):
-    """ Forward Model a single EM data point from a 1D layered earth conductivity model
+    """ Compute the sensitivity of a single EM data point to a 1D layered earth conductivity model
     S:    :EmSystem Class describing the aquisition system
     mod: : Model1D Class describing the 1D layered earth model
-    z0:  : Altitude of the sensor above the top of the 1D model
-    TODO: SPEED UP THIS CODE
+    z0:  : Altitude of the sensor above the top of the 1D model, or an array of altitudes
+    Returns the sensitivity with shape [nFreq, nLayers], or [nHeights, nFreq, nLayers] if z0 is an array.
     """
-    assert z0 <= mod.top, "Sensor altitude must be above the top of the model"
+    heights = np.atleast_1d(np.asarray(z0, dtype=np.float64))
+    assert np.all(heights <= mod.top), "Sensor altitude must be above the top of the model"
 
     nLayers = mod.nCells[0]
-    # Create the indices of the coil orientations for the frequencies.
-    tid = S.getTensorID()
-
-    tHeight = np.zeros(S.nFreq)
-    rHeight = np.zeros(S.nFreq)
-    tMom = np.zeros(S.nFreq)
-    rMom = np.zeros(S.nFreq)
-    rx = np.zeros(S.nFreq)
-    for i in range(S.nFreq):
-        tHeight[i] = -z0 + S.T[i].z
-        rHeight[i] = z0 + S.R[i].z
-        tMom[i] = S.T[i].moment
-        rMom[i] = S.R[i].moment
-        rx[i] = S.R[i].x
-    scl = tMom * rMom
-
-    J = np.zeros([S.nFreq, nLayers], dtype=np.complex128, order='F')
-
-    fdemforward1d.sensitivity1d(tid, S.freq, tHeight, rHeight, tMom, rx, S.dist, scl, mod.par, mod.thk, J, S.nFreq,  mod.nCells[0])
-
-    return J
\ No newline at end of file
+
+    J = np.zeros([heights.size, S.nFreq, nLayers], dtype=np.complex128)
+    for i, z in enumerate(heights):
+        tHeight, rHeight = _heights(S, z)
+        Jtmp = np.zeros([S.nFreq, nLayers], dtype=np.complex128, order='F')
+        fdemforward1d.sensitivity1d(S.tensorID, S.freq, tHeight, rHeight, S.tMoment, S.rx, S.dist, S.scale, mod.par, mod.thk, Jtmp, S.nFreq,  nLayers)
+        J[i, :, :] = Jtmp
+
+    return J[0, :, :] if np.ndim(z0) == 0 else J
+
+
+def fdem1dfwdsen(S, mod, z0):
+    """ Forward Model a single EM data point and its sensitivity from a 1D layered earth conductivity model
+    The recursion over the layers is only computed once for both.
+    S:    :EmSystem Class describing the aquisition system
+    mod: : Model1D Class describing the 1D layered earth model
+    z0:  : Altitude of the sensor above the top of the 1D model, or an array of altitudes
+    Returns the predicted data and the sensitivity, with a leading dimension of nHeights if z0 is an array.
+    """
+    heights = np.atleast_1d(np.asarray(z0, dtype=np.float64))
+    assert np.all(heights <= mod.top), "Sensor altitude must be above the top of the model"
+
+    nLayers = mod.nCells[0]
+
+    prd = np.zeros([heights.size, S.nFreq], dtype=np.complex128)
+    J = np.zeros([heights.size, S.nFreq, nLayers], dtype=np.complex128)
+    for i, z in enumerate(heights):
+        tHeight, rHeight = _heights(S, z)
+        ptmp = np.zeros(S.nFreq, dtype=np.complex128)
+        Jtmp = np.zeros([S.nFreq, nLayers], dtype=np.complex128, order='F')
+        prd[i, :], J[i, :, :] = fdemforward1d.forwardsensitivity1d(S.tensorID, S.freq, tHeight, rHeight, S.tMoment, S.rx, S.dist, S.scale, mod.par, mod.thk, ptmp, Jtmp, S.nFreq,  nLayers)
+
+    if (np.ndim(z0) == 0):
+        return prd[0, :], J[0, :, :]
+    return prd, J
+
+
+def _heights(S, z0):
+    """ Heights of the transmitter and reciever loops of every frequency for a sensor altitude z0 """
+    return S.tz - z0, S.rz + z0
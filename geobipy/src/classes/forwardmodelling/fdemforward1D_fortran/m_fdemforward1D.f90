@@ -54,6 +54,91 @@ subroutine forward1D(nFreq, nLayers, tid, freqs, tHeight, rHeight, moments, rx,
     complex(kind=8), intent(inout) :: predicted(nFreq)
     !f2py intent(in, out) :: predicted
 
+    call setLambdas(lam, nFreq, separation)
+
+    call calcForward1D(nFreq, nLayers, tid, freqs, tHeight, rHeight, moments, rx, separation, scale, parIn, thkIn, predicted)
+
+end subroutine
+!====================================================================!
+!====================================================================!
+subroutine forward1DBatch(nFreq, nModels, maxLayers, tid, freqs, tHeight, rHeight, moments, rx, separation, scale, parIn, thkIn, nCells, predicted)
+    !! Computes the forward frequency domain electromagnetic responses of many 1D layered earths.
+    !! Each model is padded to maxLayers and only its first nCells layers are used.
+    !! The models are independent and are threaded over with OpenMP.
+    !! This function is callable from python.
+!====================================================================!
+    integer, intent(in) :: nFreq
+    integer, intent(in) :: nModels
+    integer, intent(in) :: maxLayers
+    integer, intent(in) :: tid(nFreq)
+    !f2py intent(in) :: tid
+    real(kind=8), intent(in) :: freqs(nFreq)
+    !f2py intent(in) :: freqs
+    real(kind=8), intent(in) :: tHeight(nFreq, nModels)
+    !f2py intent(in) :: tHeight
+    real(kind=8), intent(in) :: rHeight(nFreq, nModels)
+    !f2py intent(in) :: rHeight
+    real(kind=8), intent(in) :: moments(nFreq)
+    !f2py intent(in) :: moments
+    real(kind=8), intent(in) :: rx(nFreq)
+    !f2py intent(in) :: rx
+    real(kind=8), intent(in) :: separation(nFreq)
+    !f2py intent(in) :: separation
+    real(kind=8), intent(in) :: scale(nFreq)
+    !f2py intent(in) :: scale
+    real(kind=8), intent(in) :: parIn(maxLayers, nModels)
+    !f2py intent(in) ::  parIn
+    real(kind=8), intent(in) :: thkIn(maxLayers, nModels)
+    !f2py intent(in) :: thkIn
+    integer, intent(in) :: nCells(nModels)
+    !f2py intent(in) :: nCells
+    complex(kind=8), intent(inout) :: predicted(nFreq, nModels)
+    !f2py intent(in, out) :: predicted
+
+    integer :: i
+
+    ! The Hankel filter abscissae are shared by every model, so set them before threading
+    call setLambdas(lam, nFreq, separation)
+
+    !$omp parallel do default(shared) private(i) schedule(dynamic)
+    do i = 1, nModels
+        call calcForward1D(nFreq, nCells(i), tid, freqs, tHeight(:, i), rHeight(:, i), moments, rx, separation, scale, &
+                           parIn(1:nCells(i), i), thkIn(1:nCells(i), i), predicted(:, i))
+    enddo
+    !$omp end parallel do
+
+end subroutine
+!====================================================================!
+!====================================================================!
+subroutine calcForward1D(nFreq, nLayers, tid, freqs, tHeight, rHeight, moments, rx, separation, scale, parIn, thkIn, predicted)
+    !! Computes the forward frequency domain electromagnetic response of a 1D layered earth.
+    !! The Hankel filter abscissae must have been set with setLambdas.
+!====================================================================!
+    integer, intent(in) :: nFreq
+    integer, intent(in) :: nLayers
+    integer, intent(in) :: tid(nFreq)
+    !f2py intent(in) :: tid
+    real(kind=8), intent(in) :: freqs(nFreq)
+    !f2py intent(in) :: freqs
+    real(kind=8), intent(in) :: tHeight(nFreq)
+    !f2py intent(in) :: tHeight
+    real(kind=8), intent(in) :: rHeight(nFreq)
+    !f2py intent(in) :: rHeight
+    real(kind=8), intent(in) :: moments(nFreq)
+    !f2py intent(in) :: moments
+    real(kind=8), intent(in) :: rx(nFreq)
+    !f2py intent(in) :: rx
+    real(kind=8), intent(in) :: separation(nFreq)
+    !f2py intent(in) :: separation
+    real(kind=8), intent(in) :: scale(nFreq)
+    !f2py intent(in) :: scale
+    real(kind=8), intent(in) :: parIn(nLayers)
+    !f2py intent(in) ::  parIn
+    real(kind=8), intent(in) :: thkIn(nLayers)
+    !f2py intent(in) :: thkIn
+    complex(kind=8), intent(inout) :: predicted(nFreq)
+    !f2py intent(in, out) :: predicted
+
     integer :: i
     logical :: useJ0
     complex(kind=8) :: H(nFreq), H0(nFreq)
@@ -61,8 +146,6 @@ subroutine forward1D(nFreq, nLayers, tid, freqs, tHeight, rHeight, moments, rx,
     complex(kind=8) :: u0j0(nCJ0, nFreq), u0j1(nCJ1, nFreq)
     real(kind=8) :: par(nLayers+1), thk(nLayers+1)
 
-    call setLambdas(lam, nFreq, separation)
-
     H = complex(0.d0, 0.d0)
     H0 = complex(0.d0, 0.d0)
     rTEj0 = complex(0.d0, 0.d0)
@@ -193,6 +276,204 @@ subroutine sensitivity1D(nFreq, nLayers, tid, freqs, tHeight, rHeight, moments,
 end subroutine
 !====================================================================!
 
+!====================================================================!
+subroutine forwardSensitivity1D(nFreq, nLayers, tid, freqs, tHeight, rHeight, moments, rx, separation, scale, parIn, thkIn, predicted, sens)
+    !! Computes the forward frequency domain electromagnetic response of a 1D layered earth and its sensitivity.
+    !! The reflection coefficients from the sensitivity recursion are used for the forward response so the
+    !! coefficients and the recursion are only computed once.
+    !! This function is callable from python.
+!====================================================================!
+    integer, intent(in) :: nFreq
+    integer, intent(in) :: nLayers
+    integer, intent(in) :: tid(nFreq)
+    !f2py intent(in) :: tid
+    real(kind=8), intent(in) :: freqs(nFreq)
+    !f2py intent(in) :: freqs
+    real(kind=8), intent(in) :: tHeight(nFreq)
+    !f2py intent(in) :: tHeight
+    real(kind=8), intent(in) :: rHeight(nFreq)
+    !f2py intent(in) :: rHeight
+    real(kind=8), intent(in) :: moments(nFreq)
+    !f2py intent(in) :: moments
+    real(kind=8), intent(in) :: rx(nFreq)
+    !f2py intent(in) :: rx
+    real(kind=8), intent(in) :: separation(nFreq)
+    !f2py intent(in) :: separation
+    real(kind=8), intent(in) :: scale(nFreq)
+    !f2py intent(in) :: scale
+    real(kind=8), intent(in) :: parIn(nLayers)
+    !f2py intent(in) ::  parIn
+    real(kind=8), intent(in) :: thkIn(nLayers)
+    !f2py intent(in) :: thkIn
+    complex(kind=8), intent(inout) :: predicted(nFreq)
+    !f2py intent(in, out) :: predicted
+    complex(kind=8), intent(inout) :: sens(nFreq, nLayers)
+    !f2py intent(in, out) :: sens
+
+    integer :: i, j
+    logical :: useJ0
+    complex(kind=8) :: H(nFreq), H0(nFreq)
+    complex(kind=8) :: dH(nFreq, nLayers), dH0(nFreq, nLayers)
+    complex(kind=8) :: rTEj0(nCJ0, nFreq), rTEj1(nCJ1, nFreq)
+    complex(kind=8) :: u0j0(nCJ0, nFreq), u0j1(nCJ1, nFreq)
+    complex(kind=8) :: sens0(nCJ0, nFreq, nLayers), sens1(nCJ1, nFreq, nLayers)
+    real(kind=8) :: par(nLayers+1), thk(nLayers+1)
+
+    call setLambdas(lam, nFreq, separation)
+
+    H = complex(0.d0, 0.d0)
+    H0 = complex(0.d0, 0.d0)
+    dH = complex(0.d0, 0.d0)
+    dH0 = complex(0.d0, 0.d0)
+    rTEj0 = complex(0.d0, 0.d0)
+    u0j0 = complex(0.d0, 0.d0)
+    rTEj1 = complex(0.d0, 0.d0)
+    u0j1 = complex(0.d0, 0.d0)
+    sens0 = complex(0.d0, 0.d0)
+    sens1 = complex(0.d0, 0.d0)
+
+    useJ0 = .false.
+    i = 1
+    do while (.not. useJ0 .and. i <= nFreq)
+        select case(tid(i))
+        case (1,2,4,5,9)
+            useJ0 = .true.
+            exit
+        end select
+        i = i + 1
+    enddo
+
+    call initModel(parIn, thkIn, nLayers, par, thk)
+
+    ! The sensitivity recursion also returns the reflection coefficients of the forward model
+    call calcFdemSensitivity1D(nFreq, nCJ1, nLayers, freqs, lam%lam1, par, thk, rTEj1, u0j1, sens1)
+    if (useJ0) call calcFdemSensitivity1D(nFreq, nCJ0, nLayers, freqs, lam%lam0, par, thk, rTEj0, u0j0, sens0)
+
+    do i = 1, nFreq
+        select case (tid(i))
+        case(1)
+            call calcHxx(nFreq, nCJ0, nCJ1, i, tHeight, rHeight, moments, rx, separation, rTEj0, lam%w0, lam%lam0, rTEj1, lam%w1, lam%lam1, H, H0)
+            do j = 1, nLayers
+                call calcHxx(nFreq, nCJ0, nCJ1, i, tHeight, rHeight, moments, rx, separation, sens0(:, :, j), lam%w0, lam%lam0, sens1(:, :, j), lam%w1, lam%lam1, dH(:, j), dH0(:, j))
+            enddo
+        case(3)
+            call calcHxz(nFreq, nCJ1, i, tHeight, rHeight, moments, rx, separation, rTEj1, lam%w1, lam%lam1, H, H0)
+            do j = 1, nLayers
+                call calcHxz(nFreq, nCJ1, i, tHeight, rHeight, moments, rx, separation, sens1(:, :, j), lam%w1, lam%lam1, dH(:, j), dH0(:, j))
+            enddo
+        case(7)
+            call calcHzx(nFreq, nCJ1, i, tHeight, rHeight, moments, rx, separation, rTEj1, u0j1, lam%w1, lam%lam1, H, H0)
+            do j = 1, nLayers
+                call calcHzx(nFreq, nCJ1, i, tHeight, rHeight, moments, rx, separation, sens1(:, :, j), u0j1, lam%w1, lam%lam1, dH(:, j), dH0(:, j))
+            enddo
+        case(9)
+            call calcHzz(nFreq, nCJ0, i, tHeight, rHeight, moments, separation, rTEj0, u0j0, lam%w0, lam%lam0, H, H0)
+            do j = 1, nLayers
+                call calcHzz(nFreq, nCJ0, i, tHeight, rHeight, moments, separation, sens0(:, :, j), u0j0, lam%w0, lam%lam0, dH(:, j), dH0(:, j))
+            enddo
+        end select
+        sens(i, :) = 1.d6 * scale(i) * (dH(i, :) - dH0(i, :)) / dH0(i, :)
+    enddo
+
+    predicted = 1.d6 * scale * ((H - H0) / H0)
+
+end subroutine
+!====================================================================!
+!====================================================================!
+subroutine forward1DCached(nFreq, nLayers, nC0, nC1, tid, freqs, tHeight, rHeight, moments, rx, separation, scale, parIn, thkIn, nKeep, un0, Y0, un1, Y1, predicted)
+    !! Computes the forward frequency domain electromagnetic response of a 1D layered earth.
+    !! The propagators un and Y of each layer are kept between calls by the caller.  The bottom nKeep layers
+    !! are assumed unchanged since the propagators were last computed, so the recursion starts above them.
+    !! The propagators have nC0 = 120 and nC1 = 140 filter coefficients.
+    !! This function is callable from python.
+!====================================================================!
+    integer, intent(in) :: nFreq
+    integer, intent(in) :: nLayers
+    integer, intent(in) :: tid(nFreq)
+    !f2py intent(in) :: tid
+    real(kind=8), intent(in) :: freqs(nFreq)
+    !f2py intent(in) :: freqs
+    real(kind=8), intent(in) :: tHeight(nFreq)
+    !f2py intent(in) :: tHeight
+    real(kind=8), intent(in) :: rHeight(nFreq)
+    !f2py intent(in) :: rHeight
+    real(kind=8), intent(in) :: moments(nFreq)
+    !f2py intent(in) :: moments
+    real(kind=8), intent(in) :: rx(nFreq)
+    !f2py intent(in) :: rx
+    real(kind=8), intent(in) :: separation(nFreq)
+    !f2py intent(in) :: separation
+    real(kind=8), intent(in) :: scale(nFreq)
+    !f2py intent(in) :: scale
+    real(kind=8), intent(in) :: parIn(nLayers)
+    !f2py intent(in) ::  parIn
+    real(kind=8), intent(in) :: thkIn(nLayers)
+    !f2py intent(in) :: thkIn
+    integer, intent(in) :: nKeep
+    !f2py intent(in) :: nKeep
+    integer, intent(in) :: nC0
+    integer, intent(in) :: nC1
+    complex(kind=8), intent(inout) :: un0(nC0, nFreq, nLayers+1)
+    !f2py intent(inout) :: un0
+    complex(kind=8), intent(inout) :: Y0(nC0, nFreq, nLayers+1)
+    !f2py intent(inout) :: Y0
+    complex(kind=8), intent(inout) :: un1(nC1, nFreq, nLayers+1)
+    !f2py intent(inout) :: un1
+    complex(kind=8), intent(inout) :: Y1(nC1, nFreq, nLayers+1)
+    !f2py intent(inout) :: Y1
+    complex(kind=8), intent(inout) :: predicted(nFreq)
+    !f2py intent(in, out) :: predicted
+
+    integer :: i
+    logical :: useJ0
+    complex(kind=8) :: H(nFreq), H0(nFreq)
+    complex(kind=8) :: rTEj0(nCJ0, nFreq), rTEj1(nCJ1, nFreq)
+    complex(kind=8) :: u0j0(nCJ0, nFreq), u0j1(nCJ1, nFreq)
+    real(kind=8) :: par(nLayers+1), thk(nLayers+1)
+
+    call setLambdas(lam, nFreq, separation)
+
+    H = complex(0.d0, 0.d0)
+    H0 = complex(0.d0, 0.d0)
+    rTEj0 = complex(0.d0, 0.d0)
+    u0j0 = complex(0.d0, 0.d0)
+    rTEj1 = complex(0.d0, 0.d0)
+    u0j1 = complex(0.d0, 0.d0)
+
+    useJ0 = .false.
+    i = 1
+    do while (.not. useJ0 .and. i <= nFreq)
+        select case(tid(i))
+        case (1,2,4,5,9)
+            useJ0 = .true.
+            exit
+        end select
+        i = i + 1
+    enddo
+
+    call initModel(parIn, thkIn, nLayers, par, thk)
+
+    call calcFdemforward1DCached(nFreq, nCJ1, nLayers, freqs, lam%lam1, par, thk, nKeep, un1, Y1, rTEj1, u0j1)
+    if (useJ0) call calcFdemforward1DCached(nFreq, nCJ0, nLayers, freqs, lam%lam0, par, thk, nKeep, un0, Y0, rTEj0, u0j0)
+
+    do i = 1, nFreq
+        select case (tid(i))
+        case(1)
+            call calcHxx(nFreq, nCJ0, nCJ1, i, tHeight, rHeight, moments, rx, separation, rTEj0, lam%w0, lam%lam0, rTEj1, lam%w1, lam%lam1, H, H0)
+        case(3)
+            call calcHxz(nFreq, nCJ1, i, tHeight, rHeight, moments, rx, separation, rTEj1, lam%w1, lam%lam1, H, H0)
+        case(7)
+            call calcHzx(nFreq, nCJ1, i, tHeight, rHeight, moments, rx, separation, rTEj1, u0j1, lam%w1, lam%lam1, H, H0)
+        case(9)
+            call calcHzz(nFreq, nCJ0, i, tHeight, rHeight, moments, separation, rTEj0, u0j0, lam%w0, lam%lam0, H, H0)
+        end select
+    enddo
+
+    predicted = 1.d6 * scale * ((H - H0) / H0)
+
+end subroutine
+!====================================================================!
+
 !====================================================================!
 subroutine calcFdemforward1D(nFreq, nC, nLayers, freqs, fCoeffs, par, thk, rTE, u0)
     !! Computes the forward frequency domain electromagnetic response of a 1D layered earth.
@@ -222,6 +503,80 @@ subroutine calcFdemforward1D(nFreq, nC, nLayers, freqs, fCoeffs, par, thk, rTE,
 
     call M1_0(nFreq, nC, nL1, Yn, Y, un, thk, rTE, u0)
 
+end subroutine
+!====================================================================!
+!====================================================================!
+subroutine calcFdemforward1DCached(nFreq, nC, nLayers, freqs, fCoeffs, par, thk, nKeep, un, Y, rTE, u0)
+    !! Computes the reflection coefficients of a 1D layered earth reusing the propagators of the bottom nKeep layers.
+!====================================================================!
+    integer, intent(in) :: nFreq
+    integer, intent(in) :: nC
+    integer, intent(in) :: nLayers
+    real(kind=8), intent(in) :: freqs(nFreq)
+    real(kind=8), intent(in) :: fCoeffs(nC, nFreq)
+    real(kind=8), intent(in) :: par(nLayers+1)
+    real(kind=8), intent(in) :: thk(nLayers+1)
+    integer, intent(in) :: nKeep
+    complex(kind=8), intent(inout) :: un(nC, nFreq, nLayers+1)
+    complex(kind=8), intent(inout) :: Y(nC, nFreq, nLayers+1)
+    complex(kind=8), intent(inout) :: rTE(nC, nFreq)
+    complex(kind=8), intent(inout) :: u0(nC, nFreq)
+
+    complex(kind=8) :: omega(nFreq), b0(nFreq)
+    complex(kind=8) :: a0, a1, a2, a3, a4
+    real(kind=8) :: p, t
+
+    integer :: i, iTop, j, k, nL1
+
+    nL1 = nLayers + 1
+    ! Layers below iTop are unchanged, and so are their propagators
+    iTop = nL1 - min(nKeep, nLayers)
+
+    do k = 1, nFreq
+        omega(k) = complex(0.d0, pi2 * freqs(k)) * mu0
+        b0(k) = 1.d0 / omega(k)
+    enddo
+
+    do i = 1, iTop
+        p = par(i)
+        do k = 1, nFreq
+            do j = 1, nC
+                un(j, k, i) = sqrt(((omega(k) * eps0 + p) * omega(k)) + fCoeffs(j, k)**2.d0)
+            enddo
+        enddo
+    enddo
+
+    if (iTop == nL1) then
+        do k = 1, nFreq
+            do j = 1, nC
+                Y(j, k, nL1) = un(j, k, nL1) * b0(k)
+            enddo
+        enddo
+    endif
+
+    do i = min(iTop, nLayers), 2, -1
+        t = thk(i)
+        do k = 1, nFreq
+            do j = 1, nC
+                a3 = un(j, k, i) * b0(k)
+                a4 = Y(j, k, i + 1)
+                a0 = cTanh(un(j, k, i) * t)
+                a1 = a4 + (a3 * a0) ! Numerator
+                a2 = 1.d0 / (a3 + (a4 * a0)) ! Denominator
+                Y(j, k, i) = a3 * a1 * a2
+            enddo
+        enddo
+    enddo
+
+    do k = 1, nFreq
+        do j = 1, nC
+            u0(j, k) = un(j, k, 1)
+            a0 = un(j, k, 1) * b0(k)
+            a1 = Y(j, k, 2)
+            rTE(j, k) = (a0 - a1) / (a0 + a1)
+        enddo
+    enddo
+
 end subroutine
 !====================================================================!
 !====================================================================!
@@ -268,7 +623,7 @@ subroutine calcFdemSensitivity1D(nFreq, nC, nLayers, freqs, fCoeffs, par, thk, r
                 u0(j, k) = un(j, k, 1)
                 a0 = Yn(j, k, 1)
                 a1 = Y(j, k, 2)
-                a2 = 1.d0 / a0 + a1
+                a2 = 1.d0 / (a0 + a1)
                 rTE(j, k) = (a0 - a1) *  a2
                 sens(j, k, 1) = -2.d0 * a0 * sens(j, k, 1) * a2**2.d0
             enddo
@@ -59,6 +59,11 @@ class Model1D(Model):
 
     def __init__(self, nCells=None, top=0.0, parameters = None, depth = None, thickness = None):
         """Instantiate a new Model1D """
+        # Undo record for in-place perturbations
+        self._undo = None
+        # Preallocated memory for the layers, see Model1D.allocate
+        self._buffers = None
+
         if (nCells is None): return
         assert (nCells >= 1), ValueError('nCells must >= 1')
         assert (not(not thickness is None and not depth is None)), TypeError('Cannot instantiate with both depth and thickness values')
@@ -129,22 +134,44 @@ class Model1D(Model):
         other = Model1D(nCells=None)
         other.nCells = self.nCells.deepcopy()
         other.top = self.top
-        other.depth = self.depth.deepcopy()
-        other.thk = self.thk.deepcopy()
         other.minThickness = self.minThickness
         other.minDepth = self.minDepth
         other.maxDepth = self.maxDepth
         other.maxLayers = self.maxLayers
-        other.par = self.par.deepcopy()
-        other.dpar = self.dpar.deepcopy()
-        other.chie = self.chie.deepcopy() #StatArray(other.nCells[0], "Magnetic Susceptibility", r"$\kappa$")
-        other.chim = self.chim.deepcopy() #StatArray(other.nCells[0], "Magnetic Permeability", "$\frac{H}{m}$")
+        if (self._buffers is None):
+            other._buffers = None
+            other.depth = self.depth.deepcopy()
+            other.thk = self.thk.deepcopy()
+            other.par = self.par.deepcopy()
+            other.dpar = self.dpar.deepcopy()
+            other.chie = self.chie.deepcopy() #StatArray(other.nCells[0], "Magnetic Susceptibility", r"$\kappa$")
+            other.chim = self.chim.deepcopy() #StatArray(other.nCells[0], "Magnetic Permeability", "$\frac{H}{m}$")
+        else:
+            # Copy the preallocated memory and view it, attaching copies of any priors and proposals
+            other._buffers = {}
+            for key in self._buffers:
+                other._buffers[key] = StatArray(self._buffers[key])
+                this = getattr(self, key)
+                view = other._buffers[key][:this.size]
+                if (this.hasPrior()):
+                    view._prior = this.prior.deepcopy()
+                if (this.hasProposal()):
+                    view._proposal = this.proposal.deepcopy()
+                setattr(other, key, view)
         other.pWheel = self.pWheel
         other.iLayer = self.iLayer
         other.Hitmap = self.Hitmap
+        other._undo = None
         return other
 
 
+    def __setstate__(self, state):
+        """ Unpickling copies the views of the preallocated memory, so point them back at the buffers """
+        self.__dict__.update(state)
+        if (not self._buffers is None):
+            self._view()
+
+
     def pad(self, size):
         """Copies the properties of a model including all priors or proposals, but pads memory to the given size
         
@@ -179,21 +206,61 @@ class Model1D(Model):
 
     def getDepths(self):
         """Given the thicknesses of each layer, create the depths to each interface. The last depth is inf for the halfspace."""
-        self.depth[0] = self.thk[0]
-        for i in range(1, self.nCells[0] - 1):
-            self.depth[i] = self.depth[i - 1] + self.thk[i]
+        self.depth[:-1] = np.cumsum(self.thk[:-1])
         self.depth[-1] = np.infty
 
 
     def getThickness(self):
         """Given the depths to each interface, compute the layer thicknesses. The last thickness is nan for the halfspace."""
-        self.thk = self.thk.resize(self.nCells[0])
+        if (self._buffers is None):
+            self.thk = self.thk.resize(self.nCells[0])
         self.thk[0] = self.depth[0]
-        for i in range(1, self.nCells[0] - 1):
-            self.thk[i] = self.depth[i] - self.depth[i - 1]
+        self.thk[1:-1] = np.diff(self.depth[:-1])
         self.thk[-1] = np.nan
 
 
+    @property
+    def capacity(self):
+        """The number of cells that memory has been allocated for. """
+        return self.nCells[0] if self._buffers is None else self._buffers['par'].size
+
+
+    def allocate(self, size):
+        """Preallocate memory for up to size cells.
+
+        The parameters, depths, thicknesses, and magnetic properties are stored in fixed length buffers and
+        the model views the first nCells entries.  Inserting and deleting layers then shifts values within
+        the buffers rather than reallocating memory, and the buffers can be written to HDF without padding.
+
+        Parameters
+        ----------
+        size : int
+            Maximum number of cells the model can have.
+
+        """
+        n = self.nCells[0]
+        assert size >= n, ValueError('size must be >= nCells {}'.format(n))
+        self._buffers = {}
+        for key in ['par', 'depth', 'thk', 'chie', 'chim', 'dpar']:
+            this = getattr(self, key)
+            self._buffers[key] = StatArray(size - 1 if key == 'dpar' else size, this.name, this.units, dtype=this.dtype)
+            self._buffers[key][:this.size] = this
+        self._view()
+
+
+    def _view(self):
+        """Point the model attributes at the first nCells entries of the preallocated buffers, keeping any priors and proposals. """
+        n = self.nCells[0]
+        for key in self._buffers:
+            this = getattr(self, key)
+            view = self._buffers[key][:n - 1 if key == 'dpar' else n]
+            if (this.hasPrior()):
+                view._prior = this.prior
+            if (this.hasProposal()):
+                view._proposal = this.proposal
+            setattr(self, key, view)
+
+
     def priorProbability(self, sPar, sGradient, limits=None, components=False):
         """Evaluate the prior probability for the 1D Model.
 
@@ -322,7 +389,7 @@ class Model1D(Model):
         return probability
 
 
-    def insertLayer(self, z, par=None):
+    def insertLayer(self, z, par=None, inPlace=False):
         """Insert a new layer into a model at a given depth
 
         Parameters
@@ -331,6 +398,8 @@ class Model1D(Model):
             Depth at which to insert a new interface
         par : numpy.float64, optional 
             Value of the parameter for the new layer
+        inPlace : bool, optional
+            Modify this model rather than a copy of it.
             
         Returns
         -------
@@ -343,7 +412,27 @@ class Model1D(Model):
         # Get the index to insert the new layer
         i = tmp.searchsorted(z)
         # Deepcopy the 1D Model
-        other = self.deepcopy()
+        other = self if inPlace else self.deepcopy()
+
+        if (not other._buffers is None):
+            n = other.nCells[0]
+            assert n < other.capacity, ValueError('Cannot insert a layer, the model is at its capacity of {} cells'.format(other.capacity))
+            b = other._buffers
+            # Shift the layers below the new interface down by one
+            b['depth'][i + 1:n + 1] = b['depth'][i:n]
+            b['depth'][i] = z
+            b['par'][i + 1:n + 1] = b['par'][i:n]
+            if (not par is None):
+                b['par'][i] = par
+            # Reset ChiE and ChiM
+            b['chie'][:n + 1] = 0.0
+            b['chim'][:n + 1] = 0.0
+            other.nCells += 1
+            other._view()
+            other.getThickness()
+            other.iLayer = i
+            return other
+
         # Increase the number of cells
         other.nCells += 1
         # Insert the new layer depth
@@ -368,13 +457,15 @@ class Model1D(Model):
         return other
 
 
-    def deleteLayer(self, i):
+    def deleteLayer(self, i, inPlace=False):
         """Remove a layer from the model
         
         Parameters
         ----------
         i : int
             The layer to remove.
+        inPlace : bool, optional
+            Modify this model rather than a copy of it.
 
         Returns
         -------
@@ -387,17 +478,32 @@ class Model1D(Model):
             return self
         if (i >= self.nCells[0] - 1):
             return self
+        # Take the average of the deleted layer and the one below it
+        average = 0.5 * (self.par[i] + self.par[i + 1])
         # Deepcopy the 1D Model to ensure priors and proposals are passed
-        other = self.deepcopy()
+        other = self if inPlace else self.deepcopy()
+
+        if (not other._buffers is None):
+            n = other.nCells[0]
+            b = other._buffers
+            # Shift the layers below the deleted interface up by one
+            for key in ['depth', 'par', 'chie', 'chim']:
+                b[key][i:n - 1] = b[key][i + 1:n]
+            b['par'][i] = average
+            other.nCells -= 1
+            other._view()
+            other.getThickness()
+            other.iLayer = np.int64(i)
+            return other
+
         # Decrease the number of cells
         other.nCells -= 1
         # Remove the interface depth
         other.depth = other.depth.delete(i)
         # Get the new thicknesses
         other.getThickness()
-        # Take the average of the deleted layer and the one below it
         other.par = other.par.delete(i)
-        other.par[i] = 0.5 * (self.par[i] + self.par[i + 1])
+        other.par[i] = average
         # Reset ChiE and ChiM
         other.chie = other.chie.delete(i)
         other.chim = other.chim.delete(i)
@@ -488,9 +594,11 @@ class Model1D(Model):
         self.maxLayers = np.int32(maxLayers)
         # Assign a uniform distribution to the number of layers
         self.nCells.setPrior('UniformLog', 1, maxLayers, prng=prng)
+        # Preallocate the memory for the maximum number of layers
+        self.allocate(self.maxLayers)
 
 
-    def perturb(self):
+    def perturb(self, inPlace=False):
         """Perturb a model
 
         Generates a new model by perturbing the current model based on four probabilities.
@@ -507,6 +615,11 @@ class Model1D(Model):
         If the new layer thickness test fails, the birth or perturbation tries again. If the cycle fails after 10 tries, the entire process begins again
         such that a death, or no change is possible thus preventing any neverending cycles.
 
+        Parameters
+        ----------
+        inPlace : bool, optional
+            Perturb this model rather than a copy of it.  Use self.saveState beforehand so that the perturbation can be undone with self.restoreState.
+
         Returns
         -------
         out[0] : Model1D
@@ -521,9 +634,10 @@ class Model1D(Model):
         See Also
         --------
         geobipy.Model1D.makePerturbable : Must be used before calling self.perturb
+        geobipy.Model1D.saveState : Record the model before an in-place perturbation
         
         """
-        other = self.deepcopy()
+        other = self if inPlace else self.deepcopy()
         assert (not other.pWheel is None), ValueError('Please assign a probability wheel to the model with model1D.setProbabilityWheel()')
         prng = self.nCells.prior.prng
         # Pre-compute exponential values (Take them out of log space)
@@ -563,15 +677,15 @@ class Model1D(Model):
                 tries = 0
                 while (not success):  # Continue while the new layer is smaller than the minimum
                     # Get the new depth
-                    tmp = np.float64(prng.uniform(other.minDepth, other.maxDepth, 1))
+                    tmp = np.float64(prng.uniform(other.minDepth, other.maxDepth))
                     newDepth = np.exp(tmp)
                     z = other.depth[:-1]
-                    # Insert the new depth
+                    # Find where the new depth would be inserted
                     i = z.searchsorted(newDepth)
-                    z = z.insert(i, newDepth)
-                    # Get the thicknesses
-                    z = z.prepend(0.0)
-                    h = np.min(np.diff(z[:]))
+                    # Get the thicknesses either side of the new interface, all others are unchanged
+                    h = newDepth if i == 0 else newDepth - z[i - 1]
+                    if (i < z.size):
+                        h = np.minimum(h, z[i] - newDepth)
                     tries += 1
                     if (h > hmin):
                         success = True  # Exit if thickness is larger than minimum
@@ -579,13 +693,13 @@ class Model1D(Model):
                         success = True
                         tryAgain = True
                 if (not tryAgain):
-                    return other.insertLayer(newDepth), 0, [newDepth, None]
+                    return other.insertLayer(newDepth, inPlace=True), 0, [newDepth, None]
 
             if (option == 1):
                 # Get the layer to remove
                 iDeleted = np.int64(prng.uniform(0, other.nCells - 1, 1)[0])
                 # Remove the layer and return
-                return other.deleteLayer(iDeleted), 1, [iDeleted, None]
+                return other.deleteLayer(iDeleted, inPlace=True), 1, [iDeleted, None]
 
             if (option == 2):
                 success = False
@@ -597,15 +711,17 @@ class Model1D(Model):
                     i = np.int64(prng.uniform(0, k, 1)[0])
                     # Get the perturbation amount
                     dz = np.sign(prng.randn()) * hmin * prng.uniform()
-                    # Perturb the layer
-                    z = z.prepend(0.0)
-                    z[i + 1] += dz
-                    # Get the minimum thickness
-                    h = np.min(np.diff(z))
+                    # Get the thicknesses either side of the perturbed interface, all others are unchanged
+                    h = (z[i] + dz) if i == 0 else (z[i] + dz) - z[i - 1]
+                    if (i + 1 < k):
+                        h = np.minimum(h, z[i + 1] - (z[i] + dz))
+                    # Get the shallowest and deepest interfaces
+                    zTop = z[0] + dz if i == 0 else z[0]
+                    zBottom = z[-1] + dz if i == k - 1 else z[-1]
                     tries += 1
                     # Exit if the thickness is big enough, and we stayed within
                     # the depth bounds
-                    if (h > hmin and z[1] > zmin and z[-1] < zmax):
+                    if (h > hmin and zTop > zmin and zBottom < zmax):
                         success = True
                     if (tries == nTries):
                         success = True
@@ -617,6 +733,58 @@ class Model1D(Model):
                     return other, 2, [i, dz]
 
 
+    def saveState(self):
+        """Record the current state of the model so that an in-place perturbation can be undone.
+
+        The layer parameters and depths are copied into buffers of length maxLayers that are allocated once,
+        along with the number of cells, the last perturbed layer and the proposal attached to the parameters.
+
+        See Also
+        --------
+        geobipy.Model1D.restoreState : Undo any changes made since the last call to saveState
+
+        """
+        if (self._undo is None):
+            n = self.nCells[0] if self.maxLayers is None else np.maximum(self.maxLayers, self.nCells[0])
+            self._undo = {'par' : np.zeros(n), 'depth' : np.zeros(n)}
+        n = self.nCells[0]
+        if (self._undo['par'].size < n):
+            self._undo['par'] = np.zeros(n)
+            self._undo['depth'] = np.zeros(n)
+        self._undo['par'][:n] = self.par
+        self._undo['depth'][:n] = self.depth
+        self._undo['nCells'] = n
+        self._undo['iLayer'] = self.iLayer
+        self._undo['proposal'] = self.par.proposal
+
+
+    def restoreState(self):
+        """Undo any changes made to the model since the last call to self.saveState
+
+        See Also
+        --------
+        geobipy.Model1D.saveState : Record the model before an in-place perturbation
+
+        """
+        assert (not self._undo is None), TypeError('No state has been saved. Use Model1D.saveState() first.')
+        n = self._undo['nCells']
+        if (self.nCells[0] != n and not self._buffers is None):
+            self.nCells[0] = n
+            self._view()
+        elif (self.nCells[0] != n):
+            self.nCells[0] = n
+            self.par = self.par.resize(n)
+            self.depth = self.depth.resize(n)
+            self.chie = self.chie.resize(n)
+            self.chim = self.chim.resize(n)
+            self.dpar = self.dpar.resize(n - 1)
+        self.par[:] = self._undo['par'][:n]
+        self.depth[:] = self._undo['depth'][:n]
+        self.getThickness()
+        self.iLayer = self._undo['iLayer']
+        self.par._proposal = self._undo['proposal']
+
+
     def summary(self, out=False):
         """ Write a summary of the 1D model """
         msg = "1D Model: \n"
@@ -845,9 +1013,7 @@ class Model1D(Model):
             The hitmap to add to
         
         """
-        iM = self.getParMeshXIndex(Hitmap)
-        iz = np.arange(Hitmap.y.size)
-        Hitmap.arr[iz, iM] += 1
+        Hitmap.update(self.getParMeshXIndex(Hitmap))
 
 
     # def setReferenceHitmap(self, Hitmap):
@@ -1109,9 +1275,15 @@ class Model1D(Model):
 
         self.nCells.createHdf(grp, 'nCells', nRepeats=nRepeats)
         self.top.createHdf(grp, 'top', nRepeats=nRepeats, fillvalue=fillvalue)
-        self.depth.createHdf(grp, 'depth', nRepeats=nRepeats, fillvalue=fillvalue)
-        self.thk.createHdf(grp, 'thk', nRepeats=nRepeats, fillvalue=fillvalue)
-        self.par.createHdf(grp, 'par', nRepeats=nRepeats, fillvalue=fillvalue)
+        if (self._buffers is None):
+            self.depth.createHdf(grp, 'depth', nRepeats=nRepeats, fillvalue=fillvalue)
+            self.thk.createHdf(grp, 'thk', nRepeats=nRepeats, fillvalue=fillvalue)
+            self.par.createHdf(grp, 'par', nRepeats=nRepeats, fillvalue=fillvalue)
+        else:
+            # Memory has been preallocated, so create space for the full capacity of the model
+            self._buffers['depth'].createHdf(grp, 'depth', nRepeats=nRepeats, fillvalue=fillvalue)
+            self._buffers['thk'].createHdf(grp, 'thk', nRepeats=nRepeats, fillvalue=fillvalue)
+            self._buffers['par'].createHdf(grp, 'par', nRepeats=nRepeats, fillvalue=fillvalue)
         #self.chie.createHdf(grp, 'chie', nRepeats=nRepeats, fillvalue=fillvalue)
         #self.chim.createHdf(grp, 'chim', nRepeats=nRepeats, fillvalue=fillvalue)
 
@@ -7,6 +7,7 @@ from ...base import interpolation
 from ...base import customFunctions as cf
 from ...base import customPlots as cP
 from .Point import Point
+from .PointStore import PointStore
 from ...base import MPI
 from scipy.spatial import cKDTree
 
@@ -73,6 +74,8 @@ class PointCloud3D(myObject):
         self.kdtree = None
         # Bounding Box
         self.bounds = None
+        # Binary store that the values of each point are read from, instead of the arrays, see PointCloud3D.openStore
+        self.store = None
 
         self.getBounds()
 
@@ -93,6 +96,10 @@ class PointCloud3D(myObject):
 
     def getBounds(self):
         """Gets the bounding box of the data set """
+        # An empty point cloud, e.g. one whose points are read from a store, has no bounds
+        if (np.size(self.x) == 0):
+            self.bounds = None
+            return
         self.bounds = np.asarray([np.min(self.x), np.max(self.x), np.min(self.y), np.max(self.y)])
 
 
@@ -143,22 +150,18 @@ class PointCloud3D(myObject):
         if cols is not given, the first three columns are read.
         Otherwise specify with cols=[2,3,4] """
         assert np.size(cols) == 3, 'size(cols) must equal 3'
-        nLines = fIO.getNlines(fname, nHeaders)
+        # Read the requested columns
+        values = fIO.read_columns(fname, list(cols), nHeaders)
         # Initialize the Data
-        self.__init__(nLines)
-        # Read each line assign the values to the class
+        self.__init__(values.shape[0])
         tmp = fIO.getHeaderNames(fname, cols)
-        with open(fname) as f:
-            self.x.name = tmp[0]
-            self.y.name = tmp[1]
-            self.z.name = tmp[2]
-            fIO.skipLines(f, nHeaders)  # Skip header lines
-            for j, line in enumerate(f):  # For each line in the file
-                values = fIO.getRealNumbersfromLine(line, cols)  # grab the requested entries
-                # Assign values into object
-                self.x[j] = values[0]
-                self.y[j] = values[1]
-                self.z[j] = values[2]
+        self.x.name = tmp[0]
+        self.y.name = tmp[1]
+        self.z.name = tmp[2]
+        # Assign values into object
+        self.x[:] = values[:, 0]
+        self.y[:] = values[:, 1]
+        self.z[:] = values[:, 2]
 
 
     def scatter2D(self, **kwargs):
@@ -323,6 +326,63 @@ class PointCloud3D(myObject):
         return x, y, vals        
 
 
+    def pointRows(self):
+        """Get the values of each point as the rows of a 2D array, see PointStore
+
+        Subclasses append the values needed to create their data points, and read them back from a row when the
+        points are read from a store.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            The x, y, z co-ordinates of each point.
+
+        """
+        return np.column_stack([self.x, self.y, self.z])
+
+
+    def toStore(self, fName):
+        """Write the values of each point to a binary store that can be read one point at a time
+
+        Parameters
+        ----------
+        fName : str
+            Name of the store.
+
+        """
+        PointStore.write(fName, self.pointRows())
+
+
+    def openStore(self, fName, nCache=256):
+        """Read the values of each point from a binary store, written with toStore, only when they are needed
+
+        Parameters
+        ----------
+        fName : str
+            Name of the store.
+        nCache : int, optional
+            Number of recently used points to keep in memory.
+
+        """
+        self.store = PointStore(fName, nCache)
+        assert self.store.N == self.N, ValueError('The store has {} points but {} were expected'.format(self.store.N, self.N))
+
+
+    def prefetch(self, indices):
+        """Read the values of several points from the store in a single pass, before they are needed
+
+        Does nothing if the points are not read from a store, see PointStore.prefetch.
+
+        Parameters
+        ----------
+        indices : array_like of ints
+            Indices of the points.
+
+        """
+        if (not self.store is None):
+            self.store.prefetch(indices)
+
+
     def Bcast(self, world, root=0):
         """Broadcast a PointCloud3D using MPI 
         
@@ -0,0 +1,140 @@
+""" @PointStore_Class
+Module describing a binary store of the values of each data point in a data set
+"""
+import os
+import numpy as np
+from collections import OrderedDict
+from os.path import join
+from ...classes.core.myObject import myObject
+from ...base import fileIO as fIO
+
+
+class PointStore(myObject):
+    """A binary store of the values of each data point, read one row at a time
+
+    PointStore(fName, nCache)
+
+    Every value needed to create a data point, its co-ordinates, data, standard deviations and so on, is held in one
+    contiguous row of a C ordered .npy file.  The file is memory mapped, so getting a data point only reads the pages of
+    its row rather than the whole data set.  The most recently used rows are kept in a least recently used cache, and
+    the rows of a chunk of data points can be read in a single pass with PointStore.prefetch.
+
+    The layout of a row is defined by the data set that writes it, see e.g. PointCloud3D.pointRows.
+
+    Parameters
+    ----------
+    fName : str
+        Name of the store, written with PointStore.write.
+    nCache : int, optional
+        Number of rows to keep in memory.
+
+    """
+
+    # Name of the store inside an output directory
+    fileName = 'points.npy'
+
+    def __init__(self, fName=None, nCache=256):
+        """ Initialize the store """
+        if (fName is None):
+            return
+        assert fIO.fileExists(fName), 'Cannot find file '+fName
+        assert nCache > 0, ValueError('nCache must be > 0')
+        self.fName = fName
+        self.rows = np.load(fName, mmap_mode='r')
+        assert self.rows.ndim == 2, ValueError('The point store must have 2 dimensions')
+        self.nCache = np.int64(nCache)
+        self.cache = OrderedDict()
+
+
+    @classmethod
+    def inDirectory(cls, directory):
+        """ Get the name of the point store in a directory """
+        return join(directory, cls.fileName)
+
+
+    @staticmethod
+    def write(fName, rows):
+        """Write the rows of every data point to a store
+
+        The rows are written to a temporary file that then replaces fName, so that a partially written store is never
+        read.
+
+        Parameters
+        ----------
+        fName : str
+            Name of the store.
+        rows : array_like
+            2D array with the values of each data point in its row.
+
+        """
+        rows = np.ascontiguousarray(rows, dtype=np.float64)
+        assert rows.ndim == 2, ValueError('rows must have 2 dimensions')
+        tmp = '{}.{}.tmp'.format(fName, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, rows)
+        os.replace(tmp, fName)
+
+
+    @property
+    def N(self):
+        """Number of data points in the store """
+        return self.rows.shape[0]
+
+
+    @property
+    def width(self):
+        """Number of values in each row """
+        return self.rows.shape[1]
+
+
+    def getRow(self, i):
+        """Get the values of the ith data point
+
+        Parameters
+        ----------
+        i : int
+            Index of the data point.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            The row of the data point.
+
+        """
+        i = np.int64(i)
+        row = self.cache.get(i)
+        if (row is None):
+            assert 0 <= i < self.N, ValueError("Requested data point must have index (0, "+str(self.N) + ']')
+            row = np.array(self.rows[i, :])
+            self._add(i, row)
+        else:
+            self.cache.move_to_end(i)
+        return row
+
+
+    def prefetch(self, indices):
+        """Read the rows of several data points into the cache in a single pass
+
+        Parameters
+        ----------
+        indices : array_like of ints
+            Indices of the data points, e.g. the next chunk that will be inverted.  Only the last nCache are kept.
+
+        """
+        indices = np.unique(np.asarray(indices, dtype=np.int64)[-self.nCache:])
+        missing = np.asarray([i for i in indices if not i in self.cache], dtype=np.int64)
+        if (missing.size == 0):
+            return
+        assert missing[0] >= 0 and missing[-1] < self.N, ValueError("Requested data points must have indices (0, "+str(self.N) + ']')
+        # The indices are sorted, so the rows are read in the order they are stored
+        rows = self.rows[missing, :]
+        for i, row in zip(missing, rows):
+            self._add(i, row)
+
+
+    def _add(self, i, row):
+        """ Add a row to the cache, removing the least recently used row if the cache is full """
+        self.cache[i] = row
+        self.cache.move_to_end(i)
+        while (len(self.cache) > self.nCache):
+            self.cache.popitem(last=False)
@@ -0,0 +1,287 @@
+""" @DepthSummary_Class
+Module describing running summaries of the posterior parameter at each depth of a mesh
+"""
+import numpy as np
+from ...classes.core.myObject import myObject
+from ...classes.core.StatArray import StatArray
+from ...base.customFunctions import safeEval
+
+
+class DepthSummary(myObject):
+    """Running summaries of the posterior parameter at each depth
+
+    DepthSummary(y, percents)
+
+    Every sample of the parameter-depth profile updates, at each depth of y, the mean and variance of the log of the
+    parameter with Welford's algorithm, and an estimate of each percentile with the P-square algorithm of Jain and
+    Chlamtac (1985), which keeps five markers per percentile rather than the samples.  The number of samples that have a
+    layer interface within each depth cell is also counted.
+
+    The summaries are what the maps are made from, so once written to a results file, maps of the mean, the credible
+    range, or the interface probability are a direct read rather than a pass over every hitmap.
+
+    Parameters
+    ----------
+    y : geobipy.StatArray
+        Depths at which to summarize the parameter, e.g. the y axis of the hitmap.
+    percents : array_like, optional
+        Percentiles to estimate.
+
+    """
+
+    def __init__(self, y=None, percents=[5.0, 50.0, 95.0]):
+        """ Initialize the summaries """
+        if (y is None):
+            return
+
+        self.y = y.deepcopy()
+        nz = self.y.size
+        self.percents = StatArray(np.asarray(percents, dtype=np.float64), 'Percentile', '%')
+        nq = self.percents.size
+        assert np.all((self.percents > 0.0) & (self.percents < 100.0)), ValueError('percents must be between 0 and 100')
+
+        # Number of samples
+        self.n = np.int64(0)
+        # Welford's running mean, and sum of squared differences from the mean, of the log parameter
+        self._mean = np.zeros(nz)
+        self._m2 = np.zeros(nz)
+        # Number of samples with an interface in each depth cell
+        self._interfaces = np.zeros(nz, dtype=np.int64)
+        # Depths as a plain array, for speed
+        self._y = np.asarray(self.y)
+
+        # P-square markers of each percentile at each depth, the first axis indexes the five markers
+        p = 0.01 * np.asarray(self.percents)
+        self._increments = np.vstack([np.zeros(nq), 0.5 * p, p, 0.5 * (1.0 + p), np.ones(nq)])[:, :, np.newaxis]
+        self._heights = np.zeros([5, nq, nz])
+        self._positions = np.zeros([5, nq, nz]) + np.arange(1.0, 6.0)[:, np.newaxis, np.newaxis]
+        self._desired = 1.0 + 4.0 * self._increments
+        # Percentiles read from a file, in place of the markers
+        self._quantiles = None
+
+
+    @property
+    def mean(self):
+        """Mean of the log parameter at each depth """
+        return StatArray(self._mean, 'Mean log parameter')
+
+
+    @property
+    def variance(self):
+        """Variance of the log parameter at each depth """
+        return StatArray(self._m2 / np.maximum(self.n - 1, 1), 'Variance of log parameter')
+
+
+    @property
+    def interfaceProbability(self):
+        """Probability of a layer interface within each depth cell """
+        return StatArray(self._interfaces / np.float64(max(self.n, 1)), 'Probability of interface')
+
+
+    def deepcopy(self):
+        """ Define a deepcopy routine """
+        return self.__deepcopy__()
+
+
+    def __deepcopy__(self, memo=None):
+        """ Define a deepcopy routine """
+        other = DepthSummary()
+        for k, v in self.__dict__.items():
+            setattr(other, k, v.copy() if isinstance(v, np.ndarray) else v)
+        return other
+
+
+    def update(self, values, interfaces=None):
+        """Add a sample of the parameter-depth profile
+
+        Parameters
+        ----------
+        values : array_like
+            Parameter at each depth of DepthSummary.y.
+        interfaces : array_like, optional
+            Depths of the layer interfaces of the sample.
+
+        """
+        x = np.log(np.asarray(values, dtype=np.float64))
+
+        self.n += 1
+        delta = x - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (x - self._mean)
+
+        if (not interfaces is None and np.size(interfaces) > 0):
+            iz = np.minimum(self._y.searchsorted(np.asarray(interfaces)), self._y.size - 1)
+            hit = np.zeros(self._y.size, dtype=np.bool_)
+            hit[iz] = True
+            self._interfaces += hit
+
+        self._updateQuantiles(x)
+
+
+    def _updateQuantiles(self, x):
+        """ Update the P-square markers of every percentile at every depth with the sample x """
+        q = self._heights
+        if (self.n <= 5):
+            # The first five samples are the initial marker heights
+            q[self.n - 1] = x
+            if (self.n == 5):
+                q.sort(axis=0)
+            return
+
+        n = self._positions
+
+        # Find the cell k of the markers containing x, extending the extreme markers if necessary
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        k = np.sum(x >= q[1:4], axis=0)
+
+        # Increment the positions of the markers above the cell
+        n += np.arange(5)[:, np.newaxis, np.newaxis] > k
+        self._desired += self._increments
+
+        # Adjust the heights of the middle markers
+        for i in range(1, 4):
+            qi, qa, qb = q[i], q[i - 1], q[i + 1]
+            ni, na, nb = n[i], n[i - 1], n[i + 1]
+            d = self._desired[i] - ni
+            up = (d >= 1.0) & (nb - ni > 1.0)
+            move = up | ((d <= -1.0) & (na - ni < -1.0))
+            if (not np.any(move)):
+                continue
+            d = np.where(up, 1.0, -1.0)
+
+            # Piecewise parabolic prediction
+            qp = qi + (d / (nb - na)) * ((ni - na + d) * (qb - qi) / (nb - ni) + (nb - ni - d) * (qi - qa) / (ni - na))
+
+            # Linear prediction where the parabola leaves the neighbouring markers
+            ql = qi + d * (np.where(up, qb, qa) - qi) / (np.where(up, nb, na) - ni)
+
+            q[i] = np.where(move, np.where((qa < qp) & (qp < qb), qp, ql), qi)
+            n[i] += np.where(move, d, 0.0)
+
+
+    def getQuantiles(self):
+        """Get the estimated percentiles of the parameter at each depth
+
+        Returns
+        -------
+        out : geobipy.StatArray
+            Percentiles with shape [y.size, percents.size].
+
+        """
+        if (not self._quantiles is None):
+            return self._quantiles
+        if (self.n == 0):
+            return StatArray(np.full([self.y.size, self.percents.size], np.nan), 'Parameter percentiles')
+        if (self.n < 5):
+            # Too few samples for the markers, use the samples themselves
+            out = np.percentile(self._heights[:self.n, 0, :], self.percents, axis=0).T
+        else:
+            out = self._heights[2].T
+        return StatArray(np.exp(out), 'Parameter percentiles')
+
+
+    def getConfidenceIntervals(self, percent=95.0, log=None):
+        """Get the median and the credible interval at each depth
+
+        Parameters
+        ----------
+        percent : float, optional
+            The interval is between the 100 - percent and percent percentiles, which must be in DepthSummary.percents.
+        log : 'e' or float, optional
+            Take the log of the values to this base.
+
+        Returns
+        -------
+        out : tuple of geobipy.StatArray
+            The median, lower, and upper values at each depth.
+
+        """
+        q = self.getQuantiles()
+        i = [self._percentIndex(x) for x in [50.0, 100.0 - percent, percent]]
+        out = [q[:, j] for j in i]
+        if (not log is None):
+            out = [np.log(x) / np.log(np.e if log == 'e' else log) for x in out]
+        return tuple(out)
+
+
+    def getOpacity(self, percent=95.0, log=10, high=None):
+        """Get an opacity between 0 and 1 with depth from the width of the credible interval, see Hitmap2D.getOpacity """
+        sMed, sLow, sHigh = self.getConfidenceIntervals(percent, log=log)
+        opacity = sHigh - sLow
+        if (not high is None):
+            opacity = np.minimum(opacity, high)
+        maxes = np.max(opacity)
+        if (maxes == 0.0): return opacity
+        return 1.0 - opacity / maxes
+
+
+    def _percentIndex(self, percent):
+        """ Get the index of a percentile in DepthSummary.percents """
+        i = np.where(np.isclose(self.percents, percent))[0]
+        assert i.size == 1, ValueError('The {} percentile is not summarized, available percentiles are {}'.format(percent, self.percents))
+        return i[0]
+
+
+    def hdfName(self):
+        """ Reprodicibility procedure """
+        return('DepthSummary()')
+
+
+    def createHdf(self, parent, myName, nRepeats=None, fillvalue=None):
+        """ Create the hdf group metadata in file
+        parent: HDF object to create a group inside
+        myName: Name of the group
+        """
+        grp = parent.create_group(myName)
+        grp.attrs["repr"] = self.hdfName()
+        self.y.toHdf(grp, 'y')
+        self.percents.toHdf(grp, 'percents')
+        StatArray(1, '# of samples', dtype=np.int64).createHdf(grp, 'n', nRepeats=nRepeats, fillvalue=0)
+        self.mean.createHdf(grp, 'mean', nRepeats=nRepeats, fillvalue=fillvalue)
+        self.variance.createHdf(grp, 'variance', nRepeats=nRepeats, fillvalue=fillvalue)
+        self.getQuantiles().createHdf(grp, 'quantiles', nRepeats=nRepeats, fillvalue=fillvalue)
+        self.interfaceProbability.createHdf(grp, 'interfaces', nRepeats=nRepeats, fillvalue=fillvalue)
+
+
+    def writeHdf(self, parent, myName, index=None):
+        """ Write the summaries to an HDF object
+        parent: Upper hdf file or group
+        myName: object hdf name. Assumes createHdf has already been called
+        """
+        ai = None if index is None else np.s_[index, :]
+        StatArray(np.r_[self.n]).writeHdf(parent, myName+'/n', index=index)
+        self.mean.writeHdf(parent, myName+'/mean', index=ai)
+        self.variance.writeHdf(parent, myName+'/variance', index=ai)
+        self.getQuantiles().writeHdf(parent, myName+'/quantiles', index=None if index is None else np.s_[index, :, :])
+        self.interfaceProbability.writeHdf(parent, myName+'/interfaces', index=ai)
+
+
+    def toHdf(self, h5obj, myName):
+        """ Write the summaries to an HDF object
+        h5obj: :An HDF File or Group Object.
+        """
+        self.createHdf(h5obj, myName)
+        self.writeHdf(h5obj, myName)
+
+
+    def fromHdf(self, grp, index=None):
+        """Reads the summaries from a HDF file
+
+        Only the summaries are stored, so the object that is read cannot be updated with further samples.
+
+        """
+        ai = None if index is None else np.s_[index, :]
+
+        def read(name, index=None):
+            item = grp.get(name)
+            obj = eval(safeEval(item.attrs.get('repr')))
+            return obj.fromHdf(item, index=index)
+
+        tmp = DepthSummary(read('y'), read('percents'))
+        tmp.n = np.int64(read('n', index)[0])
+        tmp._mean[:] = read('mean', ai)
+        tmp._m2[:] = read('variance', ai) * max(tmp.n - 1, 1)
+        tmp._interfaces[:] = np.round(read('interfaces', ai) * max(tmp.n, 1))
+        tmp._quantiles = read('quantiles', None if index is None else np.s_[index, :, :])
+        return tmp
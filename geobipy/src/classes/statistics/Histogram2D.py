@@ -13,12 +13,12 @@ import matplotlib.pyplot as plt
 class Histogram2D(RectilinearMesh2D):
     """ 2D Histogram class that can update and plot efficiently """
 
-    def __init__(self, x=None, y=None, name=None, units=None):
+    def __init__(self, x=None, y=None, name=None, units=None, dtype=np.int64):
         """ Instantiate a 2D histogram """
         if (x is None):
             return
         # Instantiate the parent class
-        RectilinearMesh2D.__init__(self, x=x, y=y, name='Frequency', units=None, dtype=np.int64)
+        RectilinearMesh2D.__init__(self, x=x, y=y, name='Frequency', units=None, dtype=dtype)
         # Point xBins to self.x to make variable names more intuitive
         self.xBins = self.x
         # Point yBins to self.y to make variable names more intuitive
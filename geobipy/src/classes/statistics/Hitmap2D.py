@@ -9,7 +9,61 @@ from .Histogram2D import Histogram2D
 from ...base.customFunctions import _logSomething, isInt
 
 class Hitmap2D(Histogram2D):
-    """ Class defining a 2D hitmap whose cells are rectangular with linear sides """
+    """ Class defining a 2D hitmap whose cells are rectangular with linear sides
+
+    Hitmap2D(x, y, name, units, dtype)
+
+    The counts can be stored with a narrower integer type than the default int64, e.g. np.uint16, to reduce the memory
+    and the size of the results.  Each sample adds one count to every row, so a count can never exceed the number of
+    samples, and the counts are promoted to a wider type by Hitmap2D.update before they could overflow.
+
+    """
+
+    @staticmethod
+    def countType(nSamples, dtype=np.int64):
+        """Get the narrowest integer type of the same kind as dtype, and at least as wide, that can count nSamples
+
+        Parameters
+        ----------
+        nSamples : int
+            Largest number of samples that will be added to the hitmap.
+        dtype : numpy integer dtype, optional
+            Narrowest type to use.
+
+        Returns
+        -------
+        out : numpy.dtype
+            The type of the counts.
+
+        """
+        dtype = np.dtype(dtype)
+        assert dtype.kind in 'iu', TypeError('dtype must be an integer type')
+        while (np.iinfo(dtype).max < nSamples and dtype.itemsize < 8):
+            dtype = np.dtype(dtype.kind + str(2 * dtype.itemsize))
+        return dtype
+
+
+    def update(self, iX):
+        """Add a sample by adding one count to the column iX[i] of each row i
+
+        Parameters
+        ----------
+        iX : array of ints
+            Column index of the sample in each row.
+
+        """
+        if (self.arr.itemsize < 8):
+            # Every sample adds one count to each row, so the sum of a row is the number of samples.  The row is only
+            # summed the first time, after which the samples are counted.
+            nSamples = getattr(self, '_nSamples', None)
+            if (nSamples is None):
+                nSamples = np.int64(self.arr[0, :].sum())
+            if (nSamples >= np.iinfo(self.arr.dtype).max):
+                self.arr = self.arr.astype(self.countType(nSamples + 1, self.arr.dtype))
+                self.counts = self.arr
+            self._nSamples = nSamples + 1
+        self.arr[np.arange(self.y.size), iX] += 1
+
 
     def varianceCutoff(self, percent=67.0):
         """ Get the cutoff value along y axis from the bottom up where the variance is percent*max(variance) """
@@ -72,6 +126,7 @@ class Hitmap2D(Histogram2D):
         item = grp.get('y')
         this = eval(safeEval(item.attrs.get('repr')))
         y = this.fromHdf(item, index=bi)
-        tmp = Hitmap2D(x, y)
+        tmp = Hitmap2D(x, y, dtype=arr.dtype)
         tmp.arr = arr
+        tmp.counts = tmp.arr
         return tmp
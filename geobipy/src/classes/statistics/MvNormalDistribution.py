@@ -3,19 +3,22 @@ Module defining a multivariate normal distribution with statistical procedures
 """
 #from copy import deepcopy
 import numpy as np
+from scipy.linalg import solve_triangular
 from ...base  import customFunctions as cf
 from ...base.logging import myLogger
 from .baseDistribution import baseDistribution
 from .NormalDistribution import Normal
+from ..core.CholeskyFactor import CholeskyFactor
 from ...base.HDF.hdfWrite import writeNumpy
 
 class MvNormal(baseDistribution):
     """Multivariate normal distribution """
 
-    def __init__(self, mean, variance, prng=None):
+    def __init__(self, mean, variance, prng=None, precision=None):
         """ Initialize a normal distribution
         mu:     :Mean of the distribution
         sigma:  :Standard deviation of the distribution
+        precision: :CholeskyFactor of the inverse of the covariance, used instead of sigma if given
 
         """
         #assert (np.ndim(mean) > 0 and np.ndim(variance) > 0), ValueError("mean and variance must be > 1 dimension")
@@ -33,6 +36,12 @@ class MvNormal(baseDistribution):
 
         self.multivariate = True
 
+        self.precision = precision
+        if (not precision is None):
+            assert precision.size == np.size(mean), 'Precision must have same dimensions as the mean'
+            self.variance = None
+            return
+
         # Variance
         if np.ndim(variance) == 0:
             self.variance = np.zeros(np.size(mean))
@@ -50,7 +59,25 @@ class MvNormal(baseDistribution):
     def deepcopy(self):
         """ Define a deepcopy routine """
         # return deepcopy(self)
-        return MvNormal(self.mean, self.variance, self.prng)
+        return MvNormal(self.mean, self.variance, self.prng, self.precision)
+
+
+    @property
+    def variance(self):
+        """The variance of the distribution.
+
+        Assigning a new variance clears the cached normalising constants.  The variance should therefore be
+        assigned rather than modified in place.
+
+        """
+        return self._variance
+
+    @variance.setter
+    def variance(self, value):
+        self._variance = value
+        self._logDet = None
+        self._inverse = None
+        self._factor = None
 
 
     def getPdf(self, x):
@@ -63,6 +90,10 @@ class MvNormal(baseDistribution):
 
     def rng(self, size = 1):
         """  """
+        if (not self.precision is None):
+            # Sample with covariance inv(LL') by back substitution
+            tmp = self.precision.solveLT(self.prng.standard_normal([self.mean.size, size])).T + self.mean
+            return np.squeeze(tmp) if size == 1 else tmp
         if self.variance.ndim == 0:
             return np.sqrt(self.variance) * self.prng.randn(size) + self.mean
         if (self.variance.ndim == 1):
@@ -76,23 +107,72 @@ class MvNormal(baseDistribution):
         N = samples.size
         nD = self.mean.size
         assert (N == nD), TypeError('size of samples {} must equal number of distribution dimensions {} for a multivariate distribution'.format(N, nD))
-        # For a diagonal matrix, the determinant is the product of the diagonal
-        # entries
-        dv = cf.Det(self.variance)
-        # subtract the mean from the samples.
-        xMu = samples - self.mean
-        # Take the inverse of the variance
-        tmp = cf.Inv(self.variance)
-        iv = cf.Ax(tmp, xMu)
-        exp = np.exp(-0.5 * np.dot(xMu, iv))
-        # Probability Density Function
-        prob = (1.0 / np.sqrt(((2.0 * np.pi)**N) * dv)) * exp
-        return prob
+        return np.exp(self.logpdf(samples))
+
+
+    def logpdf(self, x):
+        """Evaluate the natural log of the probability density function
+
+        The density is evaluated in log space using the cached log determinant and either the reciprocal of a scalar
+        or diagonal variance, or the Cholesky factor of a full covariance or precision matrix.  Neither the
+        determinant nor the inverse of a full covariance is formed, so the result does not overflow or underflow.
+
+        Parameters
+        ----------
+        x : array_like
+            A sample with one entry per dimension, or a 2D array with one sample per row.
+
+        Returns
+        -------
+        out : np.float64 or numpy.ndarray
+            The log density of each sample.
+
+        """
+        xMu = np.atleast_1d(np.asarray(x, dtype=np.float64) - self.mean)
+        nD = xMu.shape[-1]
+
+        self._normalise()
+
+        if (not self.precision is None):
+            # Quadratic form with the precision is |L'(x - mu)|^2
+            quadratic = np.sum(np.dot(xMu, self.precision.L)**2.0, axis=-1)
+            logDet = self._logDet
+        elif (np.ndim(self.variance) == 2):
+            # Quadratic form with the covariance is |inv(L)(x - mu)|^2
+            quadratic = np.sum(solve_triangular(self._factor.L, xMu.T, lower=True)**2.0, axis=0)
+            logDet = self._logDet
+        else:
+            # A scalar or diagonal variance, a scalar is repeated along the diagonal
+            quadratic = np.sum(xMu**2.0 * self._inverse, axis=-1)
+            logDet = self._logDet * (nD / np.size(self.variance))
+
+        return -0.5 * (nD * np.log(2.0 * np.pi) + logDet + quadratic)
+
+
+    def _normalise(self):
+        """ Compute the log determinant of the covariance and the operator to whiten samples, unless they are cached """
+        if (not self._logDet is None):
+            return
+
+        if (not self.precision is None):
+            self._logDet = -self.precision.logDet()
+            return
+
+        variance = np.asarray(self.variance, dtype=np.float64)
+        if (variance.ndim == 2):
+            self._factor = CholeskyFactor(variance)
+            self._logDet = self._factor.logDet()
+        else:
+            self._inverse = 1.0 / variance
+            self._logDet = np.sum(np.log(variance))
 
     def summary(self, out=False):
         msg = 'MV Normal Distribution: \n'
         msg += '    Mean: :' + str(self.mean) + '\n'
-        msg += 'Variance: :' + str(self.variance) + '\n'
+        if (self.precision is None):
+            msg += 'Variance: :' + str(self.variance) + '\n'
+        else:
+            msg += 'Precision: :' + str(self.precision.toarray()) + '\n'
         
         return msg if out else print(msg)
     
@@ -101,8 +181,8 @@ class MvNormal(baseDistribution):
         """ Pads the mean and variance to the given size
         N: Padded size
         """
-        if (self.variance.ndim == 1):
-            return MvNormal(np.zeros(N,dtype=self.mean.dtype),np.zeros(N, dtype=self.variance.dtype), self.prng)
+        if (self.variance is None or self.variance.ndim == 1):
+            return MvNormal(np.zeros(N,dtype=self.mean.dtype),np.zeros(N, dtype=self.mean.dtype), self.prng)
         if (self.variance.ndim == 2):
             return MvNormal(np.zeros(N,dtype=self.mean.dtype),np.zeros([N,N], dtype=self.variance.dtype), self.prng)
 
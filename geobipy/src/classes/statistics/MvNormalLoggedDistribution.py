@@ -5,16 +5,18 @@ from copy import deepcopy
 from ...base.logging import myLogger
 import numpy as np
 from .baseDistribution import baseDistribution
+from .MvNormalDistribution import MvNormal
 from ...base import customFunctions as cf
 from ...base.HDF.hdfWrite import writeNumpy
 
-class MvNormalLog(baseDistribution):
+class MvNormalLog(MvNormal):
     """ Class defining a normal distribution """
 
-    def __init__(self, mean, variance, prng=None):
+    def __init__(self, mean, variance, prng=None, precision=None):
         """ Initialize a normal distribution
         mu:     :Mean of the distribution
         sigma:  :Standard deviation of the distribution
+        precision: :CholeskyFactor of the inverse of the covariance, used instead of sigma if given
         """
         if (type(mean) is float): mean=np.float64(mean)
         if (type(variance) is float): variance=np.float64(variance)
@@ -23,13 +25,15 @@ class MvNormalLog(baseDistribution):
         self.mean = deepcopy(mean)
         # Variance
         self.variance = deepcopy(variance)
+        # Factored inverse of the variance
+        self.precision = precision
 
         self.multivariate = True
 
 
     def deepcopy(self):
         """ Define a deepcopy routine """
-        return MvNormalLog(self.mean, self.variance, self.prng)
+        return MvNormalLog(self.mean, self.variance, self.prng, self.precision)
 
 #    def getPdf(self, x):
 #        """ get the PDF, for a normal logged distribution
@@ -39,39 +43,30 @@ class MvNormalLog(baseDistribution):
 
 
     def probability(self, samples):
-        """  """
+        """Evaluate the natural log of the probability density of the samples
+
+        If the distribution has a single dimension, its mean and variance are repeated for every entry in samples.
+
+        See Also
+        --------
+        geobipy.src.classes.statistics.MvNormalDistribution.MvNormal.logpdf : Log density with cached normalising constants
+
+        """
         N = np.size(samples)
-        nD = self.mean.size
+        nD = np.size(self.mean)
 
-        mean = self.mean
-        if (nD == 1):
-            mean = np.repeat(self.mean, N)
-        else:
+        if (nD > 1):
             assert (N == nD), TypeError('size of samples {} must equal number of distribution dimensions {} for a multivariate distribution'.format(N, nD))
-        
-        # For a diagonal matrix, the log determinant is the cumulative sum of
-        # the log of the diagonal entries
-
-        tmp = cf.LogDet(self.variance, N)
-        dv = 0.5 * tmp
-        # subtract the mean from the samples
-        xMu = samples - mean
-        # Start computing the exponent term
-        # e^(-0.5*(x-mu)'*inv(cov)*(x-mu))                        (1)
-        # Take the inverse of the variance
-        tmp = cf.Inv(self.variance)
-        # Compute the multiplication on the right of equation 1
-        iv = cf.Ax(tmp, xMu)
-        tmp = 0.5 * np.dot(xMu, iv)
-        # Probability Density Function
-        prob = -(0.5 * N) * np.log(2.0 * np.pi) - dv - tmp
-        tmp = np.float64(prob)
-        return tmp
+
+        return np.float64(self.logpdf(samples))
 
     def summary(self, out=False):
         msg = 'MV Normal Logged Distribution: \n'
         msg += '  Mean:      :' + str(self.mean) + '\n'
-        msg += '  Variance:  :' + str(self.variance) + '\n'
+        if (self.precision is None):
+            msg += '  Variance:  :' + str(self.variance) + '\n'
+        else:
+            msg += '  Precision: :' + str(self.precision.toarray()) + '\n'
         if (out):
             return msg
         print(msg)
@@ -80,8 +75,8 @@ class MvNormalLog(baseDistribution):
         """ Pads the mean and variance to the given size
         N: Padded size
         """
-        if (self.variance.ndim == 1):
-            return MvNormalLog(np.zeros(N,dtype=self.mean.dtype),np.zeros(N, dtype=self.variance.dtype), self.prng)
+        if (self.variance is None or self.variance.ndim == 1):
+            return MvNormalLog(np.zeros(N,dtype=self.mean.dtype),np.zeros(N, dtype=self.mean.dtype), self.prng)
         if (self.variance.ndim == 2):
             return MvNormalLog(np.zeros(N,dtype=self.mean.dtype),np.zeros([N,N], dtype=self.variance.dtype), self.prng)
 
@@ -39,36 +39,42 @@ class NormalLog(baseDistribution):
         tmp = 4.0 * np.sqrt(self.variance)
         return np.linspace(self.mean - tmp, self.mean + tmp, size)
 
-    def probability(self, x):
-        # ####lg.myLogger("Global");####lg.indent()
-        ####lg.info('Getting PDF for Normal Log distribution')
-#        N = np.size(x)
-        ####lg.debug('Variance: '+str(self.variance))
-        # For a diagonal matrix, the log determinant is the cumulative sum of
-        # the log of the diagonal entries
-        tmp = self.variance #cf.LogDet(self.variance, N)
-        ####lg.info('LogDeterminant: '+str(tmp))
-        dv = 0.5 * tmp
-        # subtract the mean from the samples
-        ####lg.debug('mean: '+str(self.mean))
-        ####lg.debug('   x: '+str(x))
+    @property
+    def variance(self):
+        """The variance of the distribution.
+
+        Assigning a new variance clears the cached log of the variance.
+
+        """
+        return self._variance
+
+    @variance.setter
+    def variance(self, value):
+        self._variance = value
+        self._logVariance = None
+
+    def logpdf(self, x):
+        """Evaluate the natural log of the probability density function
+
+        Parameters
+        ----------
+        x : float or array_like
+            Values at which to evaluate the log density.
+
+        Returns
+        -------
+        out : np.float64 or numpy.ndarray
+            The log density of each value.
+
+        """
+        if (self._logVariance is None):
+            self._logVariance = np.log(self.variance)
         xMu = x - self.mean
-#   ####lg.info('xMu: '+str(xMu))
-        # Start computing the exponent term
-        # e^(-0.5*(x-mu)'*inv(cov)*(x-mu))                        (1)
-        # Take the inverse of the variance
-        tmp = 1.0/self.variance #cf.Inv(self.variance)
-#   ####lg.info('tmp:'+str(tmp))
-        # Compute the multiplication on the right of equation 1
-#        iv = cf.Ax(tmp, xMu)
-#   ####lg.info('iv: '+str(iv))
-        tmp = 0.5 * xMu * tmp * xMu #np.dot(xMu, iv)
-#   ####lg.info('tmp: '+str(tmp))
-        # Probability Density Function
-        prob = -(0.5) * np.log(2.0 * np.pi) - dv - tmp
-#   ####lg.info('pdf: '+str(self.pdf))
-        # ####lg.dedent()
-        return np.float64(prob)
+        return -0.5 * (np.log(2.0 * np.pi) + self._logVariance + xMu**2.0 / self.variance)
+
+    def probability(self, x):
+        """Evaluate the natural log of the probability density, see NormalLog.logpdf """
+        return np.float64(self.logpdf(x))
 
     def summary(self, out=False):
         msg = 'Normal Logged Distribution: \n'
@@ -1,7 +1,7 @@
 from copy import deepcopy
 import numpy as np
 from ...base import MPI as myMPI
-from ...base.HDF.hdfWrite import writeNumpy
+from ...base.HDF.hdfWrite import writeNumpy, createRepeated
 from .EmLoop import EmLoop
 
 class CircularLoop(EmLoop):
@@ -90,10 +90,10 @@ class CircularLoop(EmLoop):
         grp.attrs["repr"] = self.hdfName()
 
         if (not nRepeats is None):
-            grp.create_dataset('orientation', [nRepeats],    dtype="S1")
-            grp.create_dataset('moment',      [nRepeats],    dtype=np.int32,   fillvalue=fillvalue)
-            grp.create_dataset('data',        [nRepeats, 6], dtype=np.float64, fillvalue=fillvalue)
-            grp.create_dataset('radius',      [nRepeats],    dtype=np.float64, fillvalue=fillvalue)
+            createRepeated(grp, 'orientation', [nRepeats],    dtype="S1")
+            createRepeated(grp, 'moment',      [nRepeats],    dtype=np.int32,   fillvalue=fillvalue)
+            createRepeated(grp, 'data',        [nRepeats, 6], dtype=np.float64, fillvalue=fillvalue)
+            createRepeated(grp, 'radius',      [nRepeats],    dtype=np.float64, fillvalue=fillvalue)
         else:
             grp.create_dataset('orientation', [1], dtype="S1")
             grp.create_dataset('moment',      [1], dtype=np.int32,   fillvalue=fillvalue)
@@ -31,6 +31,7 @@ class FdemSystem(myObject):
         for i in range(self.nFreq):
             self.T[i] = CircularLoop()
             self.R[i] = CircularLoop()
+        self._setGeometry()
 
         if (not system is None):
             assert (isinstance(system, str)), TypeError("system must a file to read the Fdem system information from")
@@ -48,6 +49,7 @@ class FdemSystem(myObject):
         for i in range(self.nFreq):
             tmp.T[i] = self.T[i].deepcopy()
             tmp.R[i] = self.R[i].deepcopy()
+        tmp._setGeometry()
         return tmp
 
 
@@ -92,6 +94,29 @@ class FdemSystem(myObject):
                 # except Exception:
                 #     raise SystemExit(
                 #         "Could not read from system file:" + fname + " Line:" + str(j + 2))
+        self._setGeometry()
+
+
+    def _setGeometry(self):
+        """Cache contiguous arrays of the loop geometry used by the forward modeller
+
+        The loops of the system do not change during an inversion, so the tensor IDs, moments, offsets and scale
+        are gathered from the CircularLoops once rather than on every call to the forward modeller.
+        This must be called again if the transmitter or reciever loops are modified.
+
+        """
+        # Coil orientation pair of each frequency
+        self.tensorID = self.getTensorID()
+        # Moments of the transmitter and reciever loops
+        self.tMoment = np.asarray([T.moment for T in self.T], dtype=np.float64)
+        self.rMoment = np.asarray([R.moment for R in self.R], dtype=np.float64)
+        # Vertical offsets of the loops from the observation location
+        self.tz = np.asarray([T.z for T in self.T], dtype=np.float64)
+        self.rz = np.asarray([R.z for R in self.R], dtype=np.float64)
+        # Horizontal offset of the reciever loops
+        self.rx = np.asarray([R.x for R in self.R], dtype=np.float64)
+        # Scaling of the predicted data
+        self.scale = self.tMoment * self.rMoment
 
 
     def fileInformation(self):
@@ -197,6 +222,7 @@ class FdemSystem(myObject):
             tmp.T[i] = eval(safeEval(item.attrs.get('repr')))
             item = grp.get('R/R' + str(i))
             tmp.R[i] = eval(safeEval(item.attrs.get('repr')))
+        tmp._setGeometry()
         return tmp
 
     def Bcast(self, world, root=0):
@@ -213,4 +239,5 @@ class FdemSystem(myObject):
             #        print("i: ",i)
             this.T[i] = self.T[i].Bcast(world, root=root)
             this.R[i] = self.R[i].Bcast(world, root=root)
+        this._setGeometry()
         return this
@@ -0,0 +1,176 @@
+""" @Convergence_Class
+Module describing diagnostics of whether a Markov chain has converged
+"""
+import numpy as np
+from ..classes.core.myObject import myObject
+
+
+class Convergence(myObject):
+    """Diagnostics of whether a Markov chain has converged, so that it can be stopped early
+
+    Convergence(nSamples, rHat, ess, tolerance, minimum)
+
+    The data misfit and the number of layers of every sample after burn in are recorded.  The chain has converged once,
+    for both traces, the split potential scale reduction factor R-hat of Gelman et al. (2013) is below rHat and the
+    effective sample size is at least ess, and the mean model of the hitmap has changed by less than tolerance since the
+    previous check.
+
+    Parameters
+    ----------
+    nSamples : int
+        Largest number of samples that will be recorded, e.g. the number of Markov chain iterations.
+    rHat : float, optional
+        Largest split R-hat of a converged chain.
+    ess : float, optional
+        Smallest effective sample size of a converged chain.
+    tolerance : float, optional
+        Largest change in the log of the mean model of the hitmap, at any depth, between two checks of a converged chain.
+    minimum : int, optional
+        Number of samples that must be recorded before the chain can be checked.
+
+    """
+
+    # Codes of why a chain stopped before its last iteration
+    converged = 1
+    stuck = 2
+
+    def __init__(self, nSamples=None, rHat=1.05, ess=400.0, tolerance=0.01, minimum=1000):
+        """ Initialize the diagnostics """
+        if (nSamples is None):
+            return
+        assert rHat > 1.0, ValueError('rHat must be > 1.0')
+        assert ess > 0.0, ValueError('ess must be > 0.0')
+        assert tolerance > 0.0, ValueError('tolerance must be > 0.0')
+
+        self.rHatTarget = np.float64(rHat)
+        self.essTarget = np.float64(ess)
+        self.tolerance = np.float64(tolerance)
+        # At least four samples are needed to split the traces
+        self.minimum = np.int64(max(minimum, 4))
+
+        # Number of samples recorded
+        self.n = np.int64(0)
+        # Traces of the data misfit and number of layers
+        self.PhiDs = np.zeros(nSamples)
+        self.nCells = np.zeros(nSamples)
+        # Diagnostics from the last check
+        self.rHat = np.float64(np.inf)
+        self.ess = np.float64(0.0)
+        # Log of the mean model of the hitmap at the last check
+        self._mean = None
+
+
+    def update(self, PhiD, nCells):
+        """Record a sample
+
+        Parameters
+        ----------
+        PhiD : float
+            Data misfit of the sample.
+        nCells : int
+            Number of layers of the sample.
+
+        """
+        if (self.n == self.PhiDs.size):
+            return
+        self.PhiDs[self.n] = PhiD
+        self.nCells[self.n] = nCells
+        self.n += 1
+
+
+    def check(self, hitmap):
+        """Check whether the chain has converged
+
+        Parameters
+        ----------
+        hitmap : geobipy.Hitmap2D
+            The hitmap of the samples.
+
+        Returns
+        -------
+        out : bool
+            Whether the chain has converged.
+
+        """
+        if (self.n < self.minimum):
+            return False
+
+        traces = [self.PhiDs[:self.n], self.nCells[:self.n]]
+        self.rHat = np.float64(np.max([self.splitRhat(x) for x in traces]))
+        self.ess = np.float64(np.min([self.effectiveSampleSize(x) for x in traces]))
+
+        # Every sample adds a count to each depth of the hitmap, so the mean is defined at every depth
+        mean = np.log(hitmap.getMeanInterval())
+        stable = (not self._mean is None) and (np.max(np.abs(mean - self._mean)) < self.tolerance)
+        self._mean = mean
+
+        return stable and (self.rHat < self.rHatTarget) and (self.ess >= self.essTarget)
+
+
+    @staticmethod
+    def splitRhat(x, nSplit=4):
+        """Get the split potential scale reduction factor of a trace
+
+        The trace is split into nSplit segments that are treated as separate chains, so that a trend within the trace
+        increases R-hat.
+
+        Parameters
+        ----------
+        x : array_like
+            The trace.
+        nSplit : int, optional
+            Number of segments.
+
+        Returns
+        -------
+        out : float
+            R-hat, which tends to 1 as the segments sample the same distribution.
+
+        """
+        x = np.asarray(x, dtype=np.float64)
+        n = x.size // nSplit
+        assert n > 1, ValueError('The trace must have at least {} samples'.format(2 * nSplit))
+        # Drop the oldest samples that do not fill a segment
+        segments = np.reshape(x[x.size - n * nSplit:], [nSplit, n])
+        W = np.mean(np.var(segments, axis=1, ddof=1))
+        B = n * np.var(np.mean(segments, axis=1), ddof=1)
+        if (W == 0.0):
+            # Constant segments have converged only if they are the same constant
+            return 1.0 if B == 0.0 else np.inf
+        return np.sqrt(((n - 1.0) / n * W + B / n) / W)
+
+
+    @staticmethod
+    def effectiveSampleSize(x):
+        """Get the effective sample size of a trace
+
+        Uses the initial positive sequence estimator of Geyer (1992), which sums the autocorrelations in pairs of lags
+        until the sum of a pair is no longer positive.  The autocorrelations are computed with a Fourier transform.
+
+        Parameters
+        ----------
+        x : array_like
+            The trace.
+
+        Returns
+        -------
+        out : float
+            The number of independent samples with the same variance of the mean as the trace.
+
+        """
+        x = np.asarray(x, dtype=np.float64)
+        n = x.size
+        y = x - np.mean(x)
+        f = np.fft.rfft(y, 2 * n)
+        autocovariance = np.fft.irfft(f * np.conj(f))[:n]
+        if (autocovariance[0] == 0.0):
+            return np.float64(n)
+        rho = autocovariance / autocovariance[0]
+
+        nPairs = n // 2
+        pairs = rho[0 : 2 * nPairs : 2] + rho[1 : 2 * nPairs : 2]
+        negative = np.flatnonzero(pairs <= 0.0)
+        k = negative[0] if negative.size > 0 else nPairs
+        tau = -1.0 + 2.0 * np.sum(pairs[:k])
+        # Bound the integrated autocorrelation time of anticorrelated traces
+        return n / max(tau, 1.0 / np.log10(max(n, 10)))
@@ -13,6 +13,7 @@ from ..classes.statistics.Histogram1D import Histogram1D
 from ..classes.pointcloud.PointCloud3D import PointCloud3D
 from ..base import interpolation as interpolation
 from .LineResults import LineResults
+from .SurveyResults import SurveyResults
 #from ..classes.statistics.Distribution import Distribution
 from ..base.HDF import hdfRead
 from ..base import customPlots as cP
@@ -33,25 +34,35 @@ class DataSetResults(myObject):
     def __init__(self, directory, files = None):
         """ Initialize the lineResults
         directory = directory containing folders for each line of data results
+        If the directory contains a survey results file, it is used instead of the line results files.
         """
         self.directory = directory
+        self.survey = None
         self.fileList = None
         self.nPoints = None
         self.cumNpoints = None
         self.nSys = None
         self.nLines = None
         self.bounds = None
-        if (files is None):
+        if (files is None and fileExists(SurveyResults.inDirectory(directory))):
+            # Every attribute of the survey is read from the one file, which the loops below treat as a single line
+            self.survey = SurveyResults(SurveyResults.inDirectory(directory))
+            self.fileList = [self.survey.fName]
+            self.nLines = 1
+        elif (files is None):
             self.getFileList(directory)
         else:
             self.fileList = files
             self.nLines = len(files)
 
-        self.lines=[]
-        for i in range(self.nLines):
-            fName = self.fileList[i]
-            fileExists(fName)
-            self.lines.append(LineResults(fName))
+        if (self.survey is None):
+            self.lines=[]
+            for i in range(self.nLines):
+                fName = self.fileList[i]
+                fileExists(fName)
+                self.lines.append(LineResults(fName))
+        else:
+            self.lines = [self.survey]
 
         self.points = None
         self.elevation= None
@@ -100,6 +111,8 @@ class DataSetResults(myObject):
 
     def getLineNumber(self, i):
         """ Get the line number for the given data point index """
+        if (not self.survey is None):
+            return self.survey.getLineNumber(i)
         return self.lines[self.getLineIndex(i)].line
 
     def getLineIndex(self, i):
@@ -7,39 +7,66 @@ from ..classes.data.dataset.FdemData import FdemData
 from ..classes.data.dataset.TdemData import TdemData
 from ..classes.model.Model1D import Model1D
 from ..classes.core.StatArray import StatArray
+from ..classes.core.CholeskyFactor import CholeskyFactor
 from ..classes.statistics.Distribution import Distribution
 from ..base.customFunctions import expReal as mExp
 from scipy import sparse
 import numpy as np
 from .Results import Results
+from .Convergence import Convergence
 from ..base.MPI import print
+from os import remove, replace
+from os.path import isfile, join
+import pickle
 
-def Inv_MCMC(paras, D, ID, prng, LineResults=None, rank=1):
+# Attributes of the user parameters that are set by Initialize and carried by a chain snapshot
+_checkpointParas = ['Err', 'priMu', 'priStd', 'pLimits', 'unscaledVariance']
+
+def Inv_MCMC(paras, D, ID, prng, LineResults=None, rank=1, comm=None):
     """ Markov Chain Monte Carlo approach for inversion of geophysical data
     paras: User input parameters object
     D: Datapoint to invert
     ID: Datapoint label for saving results
     pHDFfile: Optional HDF5 file opened using h5py.File('name.h5','w',driver='mpio', comm=world) before calling Inv_MCMC
+    comm: Optional MPI communicator whose ranks share the replicas of a tempered chain, see Inv_MCMC_Tempered
     """
     #%%
     # Check the user input parameters against the datapoint
     paras.check(D)
 
-    # Initialize the MCMC parameters and perform the initial iteration
-    [paras, Mod, D, prior, posterior, PhiD] = Initialize(paras, D, prng=prng)
-
-    Res = Results(paras.save, paras.plot, paras.savePNG, paras, D, Mod, ID=ID, verbose=paras.verbose)
+    # Run a replica of the chain at each temperature if a ladder of temperatures is given
+    if (not paras.temperatures is None):
+        from .Inv_MCMC_Tempered import Inv_MCMC_Tempered
+        return Inv_MCMC_Tempered(paras, D, ID, prng, LineResults=LineResults, rank=rank, comm=comm)
+    assert comm is None or comm.size == 1, ValueError('Only a tempered chain can be shared by several ranks, set paras.temperatures')
 
-    # Set the saved best models and data
-    bestModel = Mod  # .deepcopy()
-    bestData = D  # .deepcopy()
-    bestPosterior = posterior  # .copy()
+    # The chain is snapshotted every paras.checkpointInterval iterations if requested
+    checkpoint = None if paras.checkpointInterval is None else join(paras.checkpointDir, '{}.chk'.format(ID))
+    callerPrng = prng
 
     # Initialize the Chain
     iBurn = 0
-    i = 1
-    iBest = 1
-    multiplier = 1.0
+
+    if (not checkpoint is None and isfile(checkpoint)):
+        # Resume the chain from its last snapshot
+        [i, iBest, multiplier, Mod, D, prior, posterior, PhiD, bestModel, bestData, bestPosterior, Res, prng] = _loadCheckpoint(checkpoint, paras)
+        if (rank == 1):
+            print('Resuming data point {} from iteration {}\n'.format(ID, i))
+    else:
+        # Initialize the MCMC parameters and perform the initial iteration
+        [paras, Mod, D, prior, posterior, PhiD] = Initialize(paras, D, prng=prng)
+
+        Res = Results(paras.save, paras.plot, paras.savePNG, paras, D, Mod, ID=ID, verbose=paras.verbose)
+
+        # Set the saved best models and data
+        # The current model and data are modified in place if paras.inPlace, so the best are copied.
+        bestModel = Mod.deepcopy() if paras.inPlace else Mod
+        bestData = D.deepcopy() if paras.inPlace else D
+        bestPosterior = posterior  # .copy()
+
+        i = 1
+        iBest = 1
+        multiplier = 1.0
 
     Res.clk.start()
 
@@ -58,8 +85,8 @@ def Inv_MCMC(paras, D, ID, prng, LineResults=None, rank=1):
         # Update the best best model and data if the posterior is larger
         if (posterior > bestPosterior):
             iBest = np.int64(i)
-            bestModel = Mod  # .deepcopy()
-            bestData = D  # .deepcopy()
+            bestModel = Mod.deepcopy() if paras.inPlace else Mod
+            bestData = D.deepcopy() if paras.inPlace else D
             bestPosterior = posterior  # .copy()
 
         Res.iBestV[i] = iBest
@@ -79,6 +106,19 @@ def Inv_MCMC(paras, D, ID, prng, LineResults=None, rank=1):
         
         Go = i <= paras.nMC + iBurn -1
 
+        # Stop the chain once it has converged, or cut it short if it is stuck
+        if (Go and _stopEarly(paras, Res, i)):
+            Go = False
+            if (rank == 1):
+                print('Data point {} {} after {} iterations\n'.format(ID, 'converged' if Res.stopped == Convergence.converged else 'is stuck', i - 1))
+
+        if (Go and not checkpoint is None and np.mod(i, paras.checkpointInterval) == 0):
+            _saveCheckpoint(checkpoint, paras, [i, iBest, multiplier, Mod, D, prior, posterior, PhiD, bestModel, bestData, bestPosterior, Res, prng])
+
+    # A resumed chain draws from the generator of its snapshot, so hand its state back to the caller
+    if (not prng is callerPrng):
+        callerPrng.set_state(prng.get_state())
+
     Res.clk.stop()
     Res.invTime = np.float64(Res.clk.timeinSeconds())
     # Does the user want to save the HDF5 results?
@@ -96,9 +136,51 @@ def Inv_MCMC(paras, D, ID, prng, LineResults=None, rank=1):
         # To save any thing the Results must be plot
         Res.plot(forcePlot=True)
         Res.toPNG('.',ID)
+
+    # The results are saved, so the chain does not need to be resumed
+    if (not checkpoint is None and isfile(checkpoint)):
+        remove(checkpoint)
     #%%
 
 
+def _stopEarly(paras, Res, i):
+    """ Check, every paras.convergenceInterval iterations, whether a chain should stop before iteration i
+
+    A chain is stopped if its acceptance rate has been too low for paras.maxZeroCount thousand iterations, or if it
+    has converged, see Convergence.  Why it stopped is recorded in Res.stopped.
+
+    """
+    if (np.mod(i - 1, paras.convergenceInterval) != 0):
+        return False
+    if (not paras.maxZeroCount is None and Res.zeroCount >= paras.maxZeroCount):
+        Res.stopped = np.int32(Convergence.stuck)
+    elif (Res.burnedIn and not Res.convergence is None and Res.convergence.check(Res.Hitmap)):
+        Res.stopped = np.int32(Convergence.converged)
+    return Res.stopped != 0
+
+
+def _saveCheckpoint(fName, paras, state):
+    """ Snapshot the state of a chain to file
+
+    The state is pickled together so that objects shared between the model, data, results and generator stay shared.
+    The snapshot is written to a temporary file first so that an interrupted write never replaces a good snapshot.
+
+    """
+    tmp = fName + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump([state, {key: getattr(paras, key) for key in _checkpointParas}], f, protocol=pickle.HIGHEST_PROTOCOL)
+    replace(tmp, fName)
+
+
+def _loadCheckpoint(fName, paras):
+    """ Load the state of a chain, and the user parameters set by Initialize, from a snapshot """
+    with open(fName, 'rb') as f:
+        state, values = pickle.load(f)
+    for key in values:
+        setattr(paras, key, values[key])
+    return state
+
+
 #%%
 def Initialize(paras, D, prng):
     np.set_printoptions(threshold=np.inf)
@@ -176,22 +258,21 @@ def Initialize(paras, D, prng):
         paras.pLimits = [(np.exp(paras.priMu - 3.0 * paras.priStd)),
                          (np.exp(paras.priMu + 3.0 * paras.priStd))]
 
-    # Compute the predicted data
-    D.forward(Mod)
-    # Compute the sensitivity wrt parameter
-    D.J = D.sensitivity(Mod)
+    # Compute the predicted data and the sensitivity wrt parameter
+    D.J = D.forwardSensitivity(Mod)
 
     if (paras.stochasticNewton):
         # Scale the sensitivity matrix by the data errors.
         J = D.scaleJ(D.J)
-        # Compute a quasi-Newton based variance update
-        paras.unscaledVariance = np.linalg.inv(np.dot(J.T, J) + np.eye(Mod.nCells[0]) * paras.priStd**-1.0)
+        # Compute a quasi-Newton based variance update.  The inverse variance is kept as its Cholesky factor
+        paras.unscaledVariance = CholeskyFactor.gram(J, paras.priStd**-1.0)
+        # Instantiate the proposal for the parameters.
+        Mod.par.setProposal('MvNormal', np.log(Mod.par), None, prng=prng, precision=paras.unscaledVariance)
     else:
         # Compute a steepest descent based variance update
         paras.unscaledVariance = (np.ones(Mod.nCells[0]) * (paras.priStd))**2.0
-
-    # Instantiate the proposal for the parameters.
-    Mod.par.setProposal('MvNormal', np.log(Mod.par), paras.unscaledVariance, prng=prng)
+        # Instantiate the proposal for the parameters.
+        Mod.par.setProposal('MvNormal', np.log(Mod.par), paras.unscaledVariance, prng=prng)
 
     # Assign a prior to the derivative of the model
     Mod.dpar.setPrior('MvNormalLog', 0.0, paras.GradientStd**2.0, prng=prng)
@@ -214,19 +295,123 @@ def Initialize(paras, D, prng):
     return (paras, Mod, D, prior, posterior, PhiD)
 
 
-def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng):# ,oF, oD, oRel, oAdd, oP, oA ,curIter):
-    """ Propose a new random model and accept or reject it """
+def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng, beta=1.0):# ,oF, oD, oRel, oAdd, oP, oA ,curIter):
+    """ Propose a new random model and accept or reject it
+
+    If beta is not 1, the likelihood is raised to the power beta, i.e. the chain is at a temperature of 1/beta.
+    The prior, and the posteriors that are returned, are not tempered.
+
+    """
     clk = Stopwatch()
     clk.start()
 
+    [Mod1, D1, prior1, posterior1, PhiD1, posteriorComponents, logRatio, unscaledVariance] = Propose(paras, Mod, D, posterior, Res)
+
+    if (beta != 1.0):
+        # Temper the difference in the log likelihoods of the candidate and current models
+        logRatio += (beta - 1.0) * ((posterior1 - prior1) - (posterior - prior))
+
+    likeRatio = mExp(np.float128(logRatio))
+
+    if (np.isnan(likeRatio)):
+        likeRatio = 0.0
+
+    cut = np.minimum(1.0, likeRatio)
+
+    # If we accept the model
+    r = prng.uniform()
+
+    if (cut > r):
+#        accepted=True
+        # Make the Current model the Candidate model
+        Mod0 = Mod1  # .deepcopy()
+        # Make the Current data the Candidate data
+        D0 = D1  # .deepcopy()
+        # Transfer over the posteriors and priors
+        prior0 = prior1  # .copy()
+        posterior0 = posterior1  # .copy()
+        PhiD0 = PhiD1  # .copy()
+        paras.unscaledVariance = unscaledVariance
+        if (Res.saveMe or Res.plotMe):
+            Res.acceptance += 1
+
+    else:
+#        accepted=False
+        # Undo any in-place changes to the model and data
+        if (paras.inPlace):
+            Mod.restoreState()
+            D.restoreState()
+        # Keep the unperturbed mdel
+        Mod0 = Mod  # .deepcopy()
+        D0 = D  # .deepcopy()
+        prior0 = prior  # .copy()
+        posterior0 = posterior  # .copy()
+        PhiD0 = PhiD  # .copy()
+
+    clk.stop()
+
+    return(Mod0, D0, prior0, posterior0, PhiD0, posteriorComponents, clk.timeinSeconds())
+    #%%
+
+
+def Propose(paras, Mod, D, posterior, Res):
+    """ Propose a new random model and data point, and evaluate the log of the acceptance ratio.
+
+    The random draw that accepts or rejects the candidate is left to the caller so that
+    many chains can be tested at once.
+
+    If paras.inPlace is True, the model and data point are modified in place rather than copied and
+    Mod1 and D1 are the same objects as Mod and D.  Their states are recorded beforehand so that a rejected
+    candidate can be undone with Mod.restoreState() and D.restoreState().
+
+    Returns
+    -------
+    out : list
+        [Mod1, D1, prior1, posterior1, PhiD1, posteriorComponents, logRatio, unscaledVariance]
+        If paras.stochasticNewton is True, unscaledVariance is the CholeskyFactor of the inverse of the unscaled
+        variance, which is updated for the columns of the sensitivity matrix that changed rather than inverted.
+
+    """
+    proposal = _proposeModel(paras, Mod, D, Res)
+
+    # Forward model the data from the candidate model
+    proposal[0].forward(proposal[1])
+
+    return _evaluateProposal(paras, D, posterior, Res, proposal)
+
+
+def _proposeModel(paras, Mod, D, Res):
+    """ Perturb the model and data point, and draw the candidate conductivities, see Propose
+
+    The candidate is not forward modelled, so that the caller can forward model many candidates at once before
+    evaluating each of them with _evaluateProposal.
+
+    Returns
+    -------
+    out : list
+        The candidate data point and model, followed by what _evaluateProposal needs of the current model and of the proposal.
+
+    """
+    # Keep what is needed of the current model for the reverse proposal
+    nCells = Mod.nCells[0]
+    logPar = np.log(Mod.par)
+    P_depth  = np.log(Mod.depth.probability(nCells))
+
+    if (paras.inPlace):
+        Mod.saveState()
+        D.saveState()
+
     # Perturb the current model to produce an initial candidate model
-    Mod1, option, value = Mod.perturb()
+    Mod1, option, value = Mod.perturb(inPlace=paras.inPlace)
 
-    parSaved = Mod1.par.deepcopy()
+    logParSaved = np.log(Mod1.par)
 
     # Propose a new data point, using assigned proposal distributions
-    D1 = D.propose(paras.solveElevation,paras.solveRelativeError,paras.solveAdditiveError,paras.solveCalibration)
+    D1 = D.propose(paras.solveElevation,paras.solveRelativeError,paras.solveAdditiveError,paras.solveCalibration, inPlace=paras.inPlace)
 
+    dm = None
+    scaling = None
+    precision = None
     if (option < 2):
         # Compute the sensitivity of the data to the perturbed model
         D1.J = D1.updateSensitivity(D1.J, Mod1, option, scale=False)
@@ -234,7 +419,8 @@ def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng):# ,oF, oD, oRel, oA
 
         # Propose new layer conductivities
         if paras.stochasticNewton:
-            unscaledVariance = np.linalg.inv(np.dot(J.T,J) + np.eye(Mod1.nCells[0]) * paras.priStd**-1.0)
+            unscaledVariance = paras.unscaledVariance.deepcopy()
+            unscaledVariance.updateGram(J, option, Mod1.iLayer)
             J = D.scaleJ(D1.J, 2.0)
         else:
             unscaledVariance = np.diag((paras.covScaling / np.sqrt(Mod1.nCells)) / (
@@ -256,20 +442,26 @@ def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng):# ,oF, oD, oRel, oA
         scaling = paras.covScaling * \
             ((2.0 * np.float64(Mod1.nCells[0])) - 1)**(-1.0 / 3.0)
         # Compute the Model perturbation
-        dm = 0.5 * scaling * np.dot(unscaledVariance, gradient)
+        dm = 0.5 * scaling * unscaledVariance.solve(gradient)
 
         if (not Res.burnedIn):
             dm = 0.0
 
-        Mod1.par.setProposal('MvNormal', np.log(Mod1.par) - dm, scaling * unscaledVariance, prng=Mod1.par.proposal.prng)
+        # The proposal variance is scaling * inv(unscaledVariance)
+        precision = unscaledVariance.scale(1.0 / scaling)
+        Mod1.par.setProposal('MvNormal', np.log(Mod1.par) - dm, None, prng=Mod1.par.proposal.prng, precision=precision)
     else:  # Use the steepest descent method
         Mod1.par.setProposal('MvNormal', np.log(Mod1.par), unscaledVariance, prng=Mod1.par.proposal.prng)
 
     # Generate new conductivities
     Mod1.par[:] = np.exp(Mod1.par.proposal.rng(1))
 
-    # Forward model the data from the candidate model
-    D1.forward(Mod1)
+    return [D1, Mod1, nCells, logPar, P_depth, logParSaved, unscaledVariance, dm, scaling, precision]
+
+
+def _evaluateProposal(paras, D, posterior, Res, proposal):
+    """ Evaluate the posterior and the log of the acceptance ratio of a forward modelled candidate, see Propose """
+    [D1, Mod1, nCells, logPar, P_depth, logParSaved, unscaledVariance, dm, scaling, precision] = proposal
 
     # Update the data errors using the updated relative errors
     D1.updateErrors(D1.relErr, D1.addErr)
@@ -308,9 +500,9 @@ def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng):# ,oF, oD, oRel, oA
     # pre-perturbed values (maintain the diagonal variance)
 
     if (paras.stochasticNewton):
-        Mod1.par.setProposal('MvNormalLog', np.log(parSaved) - dm, Mod1.par.proposal.variance, prng=Mod1.par.proposal.prng)
+        Mod1.par.setProposal('MvNormalLog', logParSaved - dm, None, prng=Mod1.par.proposal.prng, precision=precision)
     else:
-        Mod1.par.setProposal('MvNormalLog', np.log(parSaved), Mod1.par.proposal.variance, prng=Mod1.par.proposal.prng)
+        Mod1.par.setProposal('MvNormalLog', logParSaved, Mod1.par.proposal.variance, prng=Mod1.par.proposal.prng)
 
     if (paras.stochasticNewton):
         # Get the pdf for the perturbed parameters
@@ -322,13 +514,13 @@ def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng):# ,oF, oD, oRel, oA
             paras.priStd**-1.0 * (np.log(Mod1.par) - paras.priMu)
 
         # Compute the Model perturbation
-        dm = 0.5 * scaling * np.dot(unscaledVariance, gradient)
+        dm = 0.5 * scaling * unscaledVariance.solve(gradient)
 
         if (not Res.burnedIn):
             dm = 0.0
-        tmp = Distribution('MvNormalLog', np.log(Mod1.par) - dm, scaling * unscaledVariance, prng=Mod1.par.proposal.prng)
+        tmp = Distribution('MvNormalLog', np.log(Mod1.par) - dm, None, prng=Mod1.par.proposal.prng, precision=precision)
 
-        prop = tmp.probability(np.log(parSaved))  # CUR.prop
+        prop = tmp.probability(logParSaved)  # CUR.prop
     else:
         # Get the pdf for the perturbed parameters
         prop1 = Mod1.par.proposal.getPdf(np.log(Mod1.par))  # CAN.prop
@@ -338,63 +530,24 @@ def AcceptReject(paras,Mod,D,prior,posterior,PhiD,Res, prng):# ,oF, oD, oRel, oA
         cov = StatArray(Mod1.par.size)
         cov[:] = (Mod1.par.proposal.variance)
   
-        if (Mod1.nCells > Mod.nCells):  # Layer was inserted
+        if (Mod1.nCells[0] > nCells):  # Layer was inserted
             tmp = np.mean(par[Mod1.iLayer:Mod1.iLayer + 2])
             par = par.delete(Mod1.iLayer)
             par[Mod1.iLayer] = tmp
             cov = cov.delete(Mod1.iLayer)
 
-        elif (Mod1.nCells < Mod.nCells):  # Layer was deleted
+        elif (Mod1.nCells[0] < nCells):  # Layer was deleted
             tmp = par[Mod1.iLayer]
             par = par.insert(Mod1.iLayer, tmp)
             tmp2 = cov[Mod1.iLayer]
             cov = cov.insert(Mod1.iLayer, tmp2)
 
-        tmp = Mod.deepcopy()
-        tmp.par.setProposal('MvNormalLog', par, cov)
-        prop = tmp.par.proposal.getPdf(np.log(Mod.par))  # CUR.prop
+        tmp = Distribution('MvNormalLog', par, cov)
+        prop = tmp.getPdf(logPar)  # CUR.prop
 
-    P_depth  = np.log(Mod.depth.probability(Mod.nCells[0]))
     P_depth1 = np.log(Mod1.depth.probability(Mod1.nCells[0]))
 
-    tmp = np.float128((posterior1 + prop) -
-                      (posterior + prop1) +
-                      (P_depth - P_depth1))
+    logRatio = (posterior1 + prop) - (posterior + prop1) + (P_depth - P_depth1)
 
-    likeRatio = mExp(tmp)
-
-    if (np.isnan(likeRatio)):
-        likeRatio = 0.0
-
-    cut = np.minimum(1.0, likeRatio)
-
-    # If we accept the model
-    r = prng.uniform()
-
-    if (cut > r):
-#        accepted=True
-        # Make the Current model the Candidate model
-        Mod0 = Mod1  # .deepcopy()
-        # Make the Current data the Candidate data
-        D0 = D1  # .deepcopy()
-        # Transfer over the posteriors and priors
-        prior0 = prior1  # .copy()
-        posterior0 = posterior1  # .copy()
-        PhiD0 = PhiD1  # .copy()
-        paras.unscaledVariance = unscaledVariance
-        if (Res.saveMe or Res.plotMe):
-            Res.acceptance += 1
-
-    else:
-#        accepted=False
-        # Keep the unperturbed mdel
-        Mod0 = Mod  # .deepcopy()
-        D0 = D  # .deepcopy()
-        prior0 = prior  # .copy()
-        posterior0 = posterior  # .copy()
-        PhiD0 = PhiD  # .copy()
-
-    clk.stop()
-
-    return(Mod0, D0, prior0, posterior0, PhiD0, posteriorComponents, clk.timeinSeconds())
+    return(Mod1, D1, prior1, posterior1, PhiD1, posteriorComponents, logRatio, unscaledVariance)
     #%%
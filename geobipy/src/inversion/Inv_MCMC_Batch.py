@@ -0,0 +1,206 @@
+""" @EMinversion1D_MCMC_Batch
+Module defining a batched Markov Chain Monte Carlo approach to 1D EM inversion.
+Many independent chains are advanced in lockstep so that the bookkeeping of every chain
+(acceptance, burn-in, best model tracking, misfit multipliers) is done with vectorized numpy
+rather than with scalar python logic per chain, and the candidates of the frequency domain chains
+are forward modelled with a single call to the batched kernel.
+"""
+#%%
+import numpy as np
+from ..classes.core.Stopwatch import Stopwatch
+from .Results import Results
+from ..classes.data.datapoint.FdemDataPoint import FdemDataPoint
+from .Inv_MCMC import Initialize, _proposeModel, _evaluateProposal, _stopEarly
+from ..base.MPI import print
+
+
+def Inv_MCMC_Batch(paras, D, ID, prng, LineResults=None, rank=1):
+    """ Markov Chain Monte Carlo inversion of many data points advanced in lockstep
+
+    Each chain is an independent inversion of a data point. The scalar state of every chain is kept
+    in arrays of length nChains, and each iteration proposes a candidate for every chain, forward models
+    all of the candidates, see _forwardBatch, and then accepts or rejects all of them at once.  The results of each chain are identical in layout
+    to those produced by Inv_MCMC and are written to the same Results/LineResults HDF structures.
+
+    Parameters
+    ----------
+    paras : list of _userParameters
+        User input parameters for each chain.
+    D : list of EmDataPoint
+        Data points to invert, one per chain.
+    ID : array_like
+        Data point labels used when saving results.
+    prng : numpy.random.RandomState
+        Random number generator.
+    LineResults : list of LineResults, optional
+        The line results file that each chain writes to. If None, each chain is saved to its own file.
+    rank : int, optional
+        Rank of the process, progress is printed only when rank == 1.
+
+    """
+    #%%
+    nChains = len(D)
+    assert len(paras) == nChains, ValueError('paras must have length {}'.format(nChains))
+    assert np.size(ID) == nChains, ValueError('ID must have size {}'.format(nChains))
+    if (not LineResults is None):
+        assert len(LineResults) == nChains, ValueError('LineResults must have length {}'.format(nChains))
+
+    # Per chain objects
+    Mod = [None] * nChains
+    Data = [None] * nChains
+    Res = [None] * nChains
+    bestModel = [None] * nChains
+    bestData = [None] * nChains
+
+    # Struct of arrays for the scalar state of each chain
+    prior = np.zeros(nChains)
+    posterior = np.zeros(nChains)
+    PhiD = np.zeros(nChains)
+    bestPosterior = np.zeros(nChains)
+    iBest = np.ones(nChains, dtype=np.int64)
+    multiplier = np.ones(nChains)
+    burnedIn = np.zeros(nChains, dtype=np.bool_)
+    nData = np.zeros(nChains)
+    nMC = np.zeros(nChains, dtype=np.int64)
+    iPlot = np.zeros(nChains, dtype=np.int64)
+    increase = np.zeros(nChains)
+    canIncrease = np.zeros(nChains, dtype=np.bool_)
+    stopped = np.zeros(nChains, dtype=np.bool_)
+
+    for k in range(nChains):
+        # Check the user input parameters against the datapoint
+        paras[k].check(D[k])
+        assert paras[k].temperatures is None, ValueError('Tempered chains cannot be run in lockstep, use a single chain per core')
+
+        # Initialize the MCMC parameters and perform the initial iteration
+        [paras[k], Mod[k], Data[k], prior[k], posterior[k], PhiD[k]] = Initialize(paras[k], D[k], prng=prng)
+
+        Res[k] = Results(paras[k].save, paras[k].plot and k == 0, paras[k].savePNG, paras[k], Data[k], Mod[k], ID=ID[k], verbose=paras[k].verbose)
+        Res[k].clk.start()
+
+        # The current model and data are modified in place if paras.inPlace, so the best are copied.
+        bestModel[k] = Mod[k].deepcopy() if paras[k].inPlace else Mod[k]
+        bestData[k] = Data[k].deepcopy() if paras[k].inPlace else Data[k]
+        bestPosterior[k] = posterior[k]
+
+        nData[k] = np.size(Data[k].d)
+        nMC[k] = paras[k].nMC
+        iPlot[k] = paras[k].iPlot
+        increase[k] = paras[k].multiplier
+        canIncrease[k] = not paras[k].solveRelativeError
+
+    updateResults = np.asarray([r.saveMe or r.plotMe for r in Res], dtype=np.bool_)
+    logRatio = np.zeros(nChains)
+
+    clk = Stopwatch()
+    clk.start()
+
+    i = 1
+    active = i <= nMC - 1
+    while (np.any(active)):
+
+        iActive = np.where(active)[0]
+
+        # Propose a candidate for every active chain, and forward model them together
+        proposals = [_proposeModel(paras[k], Mod[k], Data[k], Res[k]) for k in iActive]
+        _forwardBatch([x[0] for x in proposals], [x[1] for x in proposals])
+
+        candidates = [None] * nChains
+        for k, proposal in zip(iActive, proposals):
+            candidates[k] = _evaluateProposal(paras[k], Data[k], posterior[k], Res[k], proposal)
+            logRatio[k] = candidates[k][6]
+
+        # Accept or reject all chains at once.  Comparing in log space is equivalent to min(1, exp(logRatio)) > r
+        # and rejects NaN ratios
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accept = np.log(prng.uniform(size=nChains)) < logRatio
+        accept &= active
+
+        for k in np.where(accept)[0]:
+            [Mod[k], Data[k], prior[k], posterior[k], PhiD[k], dum, dum, paras[k].unscaledVariance] = candidates[k]
+
+        for k in np.where(accept & updateResults)[0]:
+            Res[k].acceptance += 1
+
+        # Undo any in-place changes to the rejected chains
+        for k in iActive[~accept[iActive]]:
+            if (paras[k].inPlace):
+                Mod[k].restoreState()
+                Data[k].restoreState()
+
+        # Determine which chains have burned in
+        newlyBurned = active & ~burnedIn & (PhiD <= multiplier * nData)
+        burnedIn |= newlyBurned
+        for k in np.where(newlyBurned)[0]:
+            Res[k].burnedIn = True
+            Res[k].iBurn = i
+
+        # Update the best models and data if the posterior is larger
+        better = active & (posterior > bestPosterior)
+        iBest[better] = i
+        bestPosterior[better] = posterior[better]
+        for k in np.where(better)[0]:
+            bestModel[k] = Mod[k].deepcopy() if paras[k].inPlace else Mod[k]
+            bestData[k] = Data[k].deepcopy() if paras[k].inPlace else Data[k]
+
+        # Increase the misfit multiplier of chains that have not burned in
+        plotNow = active & (np.mod(i, iPlot) == 0)
+        multiplier[plotNow & ~burnedIn & canIncrease] *= increase[plotNow & ~burnedIn & canIncrease]
+
+        if (rank == 1 and np.any(plotNow)):
+            tPerMod = clk.lap() / np.max(iPlot[plotNow])
+            print("i=%i, chains=%i, burned in=%i, %4.3f s/Iteration, %0.3f s Elapsed\n" % (i, iActive.size, np.sum(burnedIn[iActive]), tPerMod, clk.timeinSeconds()))
+
+        for k in iActive:
+            Res[k].iBestV[i] = iBest[k]
+            Res[k].update(i, iBest[k], bestData[k], bestModel[k], Data[k], multiplier[k], PhiD[k], Mod[k], posterior[k], candidates[k][5], paras[k].clipRatio)
+        if (active[0]):
+            Res[0].plot()
+
+        i += 1
+
+        # Stop the chains that have converged, or that are stuck
+        for k in iActive:
+            stopped[k] = i <= nMC[k] - 1 and _stopEarly(paras[k], Res[k], i)
+
+        # Finalize the chains that have finished
+        finished = active & ((i > nMC - 1) | stopped)
+        for k in np.where(finished)[0]:
+            _finalize(paras[k], Res[k], ID[k], None if LineResults is None else LineResults[k])
+
+        active = (i <= nMC - 1) & ~stopped
+    #%%
+
+
+def _forwardBatch(D, Mod):
+    """ Forward model the data points from their models, with one call for the frequency domain data points of each system """
+    systems = {}
+    for d, m in zip(D, Mod):
+        if (isinstance(d, FdemDataPoint)):
+            systems.setdefault(id(d.sys), ([], []))
+            systems[id(d.sys)][0].append(d)
+            systems[id(d.sys)][1].append(m)
+        else:
+            d.forward(m)
+
+    for dataPoints, models in systems.values():
+        FdemDataPoint.forwardBatch(dataPoints, models)
+
+
+def _finalize(paras, Res, ID, LineResults):
+    """ Stop the clock of a chain and save its results """
+    Res.clk.stop()
+    Res.invTime = np.float64(Res.clk.timeinSeconds())
+    # Does the user want to save the HDF5 results?
+    if (paras.save):
+        # No parallel write is being used, so write a single file for the data point
+        if (LineResults is None):
+            Res.save(outdir=paras.dataPointResultsDir, ID=ID)
+        else: # Write the contents to the parallel HDF5 file
+            LineResults.results2Hdf(Res)
+
+    # Does the user want to save the plot as a png?
+    if (Res.savePNG):
+        # To save any thing the Results must be plot
+        Res.plot(forcePlot=True)
+        Res.toPNG('.', ID)
@@ -0,0 +1,259 @@
+""" @EMinversion1D_MCMC_Tempered
+Module defining a parallel tempered Markov Chain Monte Carlo approach to 1D EM inversion.
+Replicas of the chain sample the posterior with the likelihood raised to the power 1/T for a ladder of temperatures T,
+and adjacent replicas swap states so that the hot replicas, which move freely, carry the cold chain between modes.
+"""
+#%%
+import io
+import pickle
+from copy import copy
+import numpy as np
+from .Results import Results
+from .Inv_MCMC import Initialize, AcceptReject, _stopEarly
+from .Inv_MCMC_Batch import _finalize
+from .Convergence import Convergence
+from ..base.MPI import print
+
+
+def Inv_MCMC_Tempered(paras, D, ID, prng, LineResults=None, rank=1, comm=None):
+    """ Parallel tempered Markov Chain Monte Carlo inversion of a data point
+
+    A replica of the chain is run at each temperature of paras.temperatures, whose first temperature is 1.  Each
+    replica is accepted or rejected with its likelihood tempered, see AcceptReject, and every paras.swapInterval
+    iterations adjacent replicas propose to swap their states, alternating between the even and the odd pairs.  Only
+    the replica at a temperature of 1 samples the posterior, so only it updates the Results.
+
+    Parameters
+    ----------
+    paras : _userParameters
+        User input parameters.
+    D : EmDataPoint
+        Data point to invert.
+    ID : number
+        Data point label used when saving results.
+    prng : numpy.random.RandomState
+        Random number generator.
+    LineResults : LineResults, optional
+        The line results file to write to.  If None, the results are saved to their own file.
+    rank : int, optional
+        Rank of the process, progress is printed only when rank == 1.
+    comm : mpi4py.MPI.Comm, optional
+        The ranks of comm share the replicas in contiguous blocks of the ladder, and must all call Inv_MCMC_Tempered
+        with the same data point.  The first rank runs the replica at a temperature of 1 and writes the results.
+        If None, every replica is run by this process.
+
+    """
+    #%%
+    temperatures = np.asarray(paras.temperatures, dtype=np.float64)
+    nT = temperatures.size
+    nRanks = 1 if comm is None else comm.size
+    myRank = 0 if comm is None else comm.rank
+    assert nT >= nRanks, ValueError('Each rank needs a temperature, there are {} temperatures for {} ranks'.format(nT, nRanks))
+
+    # Rank that runs the replica at each temperature
+    owner = np.repeat(np.arange(nRanks), [x.size for x in np.array_split(np.arange(nT), nRanks)])
+    mine = np.where(owner == myRank)[0]
+
+    # Initialize each replica from its own copy of the data point
+    replicas = {}
+    for k in mine:
+        Dk = D if k == 0 else D.deepcopy()
+        p = paras if k == 0 else copy(paras)
+        [p, Mod, Dk, prior, posterior, PhiD] = Initialize(p, Dk, prng=prng)
+        replicas[k] = _Replica(1.0 / temperatures[k], p, Mod, Dk, prior, posterior, PhiD)
+
+    # Attempted and accepted swaps between each replica and the next
+    swaps = np.zeros([nT - 1, 2], dtype=np.int64)
+
+    cold = 0 in replicas
+    if (cold):
+        c = replicas[0]
+        Res = Results(paras.save, paras.plot, paras.savePNG, paras, c.D, c.Mod, ID=ID, verbose=paras.verbose)
+        c.results = Res
+
+        # The current model and data are modified in place if paras.inPlace, so the best are copied.
+        bestModel = c.Mod.deepcopy() if paras.inPlace else c.Mod
+        bestData = c.D.deepcopy() if paras.inPlace else c.D
+        bestPosterior = c.posterior
+        iBest = 1
+        multiplier = 1.0
+
+        Res.clk.start()
+
+    i = 1
+    Go = i <= paras.nMC - 1
+    while (Go):
+
+        # Accept or reject a new model for each replica
+        for k in mine:
+            r = replicas[k]
+            [r.Mod, r.D, r.prior, r.posterior, r.PhiD, posteriorComponents, time] = AcceptReject(r.paras, r.Mod, r.D, r.prior, r.posterior, r.PhiD, r.results, prng, beta=r.beta)
+
+            if (k == 0):
+                # Determine if we are burning in
+                if (not Res.burnedIn):
+                    if (r.PhiD <= multiplier * np.size(r.D.d)):
+                        Res.burnedIn = True  # Let the results know they are burned in
+                        Res.iBurn = i         # Save the burn in iteration to the results
+
+                # Update the best best model and data if the posterior is larger
+                if (r.posterior > bestPosterior):
+                    iBest = np.int64(i)
+                    bestModel = r.Mod.deepcopy() if paras.inPlace else r.Mod
+                    bestData = r.D.deepcopy() if paras.inPlace else r.D
+                    bestPosterior = r.posterior
+
+                Res.iBestV[i] = iBest
+
+                if (np.mod(i, paras.iPlot) == 0):
+                    tPerMod = Res.clk.lap() / paras.iPlot
+                    if (rank == 1):
+                        rate = swaps[:, 1] / np.maximum(swaps[:, 0], 1)
+                        print("i=%i, k=%i, %4.3f s/Model, %0.3f s Elapsed, swap rates %s\n" % (i, np.float(r.Mod.nCells[0]), tPerMod, Res.clk.timeinSeconds(), np.array2string(rate, precision=2)))
+
+                    if (not Res.burnedIn and not paras.solveRelativeError):
+                        multiplier *= paras.multiplier
+
+                Res.update(i, iBest, bestData, bestModel, r.D, multiplier, r.PhiD, r.Mod, r.posterior, posteriorComponents, paras.clipRatio)
+                Res.plot()
+
+        # Swap the states of adjacent replicas
+        if (np.mod(i, paras.swapInterval) == 0):
+            _swapReplicas(replicas, owner, np.int64(i / paras.swapInterval) % 2, comm, prng, swaps)
+
+        i += 1
+
+        Go = i <= paras.nMC - 1
+
+        # Stop every replica once the cold chain has converged, or if it is stuck
+        if (Go and np.mod(i - 1, paras.convergenceInterval) == 0):
+            stop = cold and _stopEarly(paras, Res, i)
+            if (not comm is None):
+                stop = comm.bcast(stop, root=0)
+            Go = not stop
+            if (stop and cold and rank == 1):
+                print('Data point {} {} after {} iterations\n'.format(ID, 'converged' if Res.stopped == Convergence.converged else 'is stuck', i - 1))
+
+    if (cold):
+        _finalize(paras, Res, ID, LineResults)
+    #%%
+
+
+def _swapReplicas(replicas, owner, parity, comm, prng, swaps):
+    """ Propose to swap the states of replicas k and k + 1 for every k of the given parity
+
+    The replica at the lower temperature decides whether to swap.  Replicas on different ranks send their sampled
+    states to each other, see _Replica.getSampledState, and a rank that is in two such pairs handles the lower pair
+    first, so the pairs are resolved in order from the first rank.
+
+    """
+    myRank = 0 if comm is None else comm.rank
+    for k in range(parity, owner.size - 1, 2):
+        a = owner[k]
+        b = owner[k + 1]
+        if (a == myRank and b == myRank):
+            lo = replicas[k]
+            hi = replicas[k + 1]
+            accept = _acceptSwap(lo, hi.beta, hi.logLikelihood, prng)
+            if (accept):
+                state = lo.getState()
+                lo.setState(hi.getState())
+                hi.setState(state)
+        elif (a == myRank):
+            lo = replicas[k]
+            beta, logLikelihood = comm.recv(source=b, tag=k)
+            accept = _acceptSwap(lo, beta, logLikelihood, prng)
+            comm.send(accept, dest=b, tag=k)
+            if (accept):
+                lo.setSampledState(_loads(comm.sendrecv(_dumps(lo.getSampledState()), dest=b, sendtag=k, source=b, recvtag=k), prng))
+        elif (b == myRank):
+            hi = replicas[k + 1]
+            comm.send((hi.beta, hi.logLikelihood), dest=a, tag=k)
+            if (comm.recv(source=a, tag=k)):
+                hi.setSampledState(_loads(comm.sendrecv(_dumps(hi.getSampledState()), dest=a, sendtag=k, source=a, recvtag=k), prng))
+            continue
+        else:
+            continue
+
+        swaps[k, 0] += 1
+        swaps[k, 1] += accept
+
+
+def _acceptSwap(lo, beta, logLikelihood, prng):
+    """ Accept or reject the swap of the state of replica lo with the state of a replica at the next temperature """
+    logRatio = (lo.beta - beta) * (logLikelihood - lo.logLikelihood)
+    return bool(np.log(prng.uniform()) < logRatio)
+
+
+def _dumps(state):
+    """ Pickle the state of a replica, leaving out the random number generators """
+    f = io.BytesIO()
+    pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = lambda obj: 'prng' if isinstance(obj, np.random.RandomState) else None
+    pickler.dump(state)
+    return f.getvalue()
+
+
+def _loads(data, prng):
+    """ Unpickle the state of a replica, which draws from the random number generator of this rank """
+    unpickler = pickle.Unpickler(io.BytesIO(data))
+    unpickler.persistent_load = lambda pid: prng
+    return unpickler.load()
+
+
+class _Replica(object):
+    """ State of the replica of a chain at one temperature """
+
+    def __init__(self, beta, paras, Mod, D, prior, posterior, PhiD):
+        # Power of the likelihood, the reciprocal of the temperature
+        self.beta = np.float64(beta)
+        # Parameters of the replica, which carry the variance of its parameter proposal
+        self.paras = paras
+        self.Mod = Mod
+        self.D = D
+        self.prior = prior
+        self.posterior = posterior
+        self.PhiD = PhiD
+        # Only the replica at a temperature of 1 has results
+        self.results = _Unrecorded()
+
+
+    @property
+    def logLikelihood(self):
+        """ Log likelihood of the current state """
+        return self.posterior - self.prior
+
+
+    def getState(self):
+        """ Get the state that moves with a swap """
+        return [self.Mod, self.D, self.prior, self.posterior, self.PhiD, self.paras.unscaledVariance]
+
+
+    def setState(self, state):
+        """ Set the state that moves with a swap """
+        [self.Mod, self.D, self.prior, self.posterior, self.PhiD, self.paras.unscaledVariance] = state
+
+
+    def getSampledState(self):
+        """ Get the state that moves with a swap to another rank, which leaves out the observed data and the systems """
+        return [self.Mod, self.D.getSampledState(), self.prior, self.posterior, self.PhiD, self.paras.unscaledVariance]
+
+
+    def setSampledState(self, state):
+        """ Set the state received from a replica on another rank """
+        # The data point is copied, since the best data of the results may refer to the current one
+        D = self.D.deepcopy()
+        D.setSampledState(state[1])
+        [self.Mod, self.D, self.prior, self.posterior, self.PhiD, self.paras.unscaledVariance] = [state[0], D] + state[2:]
+
+
+class _Unrecorded(object):
+    """ Stands in for the Results of a replica at a temperature above 1
+
+    Nothing is recorded, and the replica is never burned in, so its stochastic Newton proposal does not drift along
+    the gradient of the misfit.
+
+    """
+    burnedIn = False
+    saveMe = False
+    plotMe = False
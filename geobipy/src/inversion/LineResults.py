@@ -11,12 +11,15 @@ from ..classes.statistics.Distribution import Distribution
 from ..classes.statistics.Histogram1D import Histogram1D
 from ..classes.statistics.Histogram2D import Histogram2D
 from ..classes.statistics.Hitmap2D import Hitmap2D
+from ..classes.statistics.DepthSummary import DepthSummary
 from ..base.HDF import hdfRead
+from ..base.HDF.hdfWrite import createRepeated
 from ..base import customPlots as cP
 import matplotlib.pyplot as plt
 from os.path import split
 from ..base import fileIO as fIO
 from geobipy.src.inversion.Results import Results
+from .ResultsWriter import HdfRecorder
 
 try:
     from pyvtk import VtkData, UnstructuredGrid, CellData, Scalars
@@ -27,6 +30,8 @@ class LineResults(myObject):
     """ Class to define results from EMinv1D_MCMC for a line of data """
     def __init__(self, fName=None, sysPath=None, hdfFile=None, plotAgainst='easting'):
         """ Initialize the lineResults """
+        # Optional ResultsWriter that writes results in the background
+        self.writer = None
         if (fName is None): return
 
         self.addErr = None
@@ -186,6 +191,40 @@ class LineResults(myObject):
         self.iDs = np.asarray(self.hdfFile.get('ids'))
         self.nPoints = self.iDs.size
 
+    def getCompleted(self):
+        """ Get which data points in the line results file have been inverted and written
+
+        Files created before the completion ledger existed fall back to the inversion times, which are NaN until written.
+
+        Returns
+        -------
+        out : array of bool
+            True for each data point whose results have been written.
+
+        """
+        if ('completed' in self.hdfFile):
+            return np.asarray(self.hdfFile['completed'], dtype=bool)
+        return ~np.isnan(np.asarray(self.hdfFile['invtime']))
+
+    def getStopped(self):
+        """Get why the chain of each data point stopped before its last iteration
+
+        Returns
+        -------
+        out : array of ints
+            0 if the chain ran every iteration, Convergence.converged if it converged, or Convergence.stuck if it was cut
+            short because its acceptance rate stayed too low.
+
+        """
+        if ('stopped' in self.hdfFile):
+            return np.asarray(self.hdfFile['stopped'])
+        return np.zeros(self.hdfFile['invtime'].size, dtype=np.int32)
+
+    def getUnfinishedIDs(self):
+        """ Get the id numbers of the data points that still need to be inverted """
+        self.getIDs()
+        return self.iDs[~self.getCompleted()]
+
     def getDistanceAlongLine(self):
         """ Computes the distance along the line """
         if (not self.r is None): return
@@ -321,18 +360,27 @@ class LineResults(myObject):
         if (not self.opacity is None): return
 
         self.getZgrid()
-        self.opacity = np.zeros([self.nPoints,self.zGrid.size]) #
 
-        a = np.asarray(self.hdfFile['hitmap/arr/data'])
-        b = np.asarray(self.hdfFile['hitmap/x/data'])
-        c = np.asarray(self.hdfFile['hitmap/y/data'])
+        if (self.hasSummary(percent)):
+            # The percentiles were estimated during the inversion, so avoid reading every hitmap
+            iLow, iHigh = [self.summaryPercentIndex(x) for x in [100.0 - percent, percent]]
+            q = np.log(np.asarray(self.hdfFile['summary/quantiles/data']))
+            self.opacity = q[:, :, iHigh] - q[:, :, iLow]
+            if (not log is None):
+                self.opacity /= np.log(np.e if log == 'e' else log)
+        else:
+            self.opacity = np.zeros([self.nPoints,self.zGrid.size]) #
 
-        h = Hitmap2D(x = StatArray(b[0,:]), y = StatArray(c[0,:]))
+            a = np.asarray(self.hdfFile['hitmap/arr/data'])
+            b = np.asarray(self.hdfFile['hitmap/x/data'])
+            c = np.asarray(self.hdfFile['hitmap/y/data'])
 
-        for i in range(self.nPoints):
-            h.arr[:,:] = a[i,:,:]
-            h.x[:] = b[i,:]
-            self.opacity[i,:] = h.getConfidenceRange(percent=percent, log=log)
+            h = Hitmap2D(x = StatArray(b[0,:]), y = StatArray(c[0,:]))
+
+            for i in range(self.nPoints):
+                h.arr[:,:] = a[i,:,:]
+                h.x[:] = b[i,:]
+                self.opacity[i,:] = h.getConfidenceRange(percent=percent, log=log)
 
 #        self.opacity[self.opacity < low] = low
         self.opacity[self.opacity > high] = high
@@ -343,15 +391,44 @@ class LineResults(myObject):
 
         self.opacity = 1.0 - self.opacity
 
+    def hasSummary(self, percent=None):
+        """ Check whether the running summaries were written, and optionally whether they include a credible interval """
+        if (not 'summary' in self.hdfFile): return False
+        if (percent is None): return True
+        percents = np.asarray(self.hdfFile['summary/percents/data'])
+        return all(np.any(np.isclose(percents, x)) for x in [100.0 - percent, percent])
+
+
+    def summaryPercentIndex(self, percent):
+        """ Get the index of a percentile in the running summaries """
+        percents = np.asarray(self.hdfFile['summary/percents/data'])
+        i = np.where(np.isclose(percents, percent))[0]
+        assert i.size == 1, ValueError('The {} percentile is not summarized, available percentiles are {}'.format(percent, percents))
+        return i[0]
+
+
+    def getInterfaceProbability(self):
+        """ Get the probability of an interface within each depth cell for each data point, from the running summaries """
+        assert self.hasSummary(), Exception('The results do not have running summaries, invert with depthSummary = True')
+        return StatArray(np.asarray(self.hdfFile['summary/interfaces/data']), 'Probability of interface')
+
+
+    def getSummaryMean(self):
+        """ Get the posterior mean of the log parameter with depth for each data point, from the running summaries """
+        assert self.hasSummary(), Exception('The results do not have running summaries, invert with depthSummary = True')
+        return StatArray(np.asarray(self.hdfFile['summary/mean/data']), 'Mean log parameter')
+
+
     def getResults(self, iD):
         """ Obtain the results for the given iD number """
+        return self._getResults(self.pointIndex(iD))
+
 
-        assert iD in self.iDs, "The HDF file was not initialized to contain the results for this datapoints results "
+    def _getResults(self, i):
+        """ Obtain the results of the i'th data point in the file """
 
         aFile = self.hdfFile
 
-        # Get the point index
-        i = self.iDs.searchsorted(iD)
         s=np.s_[i,:]
 
         R = Results()
@@ -367,6 +444,7 @@ class LineResults(myObject):
         R.i = hdfRead.readKeyFromFile(aFile,'','/','i', index=i)
         R.iBurn = hdfRead.readKeyFromFile(aFile,'','/','iburn', index=i)
         R.burnedIn = hdfRead.readKeyFromFile(aFile,'','/','burnedin', index=i)
+        R.stopped = np.array(aFile['stopped'][i]) if 'stopped' in aFile else np.int32(0)
         R.doi = hdfRead.readKeyFromFile(aFile,'','/','doi', index=i)
         R.multiplier = hdfRead.readKeyFromFile(aFile,'','/','multiplier', index=i)
         R.rate = hdfRead.readKeyFromFile(aFile,'','/','rate', index=s)
@@ -378,6 +456,8 @@ class LineResults(myObject):
         R.kHist = hdfRead.readKeyFromFile(aFile,'','/','khist', index=i)
         R.DzHist = hdfRead.readKeyFromFile(aFile,'','/','dzhist', index=i)
         R.MzHist = hdfRead.readKeyFromFile(aFile,'','/','mzhist', index=i)
+        if (self.hasSummary()):
+            R.summary = DepthSummary().fromHdf(aFile['summary'], index=i)
 
 
         R.DzHist.bins -= (R.DzHist.bins[int(R.DzHist.bins.size/2)] - R.bestD.z[0])
@@ -517,7 +597,7 @@ class LineResults(myObject):
         mec = kwargs.pop('markeredgecolor','k')
         mew = kwargs.pop('markeredgewidth','0.1')
 
-        i = self.iDs.searchsorted(iDs)
+        i = self.pointIndex(iDs)
 
         tmp=self.z.reshape(self.z.size) + self.elevation
 
@@ -1205,6 +1285,8 @@ class LineResults(myObject):
                 res.append('burnedin')
             elif (low == 'burn in #'):
                 res.append('iburn')
+            elif (low == 'stopped'):
+                res.append('stopped')
             elif (low == 'data multiplier'):
                 res.append('multiplier')
             elif (low == 'layer histogram'):
@@ -1281,6 +1363,7 @@ class LineResults(myObject):
               "# of markov chains \n" +
               "burned in\n" +
               "burn in # \n" +
+              "stopped \n" +
               "data multiplier \n" +
               "layer histogram \n" +
               "elevation histogram \n" +
@@ -1312,11 +1395,16 @@ class LineResults(myObject):
         parent: HDF object to create a group inside
         myName: Name of the group
         """
+        self._createHdf(aFile, np.sort(iDs), results)
+
+
+    def _createHdf(self, aFile, iDs, results):
+        """ Create the datasets for the data points in the order given by iDs """
 
         self.hdfFile = aFile
 
         nPoints = iDs.size
-        self.iDs = np.sort(iDs)
+        self.iDs = iDs
 
         # Initialize and write the attributes that won't change
         aFile.create_dataset('ids',data=self.iDs)
@@ -1332,13 +1420,17 @@ class LineResults(myObject):
 
 
         # Initialize the attributes that will be written later
-        aFile.create_dataset('i', shape=[nPoints], dtype=results.i.dtype, fillvalue=np.nan)
-        aFile.create_dataset('iburn', shape=[nPoints], dtype=results.iBurn.dtype, fillvalue=np.nan)
-        aFile.create_dataset('burnedin', shape=[nPoints], dtype=type(results.burnedIn))
-        aFile.create_dataset('doi',  shape=[nPoints], dtype=results.doi.dtype, fillvalue=np.nan)
-        aFile.create_dataset('multiplier',  shape=[nPoints], dtype=results.multiplier.dtype, fillvalue=np.nan)
-        aFile.create_dataset('invtime',  shape=[nPoints], dtype=float, fillvalue=np.nan)
-        aFile.create_dataset('savetime',  shape=[nPoints], dtype=float, fillvalue=np.nan)
+        # Their storage is allocated now, so that the ranks of a parallel run can open and write them independently
+        createRepeated(aFile, 'i', [nPoints], dtype=results.i.dtype, fillvalue=np.nan)
+        createRepeated(aFile, 'iburn', [nPoints], dtype=results.iBurn.dtype, fillvalue=np.nan)
+        createRepeated(aFile, 'burnedin', [nPoints], dtype=type(results.burnedIn))
+        createRepeated(aFile, 'stopped', [nPoints], dtype=results.stopped.dtype)
+        createRepeated(aFile, 'doi', [nPoints], dtype=results.doi.dtype, fillvalue=np.nan)
+        createRepeated(aFile, 'multiplier', [nPoints], dtype=results.multiplier.dtype, fillvalue=np.nan)
+        createRepeated(aFile, 'invtime', [nPoints], dtype=float, fillvalue=np.nan)
+        createRepeated(aFile, 'savetime', [nPoints], dtype=float, fillvalue=np.nan)
+        # Completion ledger, only set once every other result of a point has been written
+        createRepeated(aFile, 'completed', [nPoints], dtype=bool, fillvalue=False)
 
         results.meanInterp.createHdf(aFile,'meaninterp',nRepeats=nPoints, fillvalue=np.nan)
         results.bestInterp.createHdf(aFile,'bestinterp',nRepeats=nPoints, fillvalue=np.nan)
@@ -1369,10 +1461,17 @@ class LineResults(myObject):
         # Add the Hitmap
         results.Hitmap.createHdf(aFile,'hitmap', nRepeats=nPoints, fillvalue=np.nan)
 
+        # Add the running summaries of the parameter with depth
+        if (not results.summary is None):
+            results.summary.createHdf(aFile,'summary', nRepeats=nPoints, fillvalue=np.nan)
+
         results.bestD.createHdf(aFile,'bestd', nRepeats=nPoints, fillvalue=np.nan)
 
         # Since the 1D models change size adaptively during the inversion, we need to pad the HDF creation to the maximum allowable number of layers.
-        tmp = results.bestModel.pad(results.bestModel.maxLayers)
+        # Models with preallocated memory already span the maximum number of layers.
+        tmp = results.bestModel
+        if (tmp.capacity < tmp.maxLayers):
+            tmp = tmp.pad(tmp.maxLayers)
 
         tmp.createHdf(aFile,'bestmodel',nRepeats=nPoints, fillvalue=np.nan)
 
@@ -1400,14 +1499,50 @@ class LineResults(myObject):
 #        tmp.createHdf(grp, 'bestmodel')
 
     def results2Hdf(self, results):
-        """ Given a HDF file initialized as line results, write the contents of results to the appropriate arrays """
+        """ Given a HDF file initialized as line results, write the contents of results to the appropriate arrays
 
-        assert results.ID in self.iDs, Exception("The HDF file does not have ID number {}. Available ids are between {} and {}".format(results.ID, np.min(self.iDs), np.max(self.iDs)))
-
-        aFile = self.hdfFile
+        If a ResultsWriter has been attached to LineResults.writer, the writes are recorded and handed to the writer,
+        which writes them in the background along with those of other data points.
 
+        """
         # Get the point index
-        i = self.iDs.searchsorted(results.ID)
+        self._putResults(results, self.pointIndex(results.ID))
+
+
+    def pointIndex(self, ID):
+        """ Get the index in the file of the data point with the given ID number, or of each of an array of ID numbers """
+        assert np.all(np.isin(ID, self.iDs)), Exception("The HDF file does not have ID number {}. Available ids are between {} and {}".format(ID, np.min(self.iDs), np.max(self.iDs)))
+        return self.iDs.searchsorted(ID)
+
+
+    def putRecords(self, records):
+        """Make the writes recorded for a data point, e.g. by a RecordedResults in another process, or hand them to the writer
+
+        Parameters
+        ----------
+        records : list
+            The writes recorded by a HdfRecorder.
+
+        """
+        if (self.writer is None):
+            HdfRecorder.replay(self.hdfFile, records)
+        else:
+            self.writer.put(self.hdfFile, records)
+
+
+    def _putResults(self, results, i):
+        """ Write the results to the i'th data point in the file, or hand them to the writer """
+        if (self.writer is None):
+            self._writeResults(results, self.hdfFile, i)
+            return
+
+        recorder = HdfRecorder()
+        self._writeResults(results, recorder, i)
+        self.writer.put(self.hdfFile, recorder.records)
+
+
+    def _writeResults(self, results, aFile, i):
+        """ Write the contents of results to the i'th data point of a HDF file, or a HdfRecorder """
 
         # Add the iteration number
         aFile['i'][i] = results.i
@@ -1418,6 +1553,9 @@ class LineResults(myObject):
         # Add the burned in logical
         aFile['burnedin'][i] = results.burnedIn
 
+        # Add why the chain stopped early
+        aFile['stopped'][i] = results.stopped
+
         # Add the depth of investigation
         aFile['doi'][i] = results.doi
 
@@ -1466,14 +1604,42 @@ class LineResults(myObject):
         # Add the hitmap
         results.Hitmap.writeHdf(aFile,'hitmap',  index=i)
 
+        # Add the running summaries
+        if (not results.summary is None):
+            results.summary.writeHdf(aFile,'summary', index=i)
+
         results.bestD.writeHdf(aFile,'bestd',  index=i)
 
         results.bestModel.writeHdf(aFile,'bestmodel', index=i)
 
+        # Mark the point as completed last, so that a point interrupted while writing is inverted again on restart
+        aFile['completed'][i] = True
+
 #        if results.verbose:
 #            results.posteriorComponents.writeHdf(aFile, 'posteriorcomponents',  index=np.s_[i,:,:])
 
 
+class RecordedResults(myObject):
+    """Stands in for the line results file of a data point that is inverted in another process
+
+    RecordedResults(i)
+
+    The results of the data point are recorded rather than written, so that the records can be sent back to the process
+    that holds the files, which makes the writes with LineResults.putRecords.
 
+    Parameters
+    ----------
+    i : int
+        Index of the data point in its results file, see LineResults.pointIndex.
 
+    """
 
+    def __init__(self, i):
+        """ Initialize the recorder """
+        self.i = i
+        self.records = []
+
+
+    def results2Hdf(self, results):
+        """ Record the writes of the results of the data point """
+        LineResults()._writeResults(results, HdfRecorder(self.records), self.i)
@@ -14,6 +14,7 @@ import h5py
 from ..base.HDF.hdfWrite import writeNumpy
 from ..classes.core.StatArray import StatArray
 from ..classes.statistics.Hitmap2D import Hitmap2D
+from ..classes.statistics.DepthSummary import DepthSummary
 from ..classes.statistics.Histogram1D import Histogram1D
 from ..classes.statistics.Distribution import Distribution
 from ..classes.core.myObject import myObject
@@ -21,6 +22,7 @@ from ..classes.data.datapoint.FdemDataPoint import FdemDataPoint
 from ..classes.data.datapoint.TdemDataPoint import TdemDataPoint
 from ..classes.model.Model1D import Model1D
 from ..classes.core.Stopwatch import Stopwatch
+from .Convergence import Convergence
 
 class Results(myObject):
     """ Define the results handler for the MCMC Inversion """
@@ -32,6 +34,14 @@ class Results(myObject):
         self.clk = Stopwatch()
         self.invTime = np.float64(0.0)
         self.saveTime = np.float64(0.0)
+        # Optional running summaries of the parameter with depth
+        self.summary = None
+        # Optional diagnostics of whether the chain has converged
+        self.convergence = None
+        # Why the chain stopped before its last iteration, see Convergence
+        self.stopped = np.int32(0)
+        # Set a tag to catch data points that are not minimizing
+        self.zeroCount = 0
 
         # Logicals of whether to plot or save
         self.saveMe = saveMe
@@ -116,7 +126,11 @@ class Results(myObject):
 
         self.iz = np.arange(zGrd.size)
 
-        self.Hitmap = Hitmap2D(x=mGrd, y=zGrd)
+        # The counts only need a type wide enough for the number of iterations
+        self.Hitmap = Hitmap2D(x=mGrd, y=zGrd, dtype=Hitmap2D.countType(paras.nMC, paras.hitmapType))
+
+        # Optionally summarize the parameter at each depth of the hitmap while the chain runs
+        self.summary = DepthSummary(zGrd) if paras.depthSummary else None
 
         # Initialize the doi
         self.doi = self.Hitmap.y[0]
@@ -132,8 +146,9 @@ class Results(myObject):
         # Initialize the Model Depth Histogram
         self.MzHist = Histogram1D(bins=zGrd)
 
-        # Set a tag to catch data points that are not minimizing
-        self.zeroCount = 0
+        # Optionally record the samples after burn in to check whether the chain has converged
+        if (paras.stopWhenConverged):
+            self.convergence = Convergence(self.nMC, paras.rHatTarget, paras.essTarget, paras.hitmapTolerance, paras.convergenceInterval)
 
         # Initialize the figure region
         self.initFigure()
@@ -181,6 +196,10 @@ class Results(myObject):
                 self.addErr[j].update(D.addErr[j])
 
             Mod.addToHitMap(self.Hitmap)
+            if (not self.summary is None):
+                self.summary.update(Mod.interpPar2Mesh(Mod.par, self.Hitmap), Mod.depth[:-1])
+            if (not self.convergence is None):
+                self.convergence.update(PhiD, Mod.nCells[0])
 
             # Update the layer interface histogram
             if (Mod.nCells > 1):
@@ -216,6 +235,20 @@ class Results(myObject):
         self.bestModel = bestModel
 
 
+    def __getstate__(self):
+        """ The figure is not pickled, it is recreated when unpickled """
+        state = self.__dict__.copy()
+        for key in ['fig', 'gs', 'ax']:
+            state.pop(key, None)
+        return state
+
+
+    def __setstate__(self, state):
+        """ Unpickle the results and recreate the figure """
+        self.__dict__.update(state)
+        self.initFigure()
+
+
     def initFigure(self, iFig=0, forcePlot=False):
         """ Initialize the plotting region """
         if (not self.plotMe and not forcePlot):
@@ -553,6 +586,7 @@ class Results(myObject):
         grp.create_dataset('nsystems', (1,), dtype=self.nSystems.dtype)
         grp.create_dataset('iburn', (1,), dtype=self.iBurn.dtype)
         grp.create_dataset('burnedin', (1,), dtype=type(self.burnedIn))
+        grp.create_dataset('stopped', (1,), dtype=self.stopped.dtype)
         grp.create_dataset('doi', (1,), dtype=self.doi.dtype)
         grp.create_dataset('multiplier', (1,), dtype=self.multiplier.dtype)
         grp.create_dataset('invtime', (1,), dtype=float)
@@ -575,9 +609,13 @@ class Results(myObject):
             self.addErr[i].createHdf(grp, 'adderr' + str(i))
 
         self.Hitmap.createHdf(grp,'hitmap')
+        if (not self.summary is None):
+            self.summary.createHdf(grp, 'summary')
         self.bestD.createHdf(grp, 'bestd')
 
-        tmp=self.bestModel.pad(self.bestModel.maxLayers)
+        tmp=self.bestModel
+        if (tmp.capacity < tmp.maxLayers):
+            tmp=tmp.pad(tmp.maxLayers)
         tmp.createHdf(grp, 'bestmodel')
 
 
@@ -602,6 +640,7 @@ class Results(myObject):
         writeNumpy(self.nSystems, grp, 'nsystems')
         writeNumpy(self.iBurn, grp, 'iburn')
         writeNumpy(self.burnedIn, grp, 'burnedin')
+        writeNumpy(self.stopped, grp, 'stopped')
         self.doi = self.Hitmap.getOpacityLevel(67.0)
         writeNumpy(self.doi, grp, 'doi')
         writeNumpy(self.multiplier, grp, 'multiplier')
@@ -620,6 +659,8 @@ class Results(myObject):
             self.addErr[i].writeHdf(grp, 'adderr' + str(i))
 
         self.Hitmap.writeHdf(grp,'hitmap')
+        if (not self.summary is None):
+            self.summary.writeHdf(grp, 'summary')
 
         mean = self.Hitmap.getMeanInterval()
         best = self.bestModel.interp2depth(self.bestModel.par, self.Hitmap)
@@ -656,6 +697,7 @@ class Results(myObject):
         grp.create_dataset('nsystems', data=self.nSystems)
         grp.create_dataset('iburn', data=self.iBurn)
         grp.create_dataset('burnedin', data=self.burnedIn)
+        grp.create_dataset('stopped', data=self.stopped)
         self.doi = self.Hitmap.getOpacityLevel(67.0)
         grp.create_dataset('doi', data=self.doi)
         # Large vector of phiD
@@ -674,6 +716,9 @@ class Results(myObject):
         self.MzHist.writeHdf(grp, 'mzhist')
         # Hit Maps
         self.Hitmap.writeHdf(grp, 'hitmap')
+        # Summaries of the parameter with depth
+        if (not self.summary is None):
+            self.summary.toHdf(grp, 'summary')
         # Write the Best Data
         self.bestD.writeHdf(grp, 'bestd')
         # Write the Best Model
@@ -744,6 +789,9 @@ class Results(myObject):
             tmp = grp.get('burnedIn')
         self.burnedIn = np.array(tmp)
 
+        tmp = grp.get('stopped')
+        self.stopped = np.int32(0) if tmp is None else np.array(tmp)
+
         self.doi = np.array(grp.get('doi'))
         self.multiplier = np.array(grp.get('multiplier'))
 
@@ -786,6 +834,12 @@ class Results(myObject):
         obj = eval(s)
         self.Hitmap = obj.fromHdf(item)
 
+        self.summary = None
+        item = grp.get('summary')
+        if (not item is None):
+            obj = eval(safeEval(item.attrs.get('repr')))
+            self.summary = obj.fromHdf(item)
+
         item = grp.get('bestd')
         if (item is None):
             item = grp.get('bestD')
@@ -0,0 +1,202 @@
+""" @ResultsWriter
+Module to write the results of many data points to their line results files in the background.
+"""
+import threading
+import queue
+import numpy as np
+from ..classes.core.myObject import myObject
+
+
+class HdfRecorder(object):
+    """Stands in for a HDF file or group and records the writes made to it instead of writing them
+
+    Every writeHdf method ends in an indexed assignment to a dataset, e.g. parent['khist/counts/data'][i, :] = values.
+    The recorder captures the dataset path, the index, and a copy of the values so that the writes can be replayed later,
+    in any order, by a ResultsWriter.
+
+    Parameters
+    ----------
+    records : list, optional
+        List that the writes are appended to as (path, index, values) tuples.
+    path : str, optional
+        Path of the group or dataset that this recorder stands in for.
+
+    """
+
+    def __init__(self, records=None, path=''):
+        """ Initialize a recorder """
+        self.records = [] if records is None else records
+        self.path = path
+
+
+    def get(self, name):
+        """ Get a recorder for a group or dataset below this one """
+        return HdfRecorder(self.records, name if self.path == '' else self.path + '/' + name)
+
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+
+    def __setitem__(self, index, values):
+        """ Record a write to the dataset """
+        self.records.append((self.path, index, np.array(values)))
+
+
+    @staticmethod
+    def replay(hdfFile, records):
+        """Make the recorded writes to a HDF file, in the order they were recorded
+
+        Parameters
+        ----------
+        hdfFile : h5py._hl.files.File
+            The file to write to.
+        records : list
+            The writes recorded by a HdfRecorder.
+
+        """
+        for path, index, values in records:
+            hdfFile[path][index] = values
+
+
+class ResultsWriter(myObject):
+    """Writes the results of data points to their HDF files from a background thread
+
+    ResultsWriter(flushSize, flushInterval)
+
+    LineResults.results2Hdf hands the writes for a data point to the writer, and returns immediately so that the
+    inversion of the next data point can start.  The writer accumulates the writes of many data points, and when
+    flushSize data points are pending, or no new data point has arrived for flushInterval seconds, the writes to each
+    dataset are sorted by data point and every run of consecutive data points is written with a single hyperslab write.
+
+    The writes of each dataset are made in the order the datasets were first written to, so the completion ledger of a
+    data point, written last by LineResults.results2Hdf, is only set once its other results are in the file.
+
+    If the files were opened with the mpio driver, MPI must have been initialized with MPI_THREAD_MULTIPLE, which is the
+    default for mpi4py.
+
+    Parameters
+    ----------
+    flushSize : int, optional
+        Number of data points to accumulate before writing.
+    flushInterval : float, optional
+        Seconds to wait for another data point before writing those that are pending.
+
+    """
+
+    def __init__(self, flushSize=64, flushInterval=10.0):
+        """ Initialize the writer and start its thread """
+        assert flushSize > 0, ValueError('flushSize must be positive')
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def put(self, hdfFile, records):
+        """Queue the recorded writes of a data point
+
+        Parameters
+        ----------
+        hdfFile : h5py._hl.files.File
+            The file to write to.
+        records : list
+            The writes recorded by a HdfRecorder.
+
+        """
+        self._check()
+        self._queue.put((hdfFile, records))
+
+
+    def flush(self):
+        """ Block until every queued data point has been written """
+        self._check()
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        self._check()
+
+
+    def close(self):
+        """ Write every queued data point and stop the thread """
+        if (self._thread.is_alive()):
+            self._queue.put(None)
+            self._thread.join()
+        self._check()
+
+
+    def _check(self):
+        """ Raise any exception that occurred on the writer thread """
+        if (not self._error is None):
+            raise RuntimeError('The results writer failed') from self._error
+
+
+    def _run(self):
+        """ Accumulate data points and write them in batches """
+        pending = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flushInterval)
+            except queue.Empty:
+                item = False
+
+            if (item is None or item is False or isinstance(item, threading.Event)):
+                self._write(pending)
+                pending = []
+                if (isinstance(item, threading.Event)):
+                    item.set()
+                if (item is None):
+                    return
+                continue
+
+            pending.append(item)
+            if (len(pending) >= self.flushSize):
+                self._write(pending)
+                pending = []
+
+
+    def _write(self, pending):
+        """ Coalesce the writes of many data points into contiguous writes per dataset """
+        if (len(pending) == 0 or not self._error is None):
+            return
+        try:
+            # Group the writes by file and dataset, keeping the order the datasets were first written to
+            datasets = {}
+            for hdfFile, records in pending:
+                for path, index, values in records:
+                    datasets.setdefault((id(hdfFile), path), (hdfFile, path, []))[2].append((index, values))
+
+            for hdfFile, path, writes in datasets.values():
+                self._writeDataset(hdfFile[path], writes)
+        except Exception as e:
+            self._error = e
+
+
+    @staticmethod
+    def _writeDataset(dataset, writes):
+        """ Sort the writes by data point and write runs of consecutive data points in one go """
+        # Writes with the same trailing index can be stacked along the leading index
+        groups = {}
+        for index, values in writes:
+            lead, rest = (index[0], index[1:]) if isinstance(index, tuple) else (index, ())
+            if (isinstance(lead, (int, np.integer))):
+                groups.setdefault(repr(rest), (rest, []))[1].append((int(lead), values))
+            else:
+                dataset[index] = values
+
+        for rest, group in groups.values():
+            group.sort(key=lambda x: x[0])
+            # Shape that a single data point occupies, e.g. a size 1 array written to a 1D dataset is a scalar
+            shape = np.broadcast_to(np.empty(()), dataset.shape[1:])[rest].shape
+            i = 0
+            while (i < len(group)):
+                j = i + 1
+                while (j < len(group) and group[j][0] == group[j - 1][0] + 1):
+                    j += 1
+                if (j - i == 1):
+                    dataset[(group[i][0],) + rest] = group[i][1]
+                else:
+                    dataset[(slice(group[i][0], group[j - 1][0] + 1),) + rest] = np.stack([np.reshape(x[1], shape) for x in group[i:j]])
+                i = j
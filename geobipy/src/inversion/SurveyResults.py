@@ -0,0 +1,216 @@
+""" @SurveyResults
+Class to handle a single HDF5 results file for every line of a survey.
+ """
+import numpy as np
+from os.path import join
+from ..classes.core.myObject import myObject
+from .LineResults import LineResults
+
+
+class SurveyResults(LineResults):
+    """Results of every data point in a survey, stored in a single HDF5 file
+
+    SurveyResults(fName, hdfFile)
+
+    The file has the same datasets as a line results file, but they span every data point in the survey, ordered by line
+    number and then by id number.  A data point is indexed by its global position in that order, and the points of each
+    line occupy a contiguous range that is recorded in the file by the 'lines', 'linestart' and 'linecount' datasets.
+
+    Since the layout matches a line results file, the getters of LineResults read an attribute for the whole survey with
+    a single contiguous read, rather than opening and reading one file per line.
+
+    Parameters
+    ----------
+    fName : str, optional
+        Name of the survey results file.
+    hdfFile : h5py._hl.files.File, optional
+        An already opened file, e.g. opened collectively with the mpio driver.
+    plotAgainst : str, optional
+        See LineResults.
+
+    """
+
+    # Name of the survey results file inside an output directory
+    fileName = 'survey.h5'
+
+    def __init__(self, fName=None, hdfFile=None, plotAgainst='easting'):
+        """ Initialize the survey results """
+        self.lineNumbers = None
+        self.lineStart = None
+        self.lineCount = None
+        LineResults.__init__(self, fName, hdfFile=hdfFile, plotAgainst=plotAgainst)
+        if (fName is None): return
+        self.getLines()
+
+
+    @classmethod
+    def inDirectory(cls, directory):
+        """ Get the name of the survey results file in a directory """
+        return join(directory, cls.fileName)
+
+
+    def createHdf(self, aFile, lines, iDs, results):
+        """Create the datasets for every data point in a survey
+
+        Parameters
+        ----------
+        aFile : h5py._hl.files.File
+            The file to create the datasets in.
+        lines : array_like
+            Line number of each data point.
+        iDs : array_like
+            Id number of each data point.
+        results : geobipy.Results
+            Results of a data point used as the template for the sizes of the datasets.
+
+        """
+        lines = np.asarray(lines)
+        iDs = np.asarray(iDs)
+        # Order the points by line, then by id
+        order = np.lexsort((iDs, lines))
+        lines = lines[order]
+
+        self.lineNumbers, self.lineStart, self.lineCount = np.unique(lines, return_index=True, return_counts=True)
+        aFile.create_dataset('line', data=lines)
+        aFile.create_dataset('lines', data=self.lineNumbers)
+        aFile.create_dataset('linestart', data=self.lineStart)
+        aFile.create_dataset('linecount', data=self.lineCount)
+
+        self._createHdf(aFile, iDs[order], results)
+
+
+    def getLines(self):
+        """ Get the line numbers and the range of data points that each line occupies """
+        if (not self.lineNumbers is None): return
+        self.lineNumbers = np.asarray(self.hdfFile['lines'])
+        self.lineStart = np.asarray(self.hdfFile['linestart'])
+        self.lineCount = np.asarray(self.hdfFile['linecount'])
+
+
+    def lineIndex(self, line):
+        """ Get the index of a line number """
+        self.getLines()
+        iLine = self.lineNumbers.searchsorted(line)
+        assert iLine < self.lineNumbers.size and self.lineNumbers[iLine] == line, ValueError('The survey does not have line {}'.format(line))
+        return iLine
+
+
+    def lineSlice(self, line):
+        """Get the range of data points of a line
+
+        Parameters
+        ----------
+        line : number
+            The line number.
+
+        Returns
+        -------
+        out : slice
+            Slice into the data points of the survey, and any attribute read from it.
+
+        """
+        iLine = self.lineIndex(line)
+        return np.s_[self.lineStart[iLine] : self.lineStart[iLine] + self.lineCount[iLine]]
+
+
+    def getLineNumber(self, i):
+        """ Get the line number of the i'th data point """
+        self.getLines()
+        return self.lineNumbers[self.lineStart.searchsorted(i, side='right') - 1]
+
+
+    def pointIndex(self, ID, line=None):
+        """Get the index in the file of the data point with the given ID number on a line
+
+        The ID numbers are only sorted, and only need to be unique, within a line, so the line number is required.
+
+        Parameters
+        ----------
+        ID : int or array_like
+            ID number, or ID numbers, of data points on the line.
+        line : number
+            The line number.
+
+        Returns
+        -------
+        out : int or array of ints
+            Global index of each data point in the survey.
+
+        """
+        assert not line is None, ValueError('The ID numbers of a survey are only unique within a line, give the line number or use getLine(line)')
+        r = self.lineSlice(line)
+        iDs = self.iDs[r]
+        assert np.all(np.isin(ID, iDs)), Exception("Line {} does not have ID number {}".format(line, ID))
+        return r.start + iDs.searchsorted(ID)
+
+
+    def getResults(self, iD, line=None):
+        """ Obtain the results for the given iD number on a line """
+        return self._getResults(self.pointIndex(iD, line))
+
+
+    def results2Hdf(self, results, line=None):
+        """ Write the results of a data point on a line to the survey results file """
+        self._putResults(results, self.pointIndex(results.ID, line))
+
+
+    def getLine(self, line):
+        """Get an object that writes the results of the data points on a line into the survey
+
+        Parameters
+        ----------
+        line : number
+            The line number.
+
+        Returns
+        -------
+        out : SurveyLine
+            Can be used in place of the LineResults of the line when inverting its data points.
+
+        """
+        return SurveyLine(self, line)
+
+
+class SurveyLine(myObject):
+    """The data points of one line in a SurveyResults file
+
+    SurveyLine(survey, line)
+
+    Stands in for the LineResults of a line when inverting, and writes the results of a data point to its global position
+    in the survey results file.
+
+    Parameters
+    ----------
+    survey : SurveyResults
+        The survey results.
+    line : number
+        The line number.
+
+    """
+
+    def __init__(self, survey, line):
+        """ Initialize the line """
+        self.survey = survey
+        self.line = line
+        self.range = survey.lineSlice(line)
+        self.iDs = survey.iDs[self.range]
+
+
+    def getCompleted(self):
+        """ Get which data points on the line have been inverted and written """
+        return self.survey.getCompleted()[self.range]
+
+
+    def results2Hdf(self, results):
+        """ Write the results of a data point on the line to the survey results file """
+        self.survey.results2Hdf(results, self.line)
+
+
+    def pointIndex(self, ID):
+        """ Get the index in the survey results file of the data point on the line with the given ID number """
+        return self.survey.pointIndex(ID, self.line)
+
+
+    def putRecords(self, records):
+        """ Make the writes recorded for a data point on the line, see LineResults.putRecords """
+        self.survey.putRecords(records)
@@ -31,6 +31,80 @@ class _userParameters(myObject):
         else:
             assert False, TypeError('Invalid DataPoint type used')
 
+        # Check whether the model and data point are perturbed in place and restored on rejection, rather than copied
+        if (not hasattr(self, 'inPlace')):
+            self.inPlace = False
+        assert isinstance(self.inPlace, bool), 'inPlace must be a bool'
+
+        # Check whether each chain is snapshotted every checkpointInterval iterations so that it can be resumed
+        if (not hasattr(self, 'checkpointInterval')):
+            self.checkpointInterval = None
+        if (not self.checkpointInterval is None):
+            assert isInt(self.checkpointInterval) and self.checkpointInterval > 0, 'checkpointInterval must be a positive int'
+        if (not hasattr(self, 'checkpointDir')):
+            self.checkpointDir = '.'
+
+        # Check how the per data point results are chunked and compressed in the HDF5 files, see hdfWrite.setRepeatedStorage
+        if (not hasattr(self, 'chunkRepeats')):
+            self.chunkRepeats = None
+        if (not self.chunkRepeats is None):
+            assert isInt(self.chunkRepeats) and self.chunkRepeats > 0, 'chunkRepeats must be a positive int'
+        if (not hasattr(self, 'compression')):
+            self.compression = None
+        assert self.compression in [None, 'gzip', 'lzf'], "compression must be None, 'gzip' or 'lzf'"
+        if (not hasattr(self, 'compressionLevel')):
+            self.compressionLevel = None
+        if (not hasattr(self, 'shuffle')):
+            self.shuffle = False
+        assert isinstance(self.shuffle, bool), 'shuffle must be a bool'
+
+        # Check the narrowest integer type used to count the samples in the hitmap
+        if (not hasattr(self, 'hitmapType')):
+            self.hitmapType = np.int64
+        assert np.dtype(self.hitmapType).kind in 'iu', 'hitmapType must be an integer type, e.g. np.uint16'
+
+        # Check whether running summaries of the parameter with depth are kept alongside the hitmap, see DepthSummary
+        if (not hasattr(self, 'depthSummary')):
+            self.depthSummary = False
+        assert isinstance(self.depthSummary, bool), 'depthSummary must be a bool'
+
+        # Check whether a chain is stopped once it has converged, and how often that is checked, see Convergence
+        if (not hasattr(self, 'stopWhenConverged')):
+            self.stopWhenConverged = False
+        assert isinstance(self.stopWhenConverged, bool), 'stopWhenConverged must be a bool'
+        if (not hasattr(self, 'convergenceInterval')):
+            self.convergenceInterval = 1000
+        assert isInt(self.convergenceInterval) and self.convergenceInterval > 0, 'convergenceInterval must be a positive int'
+        if (not hasattr(self, 'rHatTarget')):
+            self.rHatTarget = 1.05
+        assert isinstance(self.rHatTarget, float) and self.rHatTarget > 1.0, 'rHatTarget must be a float > 1.0'
+        if (not hasattr(self, 'essTarget')):
+            self.essTarget = 400.0
+        assert isinstance(self.essTarget, float) and self.essTarget > 0.0, 'essTarget must be a float > 0.0'
+        if (not hasattr(self, 'hitmapTolerance')):
+            self.hitmapTolerance = 0.01
+        assert isinstance(self.hitmapTolerance, float) and self.hitmapTolerance > 0.0, 'hitmapTolerance must be a float > 0.0'
+
+        # Check whether a chain is cut short once its acceptance rate has been below 2% for maxZeroCount thousand iterations
+        if (not hasattr(self, 'maxZeroCount')):
+            self.maxZeroCount = None
+        if (not self.maxZeroCount is None):
+            assert isInt(self.maxZeroCount) and self.maxZeroCount > 0, 'maxZeroCount must be a positive int'
+
+        # Check the ladder of temperatures of a tempered chain, e.g. np.geomspace(1.0, 10.0, 8), and how often adjacent
+        # replicas swap states, see Inv_MCMC_Tempered
+        if (not hasattr(self, 'temperatures')):
+            self.temperatures = None
+        if (not self.temperatures is None):
+            self.temperatures = np.asarray(self.temperatures, dtype=np.float64)
+            assert self.temperatures.ndim == 1 and self.temperatures.size > 1, 'temperatures must be a 1D array of at least two temperatures'
+            assert self.temperatures[0] == 1.0 and np.all(np.diff(self.temperatures) > 0.0), 'temperatures must increase from 1.0'
+        if (not hasattr(self, 'swapInterval')):
+            self.swapInterval = 10
+        assert isInt(self.swapInterval) and self.swapInterval > 0, 'swapInterval must be a positive int'
+        # A tempered chain is not snapshotted, so checkpointing cannot be asked for alongside it
+        assert self.temperatures is None or self.checkpointInterval is None, 'checkpointInterval cannot be used with temperatures'
+
         # Check the number of Markov chains
         self.nMC = np.int(self.nMC)
         assert isInt(self.nMC), 'nMC must be a numpy integer'
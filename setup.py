@@ -43,8 +43,8 @@ setup(name='geobipy',
         'progressbar2'
     ],
     ext_modules=[Extension(name='geobipy.src.classes.forwardmodelling.fdemforward1d_fortran',
-                           extra_f90_compile_args = ['-ffree-line-length-none','-O3', '-finline-functions', '-funroll-all-loops'],
-                           extra_link_args = ['-ffree-line-length-none', '-O3', '-finline-functions', '-funroll-all-loops', '-g0'],
+                           extra_f90_compile_args = ['-ffree-line-length-none','-O3', '-finline-functions', '-funroll-all-loops', '-fopenmp'],
+                           extra_link_args = ['-ffree-line-length-none', '-O3', '-finline-functions', '-funroll-all-loops', '-g0', '-fopenmp'],
                            sources=['geobipy/src/classes/forwardmodelling/fdemforward1D_fortran/m_fdemforward1D.f90'],
 		 ),
 		 Extension(name='geobipy.src.classes.forwardmodelling.mtforward1d_fortran',